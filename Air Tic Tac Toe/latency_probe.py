@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Latency measurement for Air Tic Tac Toe.
+
+This module measures how long it takes from capturing a camera frame to
+showing the game on screen.
+"""
+
+import time
+import cv2
+import numpy as np
+
+class LatencyProbe:
+    """
+    Records per-stage and capture-to-display latencies of the game loop.
+    
+    Latencies start when the capture call returns, so they leave out the
+    camera's own exposure and transfer delay. To measure that too, enable
+    the marker and film the screen with an external camera.
+    """
+    
+    def __init__(self, marker=False, marker_period=0.5, marker_size=48, log_path=None, window=1000):
+        """
+        Initialize the probe.
+        
+        Args:
+            marker (bool): Draw a square that blinks white and black, for
+                calibrating against an external camera filming the screen
+            marker_period (float): Seconds between marker changes
+            marker_size (int): Width and height of the marker in pixels
+            log_path (str): Write the timestamps of every frame to this CSV file
+            window (int): Number of recent samples kept per stage
+        """
+        self.marker = marker
+        self.marker_period = marker_period
+        self.marker_size = marker_size
+        self.marker_on = False
+        self.window = window
+        self.samples = {}
+        self.start = time.perf_counter()
+        self.capture_time = None
+        self.last_mark = None
+        self.frame_count = 0
+        self.log = None
+        if log_path:
+            self.log = open(log_path, "w")
+            self.log.write("frame,capture_s,displayed_s,marker_on\n")
+    
+    def add(self, stage, seconds):
+        """
+        Record one latency sample.
+        
+        Args:
+            stage (str): Stage name
+            seconds (float): Latency in seconds
+        """
+        samples = self.samples.setdefault(stage, [])
+        samples.append(seconds)
+        if len(samples) > self.window:
+            del samples[:len(samples) - self.window]
+    
+    def captured(self):
+        """
+        Stamp the capture of a frame, right after the camera returns it.
+        """
+        self.capture_time = self.last_mark = time.perf_counter()
+    
+    def mark(self, stage):
+        """
+        Record the time taken since the previous stamp as a stage.
+        
+        Args:
+            stage (str): Stage name, e.g. "inference" or "draw"
+        """
+        now = time.perf_counter()
+        self.add(stage, now - self.last_mark)
+        self.last_mark = now
+    
+    def draw_marker(self, frame):
+        """
+        Draw the blinking marker, if enabled, just before the frame is shown.
+        
+        Args:
+            frame (numpy.ndarray): The frame about to be shown
+        """
+        if not self.marker:
+            return
+        self.marker_on = int((time.perf_counter() - self.start) / self.marker_period) % 2 == 1
+        height, width = frame.shape[:2]
+        size = self.marker_size
+        color = (255, 255, 255) if self.marker_on else (0, 0, 0)
+        cv2.rectangle(frame, (width - size, height - size), (width - 1, height - 1), color, -1)
+    
+    def displayed(self):
+        """
+        Record the frame as shown, i.e. after cv2.waitKey() has let the
+        window repaint.
+        """
+        if self.capture_time is None:
+            return
+        now = time.perf_counter()
+        self.add("display", now - self.last_mark)
+        self.add("total", now - self.capture_time)
+        if self.log is not None:
+            self.log.write(f"{self.frame_count},{self.capture_time - self.start:.6f},"
+                           f"{now - self.start:.6f},{int(self.marker_on)}\n")
+        self.frame_count += 1
+        self.capture_time = None
+    
+    def report(self):
+        """
+        Format the latency distribution of every stage.
+        
+        Returns:
+            str: One line per stage
+        """
+        lines = []
+        for stage, values in self.samples.items():
+            ms = np.array(values) * 1000
+            lines.append(f"{stage:>10}: mean {ms.mean():6.1f} ms  p50 {np.percentile(ms, 50):6.1f} ms  "
+                         f"p95 {np.percentile(ms, 95):6.1f} ms  p99 {np.percentile(ms, 99):6.1f} ms  "
+                         f"max {ms.max():6.1f} ms")
+        return "\n".join(lines)
+    
+    def close(self):
+        """
+        Close the per-frame log, if any.
+        """
+        if self.log is not None:
+            self.log.close()
+            self.log = None
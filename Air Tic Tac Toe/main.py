@@ -5,18 +5,28 @@ Air Tic Tac Toe - Main Application
 A game of Tic Tac Toe played in the air using hand gestures captured by a webcam.
 """
 
+import argparse
 import cv2
 import time
 import numpy as np
 from game_engine import TicTacToeGame
 from rl_agent import TicTacToeRL
 from gesture_detector import GestureDetector
+from latency_probe import LatencyProbe
 
 class AirTicTacToe:
     """Main application class for Air Tic Tac Toe."""
     
-    def __init__(self):
-        """Initialize the application."""
+    def __init__(self, latency=False, latency_marker=False, latency_log=None):
+        """
+        Initialize the application.
+        
+        Args:
+            latency (bool): Measure capture-to-display latency
+            latency_marker (bool): Show a blinking marker for calibrating
+                latency with an external camera
+            latency_log (str): Write the timestamps of every frame to this CSV file
+        """
         # Initialize webcam
         self.cap = cv2.VideoCapture(1)  # Try camera index 1 for MacBook Air camera
         
@@ -43,6 +53,11 @@ class AirTicTacToe:
         # Player choice parameters
         self.show_menu = True
         self.player_goes_first = True
+        
+        # Latency measurement
+        self.probe = None
+        if latency or latency_marker or latency_log:
+            self.probe = LatencyProbe(marker=latency_marker, log_path=latency_log)
     
     def process_hand(self, hand_landmarks, frame):
         """
@@ -181,6 +196,10 @@ class AirTicTacToe:
                 print("Error: Camera is not opened. Exiting...")
                 return
                 
+            # Wait as little as possible for key presses while measuring
+            # latency, so the wait does not add to it
+            wait_time = 1 if self.probe else 10
+            
             while True:
                 # Read frame from webcam
                 ret, frame = self.cap.read()
@@ -195,6 +214,8 @@ class AirTicTacToe:
                         print("Could not reconnect to any camera. Exiting...")
                         break
                     continue
+                if self.probe:
+                    self.probe.captured()
                 
                 # Flip the frame horizontally for a more intuitive mirror view
                 frame = cv2.flip(frame, 1)
@@ -202,10 +223,14 @@ class AirTicTacToe:
                 # Show menu if needed
                 if self.show_menu:
                     frame = self.draw_menu(frame)
+                    if self.probe:
+                        self.probe.draw_marker(frame)
                     cv2.imshow(self.window_name, frame)
                     
                     # Check for key presses
-                    key = cv2.waitKey(10) & 0xFF
+                    key = cv2.waitKey(wait_time) & 0xFF
+                    if self.probe:
+                        self.probe.displayed()
                     if key == ord('q') or key == ord('Q'):
                         print("Quit key pressed. Exiting...")
                         break
@@ -221,6 +246,8 @@ class AirTicTacToe:
                 
                 # Process hand landmarks
                 results = self.gesture_detector.process_frame(frame)
+                if self.probe:
+                    self.probe.mark("inference")
                 
                 # Draw the board
                 frame = self.game.draw_board(frame)
@@ -237,12 +264,17 @@ class AirTicTacToe:
                 # Let bot make a move if it's its turn
                 if self.game.current_player == 2 and not self.game.game_over:
                     self.bot_move()
+                if self.probe:
+                    self.probe.mark("draw")
+                    self.probe.draw_marker(frame)
                 
                 # Display the frame
                 cv2.imshow(self.window_name, frame)
                 
                 # Check for key presses - use a shorter wait time to make key detection more responsive
-                key = cv2.waitKey(10) & 0xFF
+                key = cv2.waitKey(wait_time) & 0xFF
+                if self.probe:
+                    self.probe.displayed()
                 if key == ord('q') or key == ord('Q'):
                     print("Quit key pressed. Exiting...")
                     break
@@ -257,9 +289,27 @@ class AirTicTacToe:
             self.cap.release()
             cv2.destroyAllWindows()
             self.gesture_detector.close()
+            if self.probe:
+                print(self.probe.report())
+                self.probe.close()
             
         print("Game ended. Goodbye!")
 
+def parse_arguments():
+    """
+    Parse command line arguments.
+    
+    Returns:
+        argparse.Namespace: Parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="Air Tic Tac Toe")
+    parser.add_argument("--latency", action="store_true", help="Measure capture-to-display latency")
+    parser.add_argument("--latency-marker", action="store_true",
+                        help="Show a blinking marker for calibrating latency with an external camera")
+    parser.add_argument("--latency-log", type=str, help="Write the timestamps of every frame to this CSV file")
+    return parser.parse_args()
+
 if __name__ == "__main__":
-    app = AirTicTacToe()
-    app.run() 
\ No newline at end of file
+    args = parse_arguments()
+    app = AirTicTacToe(args.latency, args.latency_marker, args.latency_log)
+    app.run()
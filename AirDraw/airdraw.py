@@ -1,15 +1,49 @@
+import argparse
 import cv2
 import numpy as np
 import time
 import math
-from hand_tracking import HandTracker
-from drawing_utils import DrawingCanvas
+from canvas_sync import CanvasSync
+from hand_tracking import HandIdentities, HandTracker
+from latency_probe import LatencyProbe
+from pipeline import CapturePipeline, LatencyStats
+from recorder import VideoRecorder
+from stroke_log import session_log_path
+from tiled_canvas import TiledCanvas
 from ui_manager import UIManager
 
+def parse_arguments():
+    """
+    Parse command line arguments.
+    
+    Returns:
+        argparse.Namespace: Parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="AirDraw - draw in the air with your finger")
+    parser.add_argument("--hands", type=int, default=2, help="Maximum number of hands drawing at once")
+    parser.add_argument("--pipeline", action="store_true", help="Run capture and hand tracking on separate threads")
+    parser.add_argument("--stats", action="store_true", help="Print per-stage latency statistics")
+    parser.add_argument("--latency", action="store_true", help="Measure capture-to-display latency")
+    parser.add_argument("--latency-marker", action="store_true",
+                        help="Show a blinking marker for calibrating latency with an external camera")
+    parser.add_argument("--latency-log", type=str, help="Write the timestamps of every displayed frame to this CSV file")
+    parser.add_argument("--inference-width", type=int, default=640, help="Maximum width of the frames given to hand tracking")
+    parser.add_argument("--adaptive", action="store_true", help="Use the smallest hand tracking resolution that stays accurate")
+    parser.add_argument("--share", type=str, metavar="HOST:PORT",
+                        help="Share the canvas through a hub started with canvas_sync.py")
+    parser.add_argument("--record", type=str, help="Record the session to this video file")
+    parser.add_argument("--record-fps", type=float, default=30.0, help="Frame rate of the recorded video")
+    parser.add_argument("--timelapse", type=float, default=1.0, help="Speed-up of the recorded video (e.g. 10 for 10x)")
+    parser.add_argument("--record-policy", choices=["drop", "block"], default="drop",
+                        help="Drop frames or wait when the video encoder falls behind")
+    return parser.parse_args()
+
 def main():
     """
     Main function to run the AirDraw application.
     """
+    args = parse_arguments()
+    
     # Start capturing video
     cap = cv2.VideoCapture(0)
     
@@ -28,11 +62,38 @@ def main():
     # Get frame dimensions
     frame_height, frame_width = frame.shape[:2]
     
+    # Open the video recording first, so a bad path fails before anything starts
+    recorder = None
+    if args.record:
+        try:
+            recorder = VideoRecorder(args.record, (frame_width, frame_height), args.record_fps,
+                                     args.timelapse, args.record_policy)
+        except OSError as e:
+            print(f"Error: {e}")
+            cap.release()
+            return
+    
     # Initialize components
-    hand_tracker = HandTracker()
-    canvas = DrawingCanvas(frame_width, frame_height)
+    hand_tracker = HandTracker(max_num_hands=args.hands, inference_width=args.inference_width,
+                               adaptive=args.adaptive)
+    hand_identities = HandIdentities()
+    canvas = TiledCanvas(frame_width, frame_height)
     ui_manager = UIManager(frame_width, frame_height)
     
+    # Autosave the session as a log of drawing operations
+    log_path = session_log_path()
+    canvas.start_log(log_path)
+    
+    # Share the canvas with other instances through a hub
+    sync = None
+    if args.share:
+        host, _, port = args.share.rpartition(":")
+        try:
+            sync = CanvasSync(canvas, host or "127.0.0.1", int(port))
+            print(f"Sharing the canvas through {args.share} as client {sync.client_id}")
+        except (OSError, ValueError) as e:
+            print(f"Error: Could not join the shared canvas at {args.share}: {e}")
+    
     # Print instructions
     ui_manager.print_instructions()
     
@@ -45,96 +106,230 @@ def main():
     
     cv2.setMouseCallback("AirDraw", mouse_callback)
     
-    # Variables for tracking drawing state
-    last_drawing_time = time.time()
+    # Variables for tracking the drawing state of each hand, by hand id
+    last_drawing_times = {}
+    grabs = {}  # Fingertip and palm size where the current pan/zoom grab started
+    
+    def process_hands(results):
+        """
+        Draw with the detected hands and handle the pan/zoom gesture. Each hand
+        draws with its own pen, so several hands can draw at once.
+        
+        Args:
+            results: MediaPipe hand detection results
+        
+        Returns:
+            list: (fingertip, landmarks, color) of every hand, to draw once
+                the canvas is composited
+        """
+        cursors = []
+        
+        # Give every hand a stable id, matched by handedness and wrist position
+        hands = results.multi_hand_landmarks or []
+        wrists = [hand_tracker.get_landmark_position(hand_landmarks, frame_width, frame_height,
+                                                     hand_tracker.mp_hands.HandLandmark.WRIST)
+                  for hand_landmarks in hands]
+        hand_ids, forgotten = hand_identities.update(list(zip(hand_tracker.get_handedness(results), wrists)))
+        for hand_id in forgotten:
+            canvas.remove_pen(hand_id)
+            last_drawing_times.pop(hand_id, None)
+        for hand_id in list(grabs):
+            if hand_id not in hand_ids:
+                del grabs[hand_id]
+        
+        # Process hand landmarks if detected
+        if hands:
+            for hand_id, hand_landmarks, wrist in zip(hand_ids, hands, wrists):
+                canvas.select_pen(hand_id)
+                
+                # Get index finger tip coordinates
+                index_finger_tip = hand_tracker.get_landmark_position(
+                    hand_landmarks, 
+                    frame_width, 
+                    frame_height, 
+                    hand_tracker.mp_hands.HandLandmark.INDEX_FINGER_TIP
+                )
+                
+                # Get middle finger tip for gesture recognition
+                middle_finger_tip = hand_tracker.get_landmark_position(
+                    hand_landmarks, 
+                    frame_width, 
+                    frame_height, 
+                    hand_tracker.mp_hands.HandLandmark.MIDDLE_FINGER_TIP
+                )
+                
+                # Calculate distance between index and middle finger tips
+                finger_distance = math.sqrt(
+                    (index_finger_tip[0] - middle_finger_tip[0])**2 + 
+                    (index_finger_tip[1] - middle_finger_tip[1])**2
+                )
+                
+                # Check if fingers are close (pinch gesture) - use this to toggle drawing on/off
+                is_drawing = finger_distance > 50  # Only draw when fingers are apart
+                
+                # Touching the thumb to the index finger grabs the canvas:
+                # moving the hand pans it, and moving the hand towards or
+                # away from the camera (which changes the palm size) zooms
+                thumb_tip = hand_tracker.get_landmark_position(
+                    hand_landmarks, frame_width, frame_height, hand_tracker.mp_hands.HandLandmark.THUMB_TIP
+                )
+                middle_finger_mcp = hand_tracker.get_landmark_position(
+                    hand_landmarks, frame_width, frame_height, hand_tracker.mp_hands.HandLandmark.MIDDLE_FINGER_MCP
+                )
+                palm_size = max(1.0, math.hypot(wrist[0] - middle_finger_mcp[0], wrist[1] - middle_finger_mcp[1]))
+                if math.hypot(thumb_tip[0] - index_finger_tip[0], thumb_tip[1] - index_finger_tip[1]) < 40:
+                    if hand_id in grabs:
+                        (grab_x, grab_y), grab_size = grabs[hand_id]
+                        canvas.pan(index_finger_tip[0] - grab_x, index_finger_tip[1] - grab_y)
+                        # Ignore small changes in palm size, which are mostly tracking noise
+                        if abs(palm_size / grab_size - 1) > 0.05:
+                            canvas.zoom_at(palm_size / grab_size, *index_finger_tip)
+                        else:
+                            palm_size = grab_size
+                    grabs[hand_id] = (index_finger_tip, palm_size)
+                    is_drawing = False
+                    canvas.prev_point = None
+                else:
+                    grabs.pop(hand_id, None)
+                
+                # Draw on canvas
+                current_time = time.time()
+                canvas.prev_point = canvas.draw_point(
+                    index_finger_tip[0], 
+                    index_finger_tip[1], 
+                    is_drawing, 
+                    current_time
+                )
+                
+                if is_drawing:
+                    last_drawing_times[hand_id] = current_time
+                elif current_time - last_drawing_times.get(hand_id, current_time) > 0.5:
+                    # Reset previous point if not drawing for a while
+                    canvas.prev_point = None
+                
+                cursors.append((index_finger_tip, hand_landmarks, canvas.current_color))
+        
+        # The UI controls act on the pen of the first hand in view, or on
+        # pen 0 when no hand is
+        canvas.select_pen(hand_ids[0] if hands else 0)
+        return cursors
+    
+    # Reusable frame buffers: the camera reads into one, and the flipped frame
+    # is composited in place and used as the output
+    capture_buffer = np.empty_like(frame)
+    output = np.empty_like(frame)
+    
+    # In pipeline mode, capture and hand inference run on their own threads
+    pipeline = None
+    if args.pipeline:
+        pipeline = CapturePipeline(cap, hand_tracker, frame.shape)
+        pipeline.start()
+        stats = pipeline.stats
+    else:
+        stats = LatencyStats()
+    frame_seq = landmark_seq = 0
+    landmark_time = None
+    cursors = []
+    
+    # Capture-to-display latency measurement
+    probe = None
+    if args.latency or args.latency_marker or args.latency_log:
+        probe = LatencyProbe(stats, marker=args.latency_marker, log_path=args.latency_log)
+    last_report = time.perf_counter()
     
     # Main loop
     try:
         while cap.isOpened() and not ui_manager.exit_program:
-            ret, frame = cap.read()
-            if not ret:
-                print("Error: Failed to capture frame. Camera may have been disconnected.")
-                break
+            if pipeline is not None:
+                # Take the newest camera frame and the newest landmarks, without
+                # waiting for inference
+                frame = pipeline.next_frame(after=frame_seq)
+                if frame is None:
+                    if pipeline.error:
+                        print(f"Error: {pipeline.error}")
+                        break
+                    continue
+                render_start = time.perf_counter()
+                frame_seq, capture_time = frame.seq, frame.capture_time
+                np.copyto(output, frame.image)
+                frame.release()
+                
+                latest = pipeline.latest_landmarks(landmark_seq)
+                if latest is not None:
+                    landmark_seq, landmark_time, results = latest
+                    cursors = process_hands(results)
+                    stats.add("landmarks", render_start - landmark_time)
+            else:
+                capture_start = time.perf_counter()
+                ret, captured = cap.read(capture_buffer)
+                capture_time = landmark_time = render_start = time.perf_counter()
+                if not ret:
+                    print("Error: Failed to capture frame. Camera may have been disconnected.")
+                    break
+                
+                cv2.flip(captured, 1, dst=output)  # Flip frame horizontally
+                stats.add("capture", capture_time - capture_start)
+                
+                # Process hand landmarks
+                results = hand_tracker.process_frame(output)
+                stats.add("inference", time.perf_counter() - capture_time)
+                cursors = process_hands(results)
             
-            frame = cv2.flip(frame, 1)  # Flip frame horizontally
+            # Exchange operations with the other instances sharing the canvas
+            if sync is not None:
+                sync.update()
+                if sync.error:
+                    print(f"Error: {sync.error} Continuing without sharing.")
+                    sync.close()
+                    sync = None
             
-            # Process hand landmarks
-            results = hand_tracker.process_frame(frame)
+            # Redraw points if needed
+            canvas.redraw_points()
             
-            # Create a copy of the frame for UI
-            ui_frame = frame.copy()
+            # Combine frame and canvas in place, only where there is ink
+            coverage, ink_bounds = canvas.get_coverage()
+            ui_manager.combine_frame_and_canvas(output, canvas.get_canvas(), out=output,
+                                                mask=coverage, bounds=ink_bounds,
+                                                palette=canvas.get_palette())
             
             # Add UI elements
-            ui_frame = ui_manager.display_ui(
-                ui_frame, 
+            ui_manager.display_ui(
+                output, 
                 canvas.current_color_idx, 
                 canvas.drawing_mode, 
                 canvas.line_mode, 
                 canvas.brush_thickness, 
                 canvas.special_effect,
-                canvas.colors
+                canvas.colors,
+                canvas.stroke_eraser
             )
             
-            # Process hand landmarks if detected
-            if results.multi_hand_landmarks:
-                for hand_landmarks in results.multi_hand_landmarks:
-                    # Get index finger tip coordinates
-                    index_finger_tip = hand_tracker.get_landmark_position(
-                        hand_landmarks, 
-                        frame_width, 
-                        frame_height, 
-                        hand_tracker.mp_hands.HandLandmark.INDEX_FINGER_TIP
-                    )
-                    
-                    # Get middle finger tip for gesture recognition
-                    middle_finger_tip = hand_tracker.get_landmark_position(
-                        hand_landmarks, 
-                        frame_width, 
-                        frame_height, 
-                        hand_tracker.mp_hands.HandLandmark.MIDDLE_FINGER_TIP
-                    )
-                    
-                    # Calculate distance between index and middle finger tips
-                    finger_distance = math.sqrt(
-                        (index_finger_tip[0] - middle_finger_tip[0])**2 + 
-                        (index_finger_tip[1] - middle_finger_tip[1])**2
-                    )
-                    
-                    # Draw a circle at the index finger tip
-                    cv2.circle(ui_frame, index_finger_tip, 10, canvas.current_color, -1)
-                    
-                    # Check if fingers are close (pinch gesture) - use this to toggle drawing on/off
-                    is_drawing = finger_distance > 50  # Only draw when fingers are apart
-                    
-                    # Draw on canvas
-                    current_time = time.time()
-                    canvas.prev_point = canvas.draw_point(
-                        index_finger_tip[0], 
-                        index_finger_tip[1], 
-                        is_drawing, 
-                        current_time
-                    )
-                    
-                    if is_drawing:
-                        last_drawing_time = current_time
-                    elif current_time - last_drawing_time > 0.5:
-                        # Reset previous point if not drawing for a while
-                        canvas.prev_point = None
-                    
-                    # Draw landmarks
-                    hand_tracker.draw_landmarks(ui_frame, hand_landmarks)
-            
-            # Redraw points if needed
-            canvas.redraw_points()
-            
-            # Combine frame and canvas
-            output = ui_manager.combine_frame_and_canvas(ui_frame, canvas.get_canvas())
+            for index_finger_tip, hand_landmarks, color in cursors:
+                # Draw a circle at the index finger tip, in the color of its pen
+                cv2.circle(output, index_finger_tip, 10, color, -1)
+                
+                # Draw landmarks
+                hand_tracker.draw_landmarks(output, hand_landmarks)
             
             # Show window
+            if probe is not None:
+                probe.draw_marker(output)
             cv2.imshow("AirDraw", output)
+            if recorder is not None:
+                record_start = time.perf_counter()
+                recorder.record(output, record_start)
+                stats.add("record", time.perf_counter() - record_start)
+            done = time.perf_counter()
+            stats.add("render", done - render_start)
+            stats.add("end-to-end", done - capture_time)
+            if args.stats and done - last_report > 5.0:
+                print(stats.report())
+                last_report = done
             
             # Check for key presses - only keep ESC for emergency exit
             key = cv2.waitKey(1) & 0xFF
+            if probe is not None:
+                probe.displayed(capture_time, landmark_time)
             if key == 27:  # ESC key for emergency exit
                 print("Emergency exit triggered")
                 break
@@ -144,10 +339,23 @@ def main():
     finally:
         # Clean up
         print("Releasing resources...")
+        if pipeline is not None:
+            pipeline.stop()
+        if args.stats or probe is not None:
+            print(stats.report())
+        if probe is not None:
+            probe.close()
+        if sync is not None:
+            sync.close()
+        canvas.stop_log()
+        if recorder is not None:
+            recorder.close()
+            print(f"Video saved to {args.record} ({recorder.written} frames, {recorder.dropped} dropped)")
+        print(f"Session saved to {log_path} (replay with: python replay.py {log_path})")
         hand_tracker.close()
         cap.release()
         cv2.destroyAllWindows()
         print("Program ended successfully.")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
\ No newline at end of file
@@ -0,0 +1,265 @@
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+import cv2
+import numpy as np
+from drawing_utils import DrawingCanvas
+from tiled_canvas import TiledCanvas
+from ui_manager import UIManager
+
+# Benchmark modes: (special effect, line mode, drawing mode)
+MODES = {
+    "line": (0, True, True),
+    "dots": (0, False, True),
+    "glow": (2, True, True),
+    "rainbow": (1, True, True),
+    "erase": (0, True, False),
+}
+
+# Stages timed on every frame, in the order the main loop runs them
+STAGES = ("draw_point", "redraw_points", "combine", "display_ui")
+
+def parse_arguments():
+    """
+    Parse command line arguments.
+    
+    Returns:
+        argparse.Namespace: Parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="Benchmark AirDraw rendering with synthetic hand movements")
+    parser.add_argument("--resolutions", type=str, default="640x480,1280x720,1920x1080",
+                        help="Comma-separated frame sizes, e.g. 1280x720")
+    parser.add_argument("--modes", type=str, default=",".join(MODES), help="Comma-separated modes: " + ", ".join(MODES))
+    parser.add_argument("--frames", type=int, default=300, help="Frames measured per run")
+    parser.add_argument("--warmup", type=int, default=30, help="Frames run before measuring")
+    parser.add_argument("--tiled", action="store_true", help="Benchmark the tiled canvas used by airdraw.py")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed of the fingertip trajectories")
+    parser.add_argument("--output", type=str, help="Write the JSON report to this file instead of stdout")
+    return parser.parse_args()
+
+def fingertip_path(width, height, frames, rng, stroke_frames=60, lift_frames=8):
+    """
+    Generate a fingertip trajectory: a wandering Lissajous curve with tracking
+    jitter, with the pen lifted for a few frames after every stroke.
+    
+    Args:
+        width (int): Frame width
+        height (int): Frame height
+        frames (int): Number of frames
+        rng (numpy.random.Generator): Random number generator
+        stroke_frames (int): Frames per stroke
+        lift_frames (int): Frames the pen is lifted between strokes
+    
+    Returns:
+        tuple: ((frames, 2) int32 positions, (frames,) bool drawing flags)
+    """
+    t = np.arange(frames) / 30.0
+    phase = rng.uniform(0, 2 * np.pi, 2)
+    x = 0.5 + 0.4 * np.sin(1.3 * t + phase[0]) * np.cos(0.21 * t)
+    y = 0.5 + 0.4 * np.sin(1.7 * t + phase[1])
+    points = np.stack((x * width, y * height), axis=1) + rng.normal(0, 1.5, (frames, 2))
+    points = np.clip(np.round(points), 0, (width - 1, height - 1)).astype(np.int32)
+    drawing = (np.arange(frames) % (stroke_frames + lift_frames)) < stroke_frames
+    return points, drawing
+
+class FrameRunner:
+    """
+    One main-loop iteration of airdraw.py without the camera or hand tracking:
+    draw a fingertip position, bring the canvas up to date, composite it onto
+    a synthetic camera frame and draw the UI.
+    """
+    
+    def __init__(self, canvas, ui_manager, camera_frame):
+        """
+        Initialize a runner.
+        
+        Args:
+            canvas (DrawingCanvas): Canvas to draw on
+            ui_manager (UIManager): UI manager drawing the controls
+            camera_frame (numpy.ndarray): Stand-in for the camera image
+        """
+        self.canvas = canvas
+        self.ui_manager = ui_manager
+        self.camera_frame = camera_frame
+        self.output = np.empty_like(camera_frame)
+        self.timings = None
+    
+    def run(self, point, is_drawing, current_time):
+        """
+        Run one frame, adding the time of each stage to self.timings if set.
+        
+        Args:
+            point (tuple): (x, y) fingertip position
+            is_drawing (bool): Whether the pen is down
+            current_time (float): Time of the frame
+        """
+        canvas = self.canvas
+        np.copyto(self.output, self.camera_frame)
+        
+        t0 = time.perf_counter()
+        canvas.prev_point = canvas.draw_point(int(point[0]), int(point[1]), is_drawing, current_time)
+        if not is_drawing:
+            canvas.prev_point = None
+        t1 = time.perf_counter()
+        canvas.redraw_points()
+        t2 = time.perf_counter()
+        coverage, ink_bounds = canvas.get_coverage()
+        self.ui_manager.combine_frame_and_canvas(self.output, canvas.get_canvas(), out=self.output,
+                                                 mask=coverage, bounds=ink_bounds,
+                                                 palette=canvas.get_palette())
+        t3 = time.perf_counter()
+        self.ui_manager.display_ui(self.output, canvas.current_color_idx, canvas.drawing_mode,
+                                   canvas.line_mode, canvas.brush_thickness, canvas.special_effect,
+                                   canvas.colors, canvas.stroke_eraser)
+        cv2.circle(self.output, (int(point[0]), int(point[1])), 10, canvas.current_color, -1)
+        t4 = time.perf_counter()
+        
+        if self.timings is not None:
+            for stage, seconds in zip(STAGES, (t1 - t0, t2 - t1, t3 - t2, t4 - t3)):
+                self.timings[stage].append(seconds)
+            self.timings["frame"].append(t4 - t0)
+
+def _distribution(seconds):
+    """
+    Summarize latency samples.
+    
+    Args:
+        seconds (list): Samples in seconds
+    
+    Returns:
+        dict: mean, p50, p95, p99 and max in milliseconds
+    """
+    ms = np.asarray(seconds) * 1000
+    return {"mean": round(float(ms.mean()), 4), "p50": round(float(np.percentile(ms, 50)), 4),
+            "p95": round(float(np.percentile(ms, 95)), 4), "p99": round(float(np.percentile(ms, 99)), 4),
+            "max": round(float(ms.max()), 4)}
+
+def run_benchmark(width, height, mode, frames=300, warmup=30, tiled=False, seed=0):
+    """
+    Benchmark one mode at one resolution.
+    
+    The frames are run twice from the same starting state: once timed, and
+    once under tracemalloc to measure memory allocated per frame, since
+    tracing allocations slows everything down.
+    
+    Args:
+        width (int): Frame width
+        height (int): Frame height
+        mode (str): One of MODES
+        frames (int): Frames measured
+        warmup (int): Frames run before measuring
+        tiled (bool): Use a TiledCanvas instead of a DrawingCanvas
+        seed (int): Random seed of the trajectories
+    
+    Returns:
+        dict: Frames per second, latency distributions per stage and
+            allocations per frame
+    """
+    effect, line_mode, drawing_mode = MODES[mode]
+    
+    def setup():
+        rng = np.random.default_rng(seed)
+        canvas = (TiledCanvas if tiled else DrawingCanvas)(width, height)
+        ui_manager = UIManager(width, height)
+        camera_frame = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+        camera_frame = cv2.GaussianBlur(camera_frame, (0, 0), 3)
+        runner = FrameRunner(canvas, ui_manager, camera_frame)
+        canvas.special_effect = effect
+        canvas.line_mode = line_mode
+        if not drawing_mode:
+            # Ink to erase: several passes over trajectories like the eraser's
+            for i in range(4):
+                points, drawing = fingertip_path(width, height, warmup + frames, rng)
+                for j, (point, is_drawing) in enumerate(zip(points, drawing)):
+                    runner.run(point, is_drawing, i * 100 + j / 30.0)
+            canvas.drawing_mode = False
+        points, drawing = fingertip_path(width, height, warmup + frames, rng)
+        for j in range(warmup):
+            runner.run(points[j], drawing[j], 1000 + j / 30.0)
+        return runner, points[warmup:], drawing[warmup:]
+    
+    # Timed run
+    runner, points, drawing = setup()
+    runner.timings = {stage: [] for stage in STAGES + ("frame",)}
+    start = time.perf_counter()
+    for j, (point, is_drawing) in enumerate(zip(points, drawing)):
+        runner.run(point, is_drawing, 2000 + j / 30.0)
+    elapsed = time.perf_counter() - start
+    timings = runner.timings
+    
+    # Allocation run
+    runner, points, drawing = setup()
+    peaks, retained = [], []
+    tracemalloc.start()
+    try:
+        for j, (point, is_drawing) in enumerate(zip(points, drawing)):
+            before = tracemalloc.get_traced_memory()[0]
+            if hasattr(tracemalloc, "reset_peak"):
+                tracemalloc.reset_peak()
+            runner.run(point, is_drawing, 2000 + j / 30.0)
+            current, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+            retained.append(current - before)
+    finally:
+        tracemalloc.stop()
+    
+    return {
+        "width": width,
+        "height": height,
+        "mode": mode,
+        "canvas": type(runner.canvas).__name__,
+        "frames": len(points),
+        "fps": round(len(points) / elapsed, 2),
+        "latency_ms": {stage: _distribution(samples) for stage, samples in timings.items()},
+        "alloc_per_frame": {
+            "peak_bytes_mean": int(np.mean(peaks)),
+            "peak_bytes_max": int(np.max(peaks)),
+            "retained_bytes_mean": round(float(np.mean(retained)), 1),
+        },
+        "strokes": len(runner.canvas.strokes),
+    }
+
+def main():
+    """
+    Run the benchmarks and print or save the JSON report.
+    """
+    args = parse_arguments()
+    resolutions = [tuple(int(v) for v in r.lower().split("x")) for r in args.resolutions.split(",")]
+    modes = args.modes.split(",")
+    for mode in modes:
+        if mode not in MODES:
+            print(f"Error: Unknown mode {mode}. Choose from: {', '.join(MODES)}")
+            return 1
+    
+    results = []
+    for width, height in resolutions:
+        for mode in modes:
+            result = run_benchmark(width, height, mode, args.frames, args.warmup, args.tiled, args.seed)
+            results.append(result)
+            frame = result["latency_ms"]["frame"]
+            print(f"{width}x{height} {mode:>8}: {result['fps']:8.1f} fps  p50 {frame['p50']:.2f} ms  "
+                  f"p99 {frame['p99']:.2f} ms  peak alloc {result['alloc_per_frame']['peak_bytes_mean'] / 1024:.0f} KiB/frame",
+                  file=sys.stderr)
+    
+    report = {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "platform": platform.platform(),
+        "frames": args.frames,
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+        print(f"Report saved to {args.output}", file=sys.stderr)
+    else:
+        print(text)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
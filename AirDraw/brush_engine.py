@@ -0,0 +1,170 @@
+import cv2
+import numpy as np
+import colorsys
+
+# Fully saturated (B, G, R) color for every rainbow hue in degrees
+HUE_LUT = np.array(
+    [[int(c * 255) for c in reversed(colorsys.hsv_to_rgb(h / 360.0, 1.0, 1.0))] for h in range(360)],
+    dtype=np.uint8
+)
+
+def hue_to_bgr(hues):
+    """
+    Convert rainbow hues to fully saturated (B, G, R) colors.
+    
+    Args:
+        hues (numpy.ndarray): Hues in degrees
+    
+    Returns:
+        numpy.ndarray: (N, 3) uint8 array of colors
+    """
+    return HUE_LUT[np.asarray(hues, dtype=np.int64) % 360]
+
+class BrushEngine:
+    """
+    A class for stamping anti-aliased round brushes onto images.
+    Brush sprites are computed once per radius. Stamps are gathered into a
+    coverage mask by taking the maximum of the mask and each sprite, which
+    does not depend on the order of the stamps, and the mask is blended onto
+    the image once, so thick brushes and dense glow effects cost one small
+    array operation per circle and a single blend.
+    """
+    
+    def __init__(self):
+        """
+        Initialize the brush engine with an empty sprite cache.
+        """
+        self.sprites = {}
+    
+    def sprite(self, radius):
+        """
+        Get the anti-aliased sprite for a brush radius.
+        
+        Args:
+            radius (int): Brush radius in pixels
+        
+        Returns:
+            tuple: (alpha, covered) square arrays of side 2 * radius + 3 centered
+                on the brush: uint8 coverage (0-255) and where it is non-zero
+        """
+        radius = max(0, int(radius))
+        sprite = self.sprites.get(radius)
+        if sprite is None:
+            r = radius + 1
+            dy, dx = np.mgrid[-r:r + 1, -r:r + 1]
+            alpha = np.clip(radius + 0.5 - np.sqrt(dx * dx + dy * dy), 0.0, 1.0)
+            alpha = np.round(alpha * 255).astype(np.uint8)
+            sprite = (alpha, alpha > 0)
+            self.sprites[radius] = sprite
+        return sprite
+    
+    def accumulate(self, mask, origin, positions, radii, labels=None):
+        """
+        Stamp round brushes into a coverage mask, keeping the largest coverage
+        of every pixel.
+        
+        Args:
+            mask (numpy.ndarray): uint8 coverage mask (0-255) to stamp into
+            origin (tuple): (x, y) position of the mask's top-left pixel
+            positions (numpy.ndarray): (N, 2) integer brush centers as (x, y)
+            radii (numpy.ndarray): (N,) integer brush radii
+            labels (numpy.ndarray): Optional int32 image of the mask's size;
+                every pixel a stamp covers is set to the stamp's position in
+                `positions` plus one, with later stamps winning
+        """
+        positions = np.asarray(positions, dtype=np.int32).reshape(-1, 2) - np.asarray(origin, dtype=np.int32)
+        radii = np.maximum(np.asarray(radii, dtype=np.int32).reshape(-1), 0)
+        height, width = mask.shape
+        reach = radii + 1
+        size = 2 * reach + 1
+        x0 = positions[:, 0] - reach
+        y0 = positions[:, 1] - reach
+        # Part of every sprite that lies inside the mask
+        sx, sy = np.maximum(-x0, 0), np.maximum(-y0, 0)
+        ex, ey = np.minimum(size, width - x0), np.minimum(size, height - y0)
+        stamps = np.flatnonzero((sx < ex) & (sy < ey))
+        sprites = {radius: self.sprite(radius) for radius in np.unique(radii[stamps]).tolist()}
+        for i, radius, x, y, a, b, c, d in zip(*(v.tolist() for v in (stamps, radii[stamps], x0[stamps], y0[stamps],
+                                                                       sx[stamps], sy[stamps], ex[stamps], ey[stamps]))):
+            alpha, covered = sprites[radius]
+            region = mask[y + b:y + d, x + a:x + c]
+            np.maximum(region, alpha[b:d, a:c], out=region)
+            if labels is not None:
+                labels[y + b:y + d, x + a:x + c][covered[b:d, a:c]] = i + 1
+    
+    @staticmethod
+    def covered(mask):
+        """
+        Find the pixels a coverage mask covers.
+        
+        Args:
+            mask (numpy.ndarray): uint8 coverage mask
+        
+        Returns:
+            tuple: (ys, xs) arrays of the non-zero pixels, row by row
+        """
+        points = cv2.findNonZero(mask)
+        if points is None:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int32)
+        points = points.reshape(-1, 2)
+        return points[:, 1], points[:, 0]
+    
+    @staticmethod
+    def blend(target, origin, mask, ink, pixels=None):
+        """
+        Blend ink onto an image through a coverage mask. Single-channel images
+        hold palette indices, so they are not blended: the index is written
+        wherever the mask covers at least half a pixel.
+        
+        Args:
+            target (numpy.ndarray): Contiguous BGR or palette index image to draw on
+            origin (tuple): (x, y) position of the mask's top-left pixel in the target
+            mask (numpy.ndarray): uint8 coverage mask (0-255)
+            ink: (B, G, R) color or palette index, or an array with the ink of
+                every covered pixel
+            pixels (tuple): The covered pixels from covered(), if known
+        """
+        ys, xs = BrushEngine.covered(mask) if pixels is None else pixels
+        alpha = mask[ys, xs]
+        flat = (ys + int(origin[1])) * target.shape[1] + (xs + int(origin[0]))
+        per_pixel = np.ndim(ink) == target.ndim - 1
+        if target.ndim == 2:
+            half = alpha >= 128
+            target.reshape(-1)[flat[half]] = ink[half] if per_pixel else int(ink)
+            return
+        image = target.reshape(-1, 3)
+        old = np.take(image, flat, axis=0)
+        a = alpha[:, None] * np.float32(1.0 / 255)
+        image[flat] = (old + (np.asarray(ink, dtype=np.float32) - old) * a + 0.5).astype(np.uint8)
+    
+    @staticmethod
+    def glow_stamps(starts, ends, times, thickness, scale=1.0):
+        """
+        Compute the glow circles interpolated along a batch of segments.
+        
+        Args:
+            starts (numpy.ndarray): (N, 2) segment start points
+            ends (numpy.ndarray): (N, 2) segment end points
+            times (numpy.ndarray): (N,) time each segment was drawn
+            thickness (int): Brush thickness in target pixels
+            scale (float): Scale factor from canvas to target coordinates
+        
+        Returns:
+            tuple: (positions, radii) arrays of the glow circles
+        """
+        starts = np.asarray(starts, dtype=np.float64).reshape(-1, 2)
+        ends = np.asarray(ends, dtype=np.float64).reshape(-1, 2)
+        # Number of circles per segment is based on its length on the canvas
+        dist = np.sqrt(np.sum((ends - starts) ** 2, axis=1)) / scale
+        steps = np.maximum(1, (dist / 5).astype(np.int64))
+        counts = steps - 1
+        total = int(counts.sum())
+        if total == 0:
+            return np.empty((0, 2), dtype=np.int32), np.empty(0, dtype=np.int32)
+        
+        seg = np.repeat(np.arange(len(steps)), counts)
+        i = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts) + 1
+        frac = (i / steps[seg])[:, None]
+        positions = (starts[seg] + (ends[seg] - starts[seg]) * frac).astype(np.int32)
+        radii = (thickness + 3 * scale * np.sin(np.asarray(times, dtype=np.float64)[seg] * 5 + i / 2)).astype(np.int32)
+        return positions, radii
\ No newline at end of file
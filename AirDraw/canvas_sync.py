@@ -0,0 +1,611 @@
+import argparse
+import os
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import zlib
+import numpy as np
+from stroke_log import RECORD, OP_CLEAR, OP_PEN, OP_SETTINGS, apply_records
+
+# Messages exchanged with the hub. Every message is a header followed by
+# `length` bytes of payload: RECORD entries for DELTA, and for SNAPSHOT the
+# zlib-compressed DELTA messages needed to rebuild the canvas. The hub numbers
+# every DELTA it relays, and that order is the same on every canvas.
+HEADER = struct.Struct("<BIIII")  # Message type, client id, sequence number, hub order, payload length
+WELCOME = 0  # Hub -> client: the client id assigned to the connection
+DELTA = 1  # Canvas operations of one client, relayed to every client including it
+SNAPSHOT = 2  # Hub -> late joiner: everything drawn so far
+LEAVE = 3  # Hub -> clients: a client disconnected
+HUB_SEND_QUEUE_SIZE = 1024  # Messages a client may fall behind before the hub drops it
+
+def pack_message(kind, client=0, seq=0, payload=b"", order=0):
+    """
+    Pack one message.
+    
+    Args:
+        kind (int): Message type
+        client (int): Client id
+        seq (int): Sequence number
+        payload (bytes): Message payload
+        order (int): Hub order of a relayed DELTA
+    
+    Returns:
+        bytes: Header and payload
+    """
+    return HEADER.pack(kind, client, seq, order, len(payload)) + payload
+
+def send_message(sock, kind, client=0, seq=0, payload=b"", order=0):
+    """
+    Send one message.
+    
+    Args:
+        sock (socket.socket): Connected socket
+        kind (int): Message type
+        client (int): Client id
+        seq (int): Sequence number
+        payload (bytes): Message payload
+        order (int): Hub order of a relayed DELTA
+    """
+    sock.sendall(pack_message(kind, client, seq, payload, order))
+
+def _shutdown(sock):
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+def _recv_exact(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return bytes(data)
+
+def recv_message(sock):
+    """
+    Receive one message.
+    
+    Args:
+        sock (socket.socket): Connected socket
+    
+    Returns:
+        tuple: (kind, client, seq, order, payload), or None once the connection is closed
+    """
+    header = _recv_exact(sock, HEADER.size)
+    if header is None:
+        return None
+    kind, client, seq, order, length = HEADER.unpack(header)
+    payload = _recv_exact(sock, length) if length else b""
+    if payload is None:
+        return None
+    return kind, client, seq, order, payload
+
+class _Server(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+class SyncHub:
+    """
+    A hub relaying canvas operations between AirDraw instances.
+    
+    Every DELTA a client sends is numbered, relayed to all clients, the
+    sender included, and kept, so a client joining late gets a SNAPSHOT of
+    everything drawn so far. The numbers give the order every canvas stacks
+    the strokes in, whatever order they were drawn in locally. A clear
+    wipes every canvas, so only the operations since the last clear are kept,
+    along with each client's pen and settings at that point.
+    
+    Each client has its own queue of outgoing messages and a thread sending
+    them, so a client that stops reading cannot hold up the others. A client
+    whose queue fills up, or that sends a malformed delta, is disconnected.
+    """
+    
+    def __init__(self, host="127.0.0.1", port=8765):
+        """
+        Bind the hub. Call start() or serve_forever() to accept clients.
+        
+        Args:
+            host (str): Address to listen on
+            port (int): Port to listen on, or 0 for any free port
+        """
+        self.lock = threading.Lock()
+        self.clients = {}  # Client id -> (socket, queue of outgoing messages)
+        self.messages = []  # (client, seq, order, payload) of every DELTA since the last clear
+        self.states = {}  # Client id -> [last pen record, last settings record, last seq]
+        self.next_id = 1
+        self.order = 0  # Hub order of the last relayed DELTA
+        hub = self
+        
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                hub.serve_client(self.request)
+        
+        self.server = _Server((host, port), Handler)
+        self.address = self.server.server_address
+        self.thread = None
+    
+    def start(self):
+        """
+        Accept clients on a background thread.
+        """
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+    
+    def serve_forever(self):
+        """
+        Accept clients until interrupted.
+        """
+        self.server.serve_forever()
+    
+    def stop(self):
+        """
+        Stop accepting clients and close the hub.
+        """
+        self.server.shutdown()
+        self.server.server_close()
+        with self.lock:
+            for sock, _ in self.clients.values():
+                _shutdown(sock)
+    
+    def serve_client(self, sock):
+        """
+        Relay the operations of one client until it disconnects.
+        
+        Args:
+            sock (socket.socket): Client connection
+        """
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        outbox = queue.Queue(HUB_SEND_QUEUE_SIZE)
+        sender = threading.Thread(target=self.send_worker, args=(sock, outbox))
+        sender.daemon = True
+        # Register the client while holding the lock, so nothing is broadcast
+        # between its snapshot and its first forwarded delta
+        with self.lock:
+            client = self.next_id
+            self.next_id += 1
+            outbox.put(pack_message(WELCOME, client))
+            if self.messages:
+                outbox.put(pack_message(SNAPSHOT, payload=self._snapshot()))
+            self.clients[client] = (sock, outbox)
+        sender.start()
+        try:
+            while True:
+                message = recv_message(sock)
+                if message is None:
+                    break
+                kind, _, seq, _, payload = message
+                if kind != DELTA:
+                    continue
+                if len(payload) % RECORD.itemsize:
+                    print(f"Dropping client {client}: malformed delta of {len(payload)} bytes")
+                    break
+                with self.lock:
+                    self.order += 1
+                    self._store(client, seq, self.order, np.frombuffer(payload, dtype=RECORD))
+                    self._broadcast(DELTA, client, seq, payload, self.order)
+        except OSError:
+            pass
+        finally:
+            with self.lock:
+                del self.clients[client]
+                # Its deltas stay for late joiners, but its pen and settings
+                # need not be restored after the next clear
+                self.states.pop(client, None)
+                self._broadcast(LEAVE, client)
+            try:
+                outbox.put_nowait(None)
+            except queue.Full:
+                _shutdown(sock)  # Unblocks the sender, which then stops
+            sender.join(timeout=1.0)
+    
+    def send_worker(self, sock, outbox):
+        """
+        Background thread sending the queued messages of one client.
+        
+        Args:
+            sock (socket.socket): Client connection
+            outbox (queue.Queue): Packed messages, then None to stop
+        """
+        while True:
+            data = outbox.get()
+            if data is None:
+                break
+            try:
+                sock.sendall(data)
+            except OSError:
+                _shutdown(sock)  # The client's receiving thread notices and removes it
+                break
+    
+    def _broadcast(self, kind, client, seq=0, payload=b"", order=0):
+        # Called with the lock held; only queues, so a stalled client blocks no one
+        data = pack_message(kind, client, seq, payload, order)
+        for sock, outbox in self.clients.values():
+            try:
+                outbox.put_nowait(data)
+            except queue.Full:
+                _shutdown(sock)  # Too far behind; its own thread removes it
+    
+    def _track(self, client, records):
+        """
+        Remember the last pen and settings records of a client.
+        
+        Args:
+            client (int): Client id
+            records (numpy.ndarray): Records the client sent
+        """
+        state = self.states.setdefault(client, [None, None, 0])
+        for slot, op in ((0, OP_PEN), (1, OP_SETTINGS)):
+            found = np.flatnonzero(records["op"] == op)
+            if len(found):
+                state[slot] = records[found[-1]:found[-1] + 1].copy()
+    
+    def _store(self, client, seq, order, records):
+        """
+        Keep a delta for late joiners, dropping everything before a clear.
+        
+        Args:
+            client (int): Client id
+            seq (int): Sequence number of the delta
+            order (int): Hub order of the delta
+            records (numpy.ndarray): Records of the delta
+        """
+        clears = np.flatnonzero(records["op"] == OP_CLEAR)
+        if len(clears) == 0:
+            self._track(client, records)
+            self.messages.append((client, seq, order, records.tobytes()))
+            self.states[client][2] = seq
+            return
+        k = clears[-1]
+        self._track(client, records[:k])
+        # Each client's pen and settings at the clear; empty payloads still
+        # tell the joiner where each client's sequence numbers are
+        self.messages = []
+        for other, (pen, settings, last_seq) in self.states.items():
+            kept = [r for r in (pen, settings) if r is not None]
+            payload = np.concatenate(kept).tobytes() if kept else b""
+            self.messages.append((other, last_seq, order, payload))
+        self.messages.append((client, seq, order, records[k:].tobytes()))
+        self._track(client, records[k:])
+        self.states[client][2] = seq
+    
+    def _snapshot(self):
+        """
+        Pack the kept deltas into a snapshot payload.
+        
+        Returns:
+            bytes: zlib-compressed DELTA messages
+        """
+        return zlib.compress(b"".join(pack_message(DELTA, client, seq, payload, order)
+                                      for client, seq, order, payload in self.messages))
+
+class CanvasSync:
+    """
+    Shares a canvas with other AirDraw instances through a SyncHub.
+    
+    Local operations are taken from the canvas's operation log, so a delta is
+    the same compact records the log stores (points, erase points, settings
+    and clears), and bandwidth grows with the ink drawn rather than with the
+    frame size. Remote operations are applied with their own pens and
+    settings, in the order of each client's sequence numbers, and written to
+    the canvas's log too, so the session log replays the whole shared drawing.
+    
+    Strokes are stacked in the order the hub relayed their deltas, so
+    overlapping strokes look the same on every canvas. A local stroke stays on
+    top until the hub echoes its delta back, and then moves to its place.
+    
+    Undo and redo are disabled while sharing, since undoing on one canvas
+    cannot be replayed the same way on the others.
+    """
+    
+    # Pen ids of local hands; remote pens get the ids above
+    LOCAL_PENS = 16
+    
+    # Canvas settings shared by all pens, kept separately for every client
+    SETTINGS = ("brush_thickness", "special_effect", "line_mode", "drawing_mode", "stroke_eraser")
+    
+    # Stroke z-order is hub order * ORDER_SCALE + index of the stroke in its
+    # delta; local strokes the hub has not ordered yet sit above PENDING_ORDER
+    ORDER_SCALE = 1 << 16
+    PENDING_ORDER = 1 << 62
+    
+    def __init__(self, canvas, host="127.0.0.1", port=8765, timeout=5.0):
+        """
+        Connect to a hub and start sharing a canvas.
+        
+        Args:
+            canvas (DrawingCanvas): Canvas to share
+            host (str): Hub address
+            port (int): Hub port
+            timeout (float): Seconds to wait for the connection
+        
+        Raises:
+            OSError: If the hub cannot be reached
+        """
+        self.canvas = canvas
+        self.sock = socket.create_connection((host, port), timeout)
+        self.sock.settimeout(None)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        message = recv_message(self.sock)
+        if message is None or message[0] != WELCOME:
+            self.sock.close()
+            raise ConnectionError(f"{host}:{port} is not an AirDraw hub")
+        self.client_id = message[1]
+        
+        self.seq = 0
+        self.outbox = []  # Local records not sent yet
+        self.inbox = queue.Queue()  # Messages received from the hub
+        self.last_seq = {}  # Client id -> sequence number of its last applied delta
+        self.pending = {}  # Client id -> {seq: records} received out of order
+        self.remotes = {}  # Client id -> (pen id, values of SETTINGS)
+        self.pen_map = {}  # (client id, remote pen id) -> local pen id
+        self.unconfirmed = {}  # Seq -> local strokes created in that delta, until the hub echoes it
+        self.top_order = 0  # Highest hub order applied so far
+        self.applying = False
+        self.apply_order = 0  # Hub order of the delta being applied
+        self.applied_strokes = 0  # Strokes created by that delta so far
+        self.sent_bytes = 0
+        self.received_bytes = 0
+        self.error = None
+        
+        canvas.undo_enabled = False
+        canvas.history.clear()
+        if canvas.log is None:
+            canvas.start_log(os.devnull)
+        self.log = canvas.log
+        self.log.listeners.append(self._on_records)
+        canvas.stroke_order = self._stroke_order
+        
+        self.send_queue = queue.Queue()
+        self.threads = [threading.Thread(target=self.send_worker), threading.Thread(target=self.receive_worker)]
+        for thread in self.threads:
+            thread.daemon = True
+            thread.start()
+    
+    def _on_records(self, records):
+        if not self.applying:  # Remote records are logged but not sent back
+            self.outbox.append(records.copy())
+    
+    def _stroke_order(self, stroke):
+        """
+        Get the z-order of a new stroke.
+        
+        Args:
+            stroke (Stroke): Stroke just created on the canvas
+        
+        Returns:
+            int: Z-order of the stroke
+        """
+        if self.applying:
+            order = self.apply_order * self.ORDER_SCALE + self.applied_strokes
+            self.applied_strokes += 1
+            return order
+        # Sent with the next delta; ordered once the hub echoes it
+        self.unconfirmed.setdefault(self.seq + 1, []).append(stroke)
+        return self.PENDING_ORDER + stroke.order
+    
+    def update(self):
+        """
+        Send the local operations since the last call and apply the remote
+        operations received since. Call once per frame from the thread that
+        draws on the canvas.
+        """
+        if self.outbox:
+            payload = np.concatenate(self.outbox).tobytes()
+            self.outbox.clear()
+            self.seq += 1
+            self.send_queue.put((self.seq, payload))
+        while True:
+            try:
+                kind, client, seq, order, payload = self.inbox.get_nowait()
+            except queue.Empty:
+                break
+            if kind == DELTA and client == self.client_id:
+                self._confirm(seq, order)
+            elif kind == DELTA:
+                self._receive(client, seq, order, np.frombuffer(payload, dtype=RECORD))
+            elif kind == SNAPSHOT:
+                data = zlib.decompress(payload)
+                pos = 0
+                while pos < len(data):
+                    _, client, seq, order, length = HEADER.unpack_from(data, pos)
+                    pos += HEADER.size
+                    self._apply(client, np.frombuffer(data[pos:pos + length], dtype=RECORD), order)
+                    self.last_seq[client] = seq
+                    pos += length
+            elif kind == LEAVE:
+                for key in [key for key in self.pen_map if key[0] == client]:
+                    self.canvas.remove_pen(self.pen_map.pop(key))
+                self.remotes.pop(client, None)
+    
+    def _confirm(self, seq, order):
+        """
+        Move the local strokes of a delta the hub echoed back to its order.
+        
+        Args:
+            seq (int): Sequence number of the delta
+            order (int): Hub order of the delta
+        """
+        strokes = self.unconfirmed.pop(seq, None)
+        if not strokes:
+            return
+        for i, stroke in enumerate(strokes):
+            stroke.order = order * self.ORDER_SCALE + i
+            # Remote strokes ordered after it were drawn below it so far
+            bbox = stroke.bbox() if order < self.top_order else None
+            if bbox is not None:
+                self.canvas.dirty.mark(*bbox)
+        self.top_order = max(self.top_order, order)
+        self.canvas.strokes.sort(key=lambda s: s.order)
+    
+    def _receive(self, client, seq, order, records):
+        """
+        Apply a remote delta once every earlier delta of its client is applied.
+        
+        Args:
+            client (int): Client id
+            seq (int): Sequence number of the delta
+            order (int): Hub order of the delta
+            records (numpy.ndarray): Records of the delta
+        """
+        last = self.last_seq.get(client, 0)
+        if seq <= last:
+            return  # Already applied
+        waiting = self.pending.setdefault(client, {})
+        waiting[seq] = (order, records)
+        while last + 1 in waiting:
+            last += 1
+            order, records = waiting.pop(last)
+            self._apply(client, records, order)
+        self.last_seq[client] = last
+    
+    def _local_pen(self, client, pen_id):
+        """
+        Get the local pen id of a remote client's pen, assigning the lowest
+        free id above the local pens the first time. Ids of clients that left
+        are reused, so they stay small however many clients come and go.
+        
+        Args:
+            client (int): Client id
+            pen_id (int): Pen id on the client
+        
+        Returns:
+            int: Local pen id
+        """
+        key = (client, pen_id)
+        local = self.pen_map.get(key)
+        if local is None:
+            used = set(self.pen_map.values())
+            local = self.LOCAL_PENS
+            while local in used:
+                local += 1
+            self.pen_map[key] = local
+        return local
+    
+    def _apply(self, client, records, order):
+        """
+        Apply remote records with the client's pens and settings, keeping the
+        local pen and settings as they are.
+        
+        Args:
+            client (int): Client id
+            records (numpy.ndarray): Records to apply
+            order (int): Hub order of the records' delta
+        """
+        if len(records) == 0:
+            return
+        canvas = self.canvas
+        records = records.copy()
+        pens = records["op"] == OP_PEN
+        records["arg"][pens] = [self._local_pen(client, int(pen_id)) for pen_id in records["arg"][pens]]
+        
+        local = (canvas.pen_id, [getattr(canvas, name) for name in self.SETTINGS])
+        self._load(self.remotes.get(client, (self._local_pen(client, 0), local[1])))
+        self.applying = True
+        self.apply_order = order
+        self.applied_strokes = 0
+        try:
+            apply_records(canvas, records, log_records=True)
+        finally:
+            self.applying = False
+            self.top_order = max(self.top_order, order)
+            if self.applied_strokes:
+                canvas.strokes.sort(key=lambda s: s.order)
+            self.remotes[client] = (canvas.pen_id, [getattr(canvas, name) for name in self.SETTINGS])
+            self._load(local)
+    
+    def _load(self, state):
+        """
+        Select a pen and set the shared settings.
+        
+        Args:
+            state (tuple): (pen id, values of SETTINGS)
+        """
+        pen_id, values = state
+        self.canvas.select_pen(pen_id)
+        for name, value in zip(self.SETTINGS, values):
+            setattr(self.canvas, name, value)
+    
+    def send_worker(self):
+        """
+        Background thread sending local deltas to the hub.
+        """
+        while True:
+            item = self.send_queue.get()
+            if item is None:
+                break
+            seq, payload = item
+            try:
+                send_message(self.sock, DELTA, self.client_id, seq, payload)
+                self.sent_bytes += HEADER.size + len(payload)
+            except OSError:
+                self.error = "Lost connection to the shared canvas hub."
+                break
+    
+    def receive_worker(self):
+        """
+        Background thread receiving messages from the hub.
+        """
+        while True:
+            try:
+                message = recv_message(self.sock)
+            except OSError:
+                message = None
+            if message is None:
+                if self.error is None:
+                    self.error = "Lost connection to the shared canvas hub."
+                break
+            self.received_bytes += HEADER.size + len(message[4])
+            self.inbox.put(message)
+    
+    def close(self):
+        """
+        Send the remaining local operations and disconnect.
+        """
+        if self.error is None:
+            self.update()
+        self.send_queue.put(None)
+        self.threads[0].join(timeout=1.0)
+        self.error = self.error or "Disconnected."
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+        self.threads[1].join(timeout=1.0)
+        if self._on_records in self.log.listeners:
+            self.log.listeners.remove(self._on_records)
+        self.canvas.stroke_order = None
+
+def parse_arguments():
+    """
+    Parse command line arguments.
+    
+    Returns:
+        argparse.Namespace: Parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="Run a hub for shared AirDraw canvases")
+    parser.add_argument("--host", type=str, default="0.0.0.0", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on")
+    return parser.parse_args()
+
+def main():
+    """
+    Run a hub until interrupted.
+    """
+    args = parse_arguments()
+    hub = SyncHub(args.host, args.port)
+    print(f"AirDraw hub listening on {args.host}:{hub.address[1]} (press Ctrl+C to stop)")
+    try:
+        hub.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        hub.server.server_close()
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
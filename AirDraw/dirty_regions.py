@@ -0,0 +1,89 @@
+class DirtyRegionTracker:
+    """
+    A class for tracking rectangular regions of the canvas that have changed.
+    Overlapping rectangles are merged as they are marked, and once the dirty
+    area covers most of the canvas it collapses into a single full-canvas rect.
+    A tracker created without a size is unbounded: rectangles are neither
+    clipped nor collapsed.
+    """
+    
+    def __init__(self, width, height, full_ratio=0.5):
+        """
+        Initialize the tracker for a canvas of the given size.
+        
+        Args:
+            width (int): Width of the canvas, or None if unbounded
+            height (int): Height of the canvas, or None if unbounded
+            full_ratio (float): Fraction of the canvas area above which the
+                whole canvas is treated as dirty
+        """
+        self.width = width
+        self.height = height
+        self.full_ratio = full_ratio
+        self.rects = []
+    
+    def mark(self, x0, y0, x1, y1):
+        """
+        Mark a rectangle as dirty.
+        
+        Args:
+            x0, y0 (int): Top-left corner (inclusive)
+            x1, y1 (int): Bottom-right corner (exclusive)
+        """
+        x0, y0, x1, y1 = int(x0), int(y0), int(x1), int(y1)
+        if self.width is not None:
+            x0, y0 = max(0, x0), max(0, y0)
+            x1, y1 = min(self.width, x1), min(self.height, y1)
+        if x0 >= x1 or y0 >= y1:
+            return
+        
+        # Absorb every rectangle that overlaps the new one
+        merged = True
+        while merged:
+            merged = False
+            for i, (ax0, ay0, ax1, ay1) in enumerate(self.rects):
+                if ax0 < x1 and x0 < ax1 and ay0 < y1 and y0 < ay1:
+                    x0, y0 = min(x0, ax0), min(y0, ay0)
+                    x1, y1 = max(x1, ax1), max(y1, ay1)
+                    del self.rects[i]
+                    merged = True
+                    break
+        self.rects.append((x0, y0, x1, y1))
+        if self.width is None:
+            return
+        
+        area = sum((r[2] - r[0]) * (r[3] - r[1]) for r in self.rects)
+        if area > self.full_ratio * self.width * self.height:
+            self.mark_all()
+    
+    def mark_all(self):
+        """
+        Mark the whole canvas as dirty.
+        """
+        self.rects = [(0, 0, self.width, self.height)]
+    
+    def resize(self, width, height):
+        """
+        Resize the tracked canvas, marking everything dirty.
+        
+        Args:
+            width (int): New width of the canvas
+            height (int): New height of the canvas
+        """
+        self.width = width
+        self.height = height
+        self.mark_all()
+    
+    def pop(self):
+        """
+        Get and clear the dirty rectangles.
+        
+        Returns:
+            list: (x0, y0, x1, y1) rectangles
+        """
+        rects = self.rects
+        self.rects = []
+        return rects
+    
+    def __bool__(self):
+        return bool(self.rects)
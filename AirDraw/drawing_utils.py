@@ -1,58 +1,659 @@
 import cv2
 import numpy as np
-import math
-import colorsys
-from collections import deque
+import itertools
+from brush_engine import BrushEngine, hue_to_bgr
+from dirty_regions import DirtyRegionTracker
+from history import TileHistory
+from spatial_index import SpatialGrid
+from stroke_log import StrokeLogWriter, OP_CLEAR, OP_PEN, OP_POINT, OP_REDO, OP_UNDO, FLAG_NEW_STROKE
+
+_stroke_order = itertools.count()
+
+class Stroke:
+    """
+    A single continuous stroke stored as compact point arrays plus its style.
+    Points are appended as the finger moves; arrays grow geometrically so memory
+    scales with what was drawn rather than with the frame size.
+    """
+    
+    def __init__(self, color, thickness, effect, line_mode, start_time=0.0, capacity=32):
+        """
+        Initialize an empty stroke.
+        
+        Args:
+            color (tuple): (B, G, R) color of the stroke
+            thickness (int): Brush thickness used for the stroke
+            effect (int): Special effect (0: None, 1: Rainbow, 2: Glow)
+            line_mode (bool): True for continuous lines, False for dots
+            start_time (float): Time the stroke was started
+            capacity (int): Initial number of points to allocate
+        """
+        self.color = tuple(int(c) for c in color)
+        self.thickness = int(thickness)
+        self.effect = int(effect)
+        self.line_mode = bool(line_mode)
+        self.start_time = float(start_time)
+        self.order = next(_stroke_order)  # Z-order of the stroke on the canvas
+        
+        self.length = 0
+        self.points = np.empty((capacity, 2), dtype=np.int32)
+        self.times = np.empty(capacity, dtype=np.float32)  # Seconds since start_time
+        self.hues = np.empty(capacity, dtype=np.uint16)  # Rainbow hue per point (0-359)
+        self.alive = np.empty(capacity, dtype=bool)  # False once a point has been erased
+        self.joined = np.empty(capacity, dtype=bool)  # True if a segment links point i-1 to i
+    
+    def __len__(self):
+        return self.length
+    
+    def _grow(self):
+        """
+        Double the capacity of the point arrays.
+        """
+        capacity = max(1, len(self.points)) * 2
+        for name in ("points", "times", "hues", "alive", "joined"):
+            old = getattr(self, name)
+            new = np.empty((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.length] = old[:self.length]
+            setattr(self, name, new)
+    
+    def append(self, x, y, current_time, hue=0):
+        """
+        Append a point to the stroke.
+        
+        Args:
+            x (int): X-coordinate
+            y (int): Y-coordinate
+            current_time (float): Time the point was drawn
+            hue (int): Rainbow hue of the point in degrees
+        
+        Returns:
+            int: Index of the new point
+        """
+        if self.length == len(self.points):
+            self._grow()
+        i = self.length
+        self.points[i] = (x, y)
+        self.times[i] = current_time - self.start_time
+        self.hues[i] = hue
+        self.alive[i] = True
+        self.joined[i] = self.line_mode and i > 0 and self.alive[i - 1]
+        self.length += 1
+        return i
+    
+    def extend(self, points, times, hues):
+        """
+        Append a run of points to the stroke.
+        
+        Args:
+            points (numpy.ndarray): (N, 2) point coordinates
+            times (numpy.ndarray): (N,) times the points were drawn
+            hues (numpy.ndarray): (N,) rainbow hues of the points in degrees
+        
+        Returns:
+            range: Indices of the new points
+        """
+        n = len(points)
+        while self.length + n > len(self.points):
+            self._grow()
+        i, j = self.length, self.length + n
+        self.points[i:j] = points
+        self.times[i:j] = np.asarray(times, dtype=np.float64) - self.start_time
+        self.hues[i:j] = hues
+        self.alive[i:j] = True
+        self.joined[i:j] = self.line_mode
+        if n:
+            self.joined[i] = self.line_mode and i > 0 and self.alive[i - 1]
+        self.length = j
+        return range(i, j)
+    
+    def same_style(self, color, thickness, effect, line_mode):
+        """
+        Check whether the stroke was drawn with the given style.
+        
+        Returns:
+            bool: True if new points with this style can extend the stroke
+        """
+        return (self.color == tuple(color) and self.thickness == thickness
+                and self.effect == effect and self.line_mode == line_mode)
+    
+    def point_colors(self, start=0, end=None):
+        """
+        Get the (B, G, R) color of each point in a range.
+        
+        Args:
+            start (int): First point index
+            end (int): One past the last point index (defaults to the stroke length)
+        
+        Returns:
+            numpy.ndarray: (N, 3) uint8 array of colors
+        """
+        end = self.length if end is None else end
+        if self.effect == 1:
+            return hue_to_bgr(self.hues[start:end])
+        return np.tile(np.array(self.color, dtype=np.uint8), (end - start, 1))
+    
+    def bbox(self):
+        """
+        Get the bounding box of the alive points, padded by the brush extent.
+        
+        Returns:
+            tuple: (x0, y0, x1, y1) or None if the stroke has no alive points
+        """
+        pts = self.points[:self.length][self.alive[:self.length]]
+        if len(pts) == 0:
+            return None
+        pad = self.extent()
+        x0, y0 = pts.min(axis=0) - pad
+        x1, y1 = pts.max(axis=0) + pad + 1
+        return (int(x0), int(y0), int(x1), int(y1))
+    
+    def points_bbox(self, indices):
+        """
+        Get the bounding box of some points and the segments leading to them,
+        padded by the brush extent.
+        
+        Args:
+            indices (numpy.ndarray): Point indices
+        
+        Returns:
+            tuple: (x0, y0, x1, y1)
+        """
+        indices = np.asarray(indices)
+        pts = np.concatenate((self.points[indices], self.points[np.maximum(indices - 1, 0)]))
+        pad = self.extent()
+        x0, y0 = pts.min(axis=0) - pad
+        x1, y1 = pts.max(axis=0) + pad + 1
+        return (int(x0), int(y0), int(x1), int(y1))
+    
+    def extent(self):
+        """
+        Get the maximum distance from a point that the stroke may paint.
+        
+        Returns:
+            int: Radius in pixels
+        """
+        return self.thickness + (4 if self.effect == 2 else 1)
+    
+    def to_arrays(self):
+        """
+        Get the point data trimmed to the stroke length.
+        
+        Returns:
+            dict: Mapping of array names to numpy arrays
+        """
+        n = self.length
+        return {
+            "points": self.points[:n],
+            "times": self.times[:n],
+            "hues": self.hues[:n],
+            "alive": self.alive[:n],
+            "joined": self.joined[:n],
+        }
+    
+    def compact(self):
+        """
+        Remove erased points from the arrays, keeping segment breaks intact.
+        """
+        n = self.length
+        keep = self.alive[:n].copy()
+        count = int(keep.sum())
+        if count == n:
+            return
+        for name in ("points", "times", "hues", "alive", "joined"):
+            arr = getattr(self, name)
+            arr[:count] = arr[:n][keep]
+        self.length = count
+    
+    def snapshot(self):
+        """
+        Copy the point data so it can be restored later.
+        
+        Returns:
+            dict: Copies of the point arrays
+        """
+        return {name: arr.copy() for name, arr in self.to_arrays().items()}
+    
+    def restore(self, state):
+        """
+        Restore point data captured by snapshot().
+        
+        Args:
+            state (dict): Point arrays as returned by snapshot()
+        """
+        n = len(state["points"])
+        for name, arr in state.items():
+            setattr(self, name, arr.copy())
+        self.length = n
+    
+    @classmethod
+    def from_arrays(cls, color, thickness, effect, line_mode, start_time, arrays):
+        """
+        Rebuild a stroke from its style and point arrays.
+        
+        Args:
+            color (tuple): (B, G, R) color of the stroke
+            thickness (int): Brush thickness
+            effect (int): Special effect index
+            line_mode (bool): True for continuous lines, False for dots
+            start_time (float): Time the stroke was started
+            arrays (dict): Point arrays as returned by to_arrays()
+        
+        Returns:
+            Stroke: The rebuilt stroke
+        """
+        n = len(arrays["points"])
+        stroke = cls(color, thickness, effect, line_mode, start_time, capacity=max(1, n))
+        for name in ("points", "times", "hues", "alive", "joined"):
+            getattr(stroke, name)[:n] = arrays[name]
+        stroke.length = n
+        return stroke
+
+class InkPalette:
+    """
+    A 256-entry color lookup table for palette-indexed canvases.
+    Index 0 is the empty canvas, the next 180 entries hold rainbow hues in
+    2-degree steps, and the remaining entries are assigned to solid ink colors
+    as they are first used.
+    """
+    
+    RAINBOW_BASE = 1
+    RAINBOW_STEPS = 180
+    
+    def __init__(self, colors=()):
+        """
+        Initialize the palette with the given solid colors.
+        
+        Args:
+            colors (list): (B, G, R) colors to reserve entries for
+        """
+        self.lut = np.zeros((256, 3), dtype=np.uint8)
+        hues = np.arange(self.RAINBOW_STEPS) * (360 // self.RAINBOW_STEPS)
+        self.lut[self.RAINBOW_BASE:self.RAINBOW_BASE + self.RAINBOW_STEPS] = hue_to_bgr(hues)
+        self.next_index = self.RAINBOW_BASE + self.RAINBOW_STEPS
+        self.indices = {}
+        for color in colors:
+            self.index_of(color)
+    
+    def index_of(self, color):
+        """
+        Get the palette index of a solid color, assigning a free entry to new
+        colors. Once the table is full, the closest existing entry is used.
+        
+        Args:
+            color (tuple): (B, G, R) color
+        
+        Returns:
+            int: Palette index
+        """
+        color = tuple(int(c) for c in color)
+        index = self.indices.get(color)
+        if index is None:
+            if self.next_index < len(self.lut):
+                index = self.next_index
+                self.next_index += 1
+                self.lut[index] = color
+            else:
+                dist = np.sum((self.lut[1:].astype(np.int32) - color) ** 2, axis=1)
+                index = int(np.argmin(dist)) + 1
+            self.indices[color] = index
+        return index
+    
+    def hue_indices(self, hues):
+        """
+        Get the palette indices of rainbow hues.
+        
+        Args:
+            hues (numpy.ndarray): Hues in degrees
+        
+        Returns:
+            numpy.ndarray: Palette indices
+        """
+        hues = np.asarray(hues, dtype=np.int64) % 360
+        return (self.RAINBOW_BASE + hues * self.RAINBOW_STEPS // 360).astype(np.uint8)
+    
+    def expand(self, image):
+        """
+        Convert an index image to BGR.
+        
+        Args:
+            image (numpy.ndarray): uint8 index image
+        
+        Returns:
+            numpy.ndarray: BGR image
+        """
+        return np.take(self.lut, image, axis=0)
+
+class Pen:
+    """
+    The drawing state of one hand: its color, the stroke it is drawing and
+    where it last drew. Brush thickness, effects and modes are shared.
+    """
+    
+    def __init__(self, color_idx=0, color=None):
+        """
+        Initialize a pen that is not drawing.
+        
+        Args:
+            color_idx (int): Index of the pen color in the color palette
+            color (tuple): (B, G, R) pen color
+        """
+        self.current_color_idx = color_idx
+        self.current_color = color
+        self.rainbow_index = 0
+        self.active_stroke = None
+        self.rendered_upto = 0  # Points of the active stroke already rasterized
+        self.prev_point = None
+        self.entry = None  # History entry the active stroke was started in
+    
+    def lift(self):
+        """
+        Lift the pen, ending its stroke.
+        """
+        self.active_stroke = None
+        self.rendered_upto = 0
+        self.prev_point = None
+        self.entry = None
+
+def _pen_attribute(name):
+    """
+    A canvas attribute stored in the selected pen.
+    
+    Args:
+        name (str): Attribute name
+    
+    Returns:
+        property: Property reading and writing the attribute of canvas.pen
+    """
+    return property(lambda self: getattr(self.pen, name),
+                    lambda self, value: setattr(self.pen, name, value))
 
 class DrawingCanvas:
     """
     A class for managing the drawing canvas and drawing operations.
     Provides functionality for different drawing modes, effects, and styles.
+    
+    Drawing is stored as a list of vector strokes. The raster canvas is only a
+    cache of those strokes: new segments are rasterized incrementally and the
+    whole drawing can be re-rendered at any resolution.
+    
+    The raster can optionally be palette-indexed: one uint8 palette index per
+    pixel instead of a BGR triple, expanded to colors only when composited.
+    Indexed canvases are drawn without anti-aliasing.
+    
+    Several hands can draw at once, each with its own Pen. Drawing calls use
+    the pen chosen with select_pen(), and the per-pen attributes below read
+    and write that pen.
     """
     
-    def __init__(self, frame_width, frame_height):
+    current_color_idx = _pen_attribute("current_color_idx")
+    current_color = _pen_attribute("current_color")
+    rainbow_index = _pen_attribute("rainbow_index")
+    active_stroke = _pen_attribute("active_stroke")
+    rendered_upto = _pen_attribute("rendered_upto")
+    prev_point = _pen_attribute("prev_point")
+    
+    def __init__(self, frame_width, frame_height, indexed=False):
         """
         Initialize the drawing canvas with specified dimensions.
         
         Args:
             frame_width (int): Width of the canvas
             frame_height (int): Height of the canvas
+            indexed (bool): Store the raster as palette indices instead of BGR
         """
+        self.indexed = indexed
+        self.line_type = cv2.LINE_8 if indexed else cv2.LINE_AA
+        
         # Create canvas with the same dimensions as the frame
-        self.canvas = np.zeros((frame_height, frame_width, 3), dtype=np.uint8)
+        self.canvas = self._new_raster(frame_height, frame_width)
+        # Coverage of every pixel by ink (0-255), and the bounding box of all ink
+        self.coverage = np.zeros((frame_height, frame_width), dtype=np.uint8)
+        self.ink_bounds = None
         self.frame_width = frame_width
         self.frame_height = frame_height
         
+        # Pens by id; pen 0 always exists and is selected by default
+        self.pen_id = 0
+        self.pen = Pen()
+        self.pens = {0: self.pen}
+        
         # Define color palette
         self.colors = [(255, 0, 0), (0, 255, 0), (0, 0, 255), (0, 255, 255), (255, 0, 255), (128, 0, 128)]  # Blue, Green, Red, Yellow, Magenta, Purple
         self.color_names = ["Blue", "Green", "Red", "Yellow", "Magenta", "Purple"]
         self.current_color_idx = 0
         self.current_color = self.colors[self.current_color_idx]
+        self.palette = InkPalette(self.colors) if indexed else None
         
         # Define brush thickness
         self.brush_thickness = 5
         
         # Define drawing variables
         self.drawing_mode = True  # True for drawing, False for erasing
+        self.stroke_eraser = False  # Erase whole strokes instead of the ink under the eraser
         self.line_mode = True  # True for continuous lines, False for dots
-        self.drawing_points = deque(maxlen=1024)
-        self.prev_point = None
+        self.strokes = []
+        self.index = SpatialGrid()
+        self.erased_points = 0  # Erased points not yet compacted away
+        self.compact_threshold = 1024
+        self.max_extent = 0  # Largest distance any stroke paints from its points
+        # Optional function giving the z-order of each new stroke, e.g. the
+        # order a shared canvas agreed on; strokes are stacked by creation otherwise
+        self.stroke_order = None
+        
+        # Regions that must be re-rendered from the strokes, and regions whose
+        # pixels changed since a consumer last asked
+        self.dirty = DirtyRegionTracker(frame_width, frame_height)
+        self.updated = DirtyRegionTracker(frame_width, frame_height)
+        
+        # Undo/redo history of raster tiles and strokes, one entry per action.
+        # Undo is disabled while the canvas is shared with other instances.
+        self.history = TileHistory()
+        self.undo_enabled = True
+        self.action = None  # Kind of the action in progress: "draw", "erase" or "clear"
+        
+        # While set, redraw_points() leaves the raster behind the strokes, so
+        # a bulk replay can render everything at once with refresh()
+        self.deferred = False
+        
+        # Optional log of every operation, see start_log()
+        self.log = None
+        self.logged_settings = None
+        self.logged_pen = 0
         
         # Special effects
         self.special_effect = 0  # 0: None, 1: Rainbow, 2: Glow
-        self.rainbow_index = 0
+        self.brush = BrushEngine()
+    
+    def _new_raster(self, height, width):
+        """
+        Allocate an empty raster in the canvas storage format.
+        
+        Args:
+            height (int): Height of the raster
+            width (int): Width of the raster
+        
+        Returns:
+            numpy.ndarray: Index image if the canvas is indexed, else BGR image
+        """
+        if self.indexed:
+            return np.zeros((height, width), dtype=np.uint8)
+        return np.zeros((height, width, 3), dtype=np.uint8)
+    
+    def _history_raster(self):
+        """
+        Get the raster the undo history keeps tiles of.
+        
+        Returns:
+            numpy.ndarray: The canvas pixels
+        """
+        return self.canvas
+    
+    def _stroke_inks(self, stroke):
+        """
+        Get the value written to the raster for each point of a stroke.
+        
+        Args:
+            stroke (Stroke): Stroke to render
+        
+        Returns:
+            numpy.ndarray: (N, 3) BGR colors, or (N,) palette indices if the
+                canvas is indexed
+        """
+        n = stroke.length
+        if not self.indexed:
+            return stroke.point_colors(0, n)
+        if stroke.effect == 1:
+            return self.palette.hue_indices(stroke.hues[:n])
+        return np.full(n, self.palette.index_of(stroke.color), dtype=np.uint8)
     
     def clear_canvas(self):
         """
-        Clear the entire canvas.
+        Clear the entire canvas. Clearing can be undone.
+        """
+        if self.log is not None:
+            self.log.append(OP_CLEAR)
+        self._begin_action("clear")
+        self._clear_raster()
+        self.strokes = []
+        self.index.clear()
+        self.erased_points = 0
+        for pen in self.pens.values():
+            pen.lift()
+        self.dirty.pop()
+    
+    def _clear_raster(self):
+        """
+        Erase all pixels of the canvas.
         """
+        self.history.before_write(self.canvas, (0, 0, self.frame_width, self.frame_height))
         self.canvas[:] = 0
-        self.drawing_points.clear()
-        self.prev_point = None
+        self.coverage[:] = 0
+        self.ink_bounds = None
+        self.updated.mark_all()
+    
+    def _begin_action(self, kind):
+        """
+        Start a new undoable action, finishing the one in progress. Nothing
+        is recorded while undo is disabled.
+        
+        Args:
+            kind (str): "draw", "erase" or "clear"
+        """
+        self.redraw_points()
+        if self.undo_enabled:
+            self.history.begin(self.strokes)
+        self.action = kind
+    
+    def undo(self):
+        """
+        Undo the most recent drawing, erasing or clearing action.
+        
+        Returns:
+            bool: True if an action was undone
+        """
+        if not self.undo_enabled:
+            return False
+        self.redraw_points()
+        restored = self._restore(self.history.undo(self._history_raster(), self.strokes))
+        if restored and self.log is not None:
+            self.log.append(OP_UNDO)
+        return restored
+    
+    def redo(self):
+        """
+        Redo the most recently undone action.
+        
+        Returns:
+            bool: True if an action was redone
+        """
+        if not self.undo_enabled:
+            return False
+        self.redraw_points()
+        restored = self._restore(self.history.redo(self._history_raster(), self.strokes))
+        if restored and self.log is not None:
+            self.log.append(OP_REDO)
+        return restored
+    
+    def _restore(self, result):
+        """
+        Bring the strokes and spatial index in line with a history entry whose
+        raster tiles have been restored.
+        
+        Args:
+            result (tuple): (entry, rects) from the history, or None
+        
+        Returns:
+            bool: True if anything was restored
+        """
+        if result is None:
+            return False
+        entry, rects = result
+        current = set(self.strokes)
+        restored = set(entry.strokes)
+        for stroke in current - restored:
+            self.index.remove_stroke(stroke)
+        for stroke, state in entry.stroke_states.items():
+            if stroke in current:
+                self.index.remove_stroke(stroke)
+            stroke.restore(state)
+            if stroke in restored:
+                self.index.insert_stroke(stroke)
+        for stroke in restored - current:
+            if stroke not in entry.stroke_states:
+                self.index.insert_stroke(stroke)
+        self.strokes = list(entry.strokes)
+        
+        for pen in self.pens.values():
+            pen.lift()
+        self.action = None
+        self.erased_points = sum(s.length - int(s.alive[:s.length].sum()) for s in self.strokes)
+        self.max_extent = max((s.extent() for s in self.strokes), default=0)
+        for rect in rects:
+            self._update_coverage(rect)
+        return True
+    
+    def select_pen(self, pen_id):
+        """
+        Select the pen later drawing calls use, creating it if needed. A new
+        pen takes the palette color after that of pen 0 by its id, so every
+        hand draws in its own color.
+        
+        Args:
+            pen_id (int): Pen id, e.g. the id of the hand holding it
+        
+        Returns:
+            Pen: The selected pen
+        """
+        pen = self.pens.get(pen_id)
+        if pen is None:
+            color_idx = (self.pens[0].current_color_idx + pen_id) % len(self.colors)
+            pen = self.pens[pen_id] = Pen(color_idx, self.colors[color_idx])
+        self.pen_id = pen_id
+        self.pen = pen
+        return pen
+    
+    def remove_pen(self, pen_id):
+        """
+        Remove a pen that is no longer used, keeping what it drew. Pen 0 is
+        only lifted, since it always exists, and pen 0 is selected if the
+        removed pen was.
+        
+        Args:
+            pen_id (int): Pen id
+        """
+        if pen_id not in self.pens:
+            return
+        self.redraw_points()
+        if pen_id == 0:
+            self.pens[0].lift()
+            return
+        del self.pens[pen_id]
+        if self.pen_id == pen_id:
+            self.select_pen(0)
     
     def set_color(self, color_idx):
         """
-        Set the current drawing color.
+        Set the drawing color of the selected pen.
         
         Args:
             color_idx (int): Index of the color in the color palette
@@ -63,12 +664,18 @@ class DrawingCanvas:
     
     def toggle_drawing_mode(self):
         """
-        Toggle between drawing and erasing modes.
+        Cycle between drawing, erasing and erasing whole strokes.
         
         Returns:
             bool: The new drawing mode
         """
-        self.drawing_mode = not self.drawing_mode
+        if self.drawing_mode:
+            self.drawing_mode = False
+        elif not self.stroke_eraser:
+            self.stroke_eraser = True
+        else:
+            self.drawing_mode = True
+            self.stroke_eraser = False
         return self.drawing_mode
     
     def toggle_line_mode(self):
@@ -97,7 +704,7 @@ class DrawingCanvas:
         
         Args:
             delta (int): Amount to change the thickness by
-            
+        
         Returns:
             int: The new brush thickness
         """
@@ -112,9 +719,7 @@ class DrawingCanvas:
             tuple: (B, G, R) color values
         """
         self.rainbow_index = (self.rainbow_index + 1) % 360
-        hue = self.rainbow_index / 360.0
-        r, g, b = [int(c * 255) for c in colorsys.hsv_to_rgb(hue, 1.0, 1.0)]
-        return (b, g, r)  # OpenCV uses BGR
+        return tuple(int(c) for c in hue_to_bgr(self.rainbow_index))
     
     def get_current_draw_color(self):
         """
@@ -127,6 +732,37 @@ class DrawingCanvas:
             return self.rainbow_color()
         return self.current_color
     
+    def _stroke_for_point(self, current_time):
+        """
+        Get the stroke new points should be added to, starting a new one when
+        the pen was lifted or the drawing style changed.
+        
+        Args:
+            current_time (float): Current time
+        
+        Returns:
+            Stroke: The active stroke
+        """
+        stroke = self.active_stroke
+        if (stroke is None or self.prev_point is None or
+                not stroke.same_style(self.current_color, self.brush_thickness,
+                                      self.special_effect, self.line_mode)):
+            self._begin_action("draw")
+            stroke = Stroke(self.current_color, self.brush_thickness,
+                            self.special_effect, self.line_mode, current_time)
+            if self.stroke_order is not None:
+                stroke.order = self.stroke_order(stroke)
+            self.strokes.append(stroke)
+            self.max_extent = max(self.max_extent, stroke.extent())
+            self.active_stroke = stroke
+            self.rendered_upto = 0
+            self.pen.entry = self.history.current
+        elif self.pen.entry is not self.history.current:
+            # Another pen started an action while this stroke was being
+            # drawn, so that action must be able to restore the stroke
+            self.history.before_modify(stroke)
+        return stroke
+    
     def draw_point(self, x, y, is_drawing, current_time):
         """
         Draw a point or line on the canvas.
@@ -136,68 +772,657 @@ class DrawingCanvas:
             y (int): Y-coordinate
             is_drawing (bool): Whether drawing is active
             current_time (float): Current time for special effects
-            
+        
         Returns:
             tuple: Updated previous point
         """
         if not is_drawing:
             return self.prev_point
         
-        draw_color = self.get_current_draw_color()
+        if self.log is not None:
+            self._log_pen(current_time)
+            self._log_settings(current_time)
+            self.log.append(OP_POINT, FLAG_NEW_STROKE if self.prev_point is None else 0,
+                            0, x, y, current_time)
         
         if self.drawing_mode:
-            # Handle line mode vs dot mode
-            if self.line_mode and self.prev_point is not None:
-                # Draw line between previous point and current point
-                cv2.line(self.canvas, self.prev_point, (x, y), draw_color, self.brush_thickness)
-                
-                # For glow effect, draw additional circles along the line
-                if self.special_effect == 2:  # Glow effect
-                    # Calculate number of points to draw based on distance
-                    dist = math.sqrt((self.prev_point[0] - x)**2 + (self.prev_point[1] - y)**2)
-                    steps = max(1, int(dist / 5))
-                    
-                    for i in range(1, steps):
-                        ix = int(self.prev_point[0] + (x - self.prev_point[0]) * i / steps)
-                        iy = int(self.prev_point[1] + (y - self.prev_point[1]) * i / steps)
-                        # Draw glow circles with varying sizes
-                        glow_radius = self.brush_thickness + 3 * math.sin(current_time * 5 + i / 2)
-                        cv2.circle(self.canvas, (ix, iy), int(glow_radius), draw_color, -1)
-                
-                self.drawing_points.append((x, y, draw_color, self.brush_thickness))
+            stroke = self._stroke_for_point(current_time)
+            if self.special_effect == 1:  # Rainbow effect
+                self.rainbow_color()
+            self.index.insert(stroke, stroke.append(x, y, current_time, self.rainbow_index))
+        else:  # Erasing mode
+            self._erase_point(x, y)
+        
+        return (x, y)
+    
+    def draw_points(self, points, times):
+        """
+        Draw a run of points in one batch, as if draw_point() had been called
+        for each of them while drawing.
+        
+        Args:
+            points (numpy.ndarray): (N, 2) point coordinates
+            times (numpy.ndarray): (N,) times the points were drawn
+        
+        Returns:
+            tuple: Updated previous point
+        """
+        points = np.asarray(points, dtype=np.int32).reshape(-1, 2)
+        times = np.asarray(times, dtype=np.float64)
+        if len(points) == 0:
+            return self.prev_point
+        
+        if self.log is not None:
+            self._log_pen(times[0])
+            self._log_settings(times[0])
+            self.log.append_points(points, times, self.prev_point is None)
+        
+        if self.drawing_mode:
+            stroke = self._stroke_for_point(times[0])
+            if self.special_effect == 1:  # Rainbow effect
+                hues = (self.rainbow_index + 1 + np.arange(len(points))) % 360
+                self.rainbow_index = int(hues[-1])
             else:
-                # Just draw a dot at the current position
-                cv2.circle(self.canvas, (x, y), self.brush_thickness, draw_color, -1)
-                self.drawing_points.append((x, y, draw_color, self.brush_thickness))
+                hues = np.full(len(points), self.rainbow_index)
+            self.index.insert_many(stroke, stroke.extend(points, times, hues))
         else:  # Erasing mode
-            # Create a black circle for erasing
-            cv2.circle(self.canvas, (x, y), self.brush_thickness * 2, (0, 0, 0), -1)
+            for x, y in points:
+                self._erase_point(int(x), int(y))
+                self.prev_point = (int(x), int(y))
+        
+        self.prev_point = (int(points[-1, 0]), int(points[-1, 1]))
+        return self.prev_point
+    
+    def _erase_point(self, x, y):
+        """
+        Erase around a point with the current brush, as part of an erase action.
+        
+        Args:
+            x (int): X-coordinate
+            y (int): Y-coordinate
+        """
+        if self.action != "erase" or self.prev_point is None:
+            self._begin_action("erase")
+        self.active_stroke = None
+        if self.stroke_eraser:
+            self.erase_strokes(x, y, self.brush_thickness * 2)
+        else:
+            self.erase(x, y, self.brush_thickness * 2)
+    
+    def start_log(self, path):
+        """
+        Start streaming every drawing operation to an append-only log that
+        stroke_log.load_log() can replay.
+        
+        Args:
+            path (str): Log file path
+        """
+        self.stop_log()
+        self.log = StrokeLogWriter(path)
+        self.logged_settings = None
+        self.logged_pen = 0
+    
+    def stop_log(self):
+        """
+        Flush and close the operation log, if any.
+        """
+        if self.log is not None:
+            self.log.close()
+            self.log = None
+    
+    def _log_pen(self, current_time):
+        """
+        Log the selected pen if another pen was used last.
+        
+        Args:
+            current_time (float): Current time
+        """
+        if self.pen_id != self.logged_pen:
+            self.log.append(OP_PEN, 0, self.pen_id, timestamp=current_time)
+            self.logged_pen = self.pen_id
+            # Log the settings again, so the pen's color is known even to a
+            # reader that starts here
+            self.logged_settings = None
+    
+    def _log_settings(self, current_time):
+        """
+        Log the drawing settings if they changed since they were last logged.
+        
+        Args:
+            current_time (float): Current time
+        """
+        settings = (self.current_color, self.brush_thickness, self.special_effect,
+                    self.line_mode, self.drawing_mode, self.stroke_eraser)
+        if settings != self.logged_settings:
+            self.log.append_settings(settings, current_time)
+            self.logged_settings = settings
+    
+    def erase(self, x, y, radius):
+        """
+        Erase everything within a circle, removing the covered points and
+        segments from the stroke model.
+        
+        Args:
+            x (int): X-coordinate of the eraser center
+            y (int): Y-coordinate of the eraser center
+            radius (int): Eraser radius
+        """
+        candidates = self.index.query(x - radius, y - radius, x + radius, y + radius)
+        for stroke, indices in candidates.items():
+            idx = np.array(indices, dtype=np.int64)
+            hit, seg_hit = self._circle_hits(stroke, idx, x, y, radius)
+            
+            killed = idx[hit]
+            cut = idx[seg_hit | hit]
+            nxt = killed + 1
+            nxt = nxt[(nxt < stroke.length) & stroke.joined[np.minimum(nxt, stroke.length - 1)]]
+            affected = np.union1d(cut, nxt)
+            if len(affected) == 0:
+                continue
             
-            # Also remove points from the drawing queue that are near the eraser
-            for i in range(len(self.drawing_points)):
-                px, py, _, _ = self.drawing_points[i]
-                # If the eraser is close to a drawn point, remove it
-                if abs(x - px) < self.brush_thickness * 2 and abs(y - py) < self.brush_thickness * 2:
-                    self.drawing_points[i] = (px, py, (0, 0, 0), 0)  # Mark for removal
+            # Re-index every entry whose point or segment changes
+            self.history.before_modify(stroke)
+            for i in affected:
+                self.index.remove(stroke, int(i))
+            stroke.alive[killed] = False
+            stroke.joined[cut] = False
+            stroke.joined[nxt] = False
+            for i in affected:
+                if stroke.alive[i]:
+                    self.index.insert(stroke, int(i))
+            self.erased_points += len(killed)
+            self.dirty.mark(*stroke.points_bbox(affected))
         
-        return (x, y)
+        if self.erased_points > max(self.compact_threshold, self.index.entry_count):
+            self.compact()
+    
+    @staticmethod
+    def _circle_hits(stroke, idx, x, y, radius):
+        """
+        Find the points and segments of a stroke that lie within a circle.
+        
+        Args:
+            stroke (Stroke): Stroke to test
+            idx (numpy.ndarray): Indices of the points to test
+            x (int): X-coordinate of the circle center
+            y (int): Y-coordinate of the circle center
+            radius (int): Circle radius
+        
+        Returns:
+            tuple: (hit, seg_hit) boolean arrays: points inside the circle, and
+                segments leading to the points that pass through it
+        """
+        center = np.array((x, y), dtype=np.float32)
+        pts = stroke.points[idx].astype(np.float32)
+        hit = np.sum((pts - center) ** 2, axis=1) < radius * radius
+        
+        # Segments passing through the eraser with both ends outside it
+        a = stroke.points[np.maximum(idx - 1, 0)].astype(np.float32)
+        ab = pts - a
+        denom = np.maximum(np.sum(ab * ab, axis=1), 1e-6)
+        u = np.clip(np.sum((center - a) * ab, axis=1) / denom, 0.0, 1.0)
+        closest = a + ab * u[:, None]
+        seg_hit = stroke.joined[idx] & (np.sum((closest - center) ** 2, axis=1) < radius * radius)
+        return hit, seg_hit
+    
+    def erase_strokes(self, x, y, radius):
+        """
+        Remove every stroke that passes within a circle. The spatial index
+        only returns the strokes with points or segments near the circle, and
+        only the areas the removed strokes covered are re-rendered, so the
+        cost does not grow with the number of strokes on the canvas.
+        
+        Args:
+            x (int): X-coordinate of the eraser center
+            y (int): Y-coordinate of the eraser center
+            radius (int): Eraser radius
+        """
+        candidates = self.index.query(x - radius, y - radius, x + radius, y + radius)
+        for stroke, indices in candidates.items():
+            hit, seg_hit = self._circle_hits(stroke, np.array(indices, dtype=np.int64), x, y, radius)
+            if not (hit.any() or seg_hit.any()):
+                continue
+            
+            alive = np.flatnonzero(stroke.alive[:stroke.length])
+            self.index.remove_stroke(stroke)
+            self.strokes.remove(stroke)
+            self.erased_points -= stroke.length - len(alive)
+            for pen in self.pens.values():
+                if pen.active_stroke is stroke:
+                    pen.lift()
+            # Mark the stroke piecewise, so a long stroke does not dirty its
+            # whole bounding box
+            for start in range(0, len(alive), 32):
+                self.dirty.mark(*stroke.points_bbox(alive[start:start + 32]))
+    
+    def compact(self):
+        """
+        Drop erased points from the stroke arrays and remove empty strokes,
+        then rebuild the spatial index.
+        """
+        self.redraw_points()
+        for stroke in self.strokes:
+            stroke.compact()
+        self.strokes = [s for s in self.strokes if s.length > 0]
+        for pen in self.pens.values():
+            if pen.active_stroke is not None:
+                if pen.active_stroke.length == 0:
+                    pen.active_stroke = None
+                pen.rendered_upto = 0 if pen.active_stroke is None else pen.active_stroke.length
+        self.index.rebuild(self.strokes)
+        self.erased_points = 0
+    
+    def _render_stroke(self, target, stroke, start=0, scale=1.0, origin=(0, 0), indices=None):
+        """
+        Rasterize part of a stroke onto a target image.
+        Segments are drawn in drawing order, then the dots and glow beads are
+        gathered into one coverage mask, which keeps the largest coverage of
+        every pixel, and blended over them once. Neither depends on which of
+        the points are rendered together, so re-rendering the points around a
+        region gives the pixels that rendering the whole stroke gives there.
+        
+        Args:
+            target (numpy.ndarray): Image to draw on
+            stroke (Stroke): Stroke to render
+            start (int): First point index to render
+            scale (float): Scale factor from canvas to target coordinates
+            origin (tuple): Canvas coordinates of the target's top-left pixel
+            indices (list): Render only these points and their segments
+        """
+        n = stroke.length
+        if indices is None:
+            if start >= n:
+                return
+            indices = np.arange(start, n)
+        idx = np.asarray(indices, dtype=np.int64)
+        idx = idx[stroke.alive[idx]]
+        if len(idx) == 0:
+            return
+        pts = stroke.points[:n] - np.array(origin, dtype=np.int32)
+        if scale != 1.0:
+            pts = np.round(pts * scale).astype(np.int32)
+        thickness = max(1, int(round(stroke.thickness * scale)))
+        inks = self._stroke_inks(stroke)
+        
+        # Continuous segments, as one contiguous (N, 2, 2) array. Drawing them
+        # as two-point polylines gives exactly the pixels of separate cv2.line
+        # calls.
+        joined = idx[stroke.joined[idx]]
+        if len(joined):
+            segments = np.ascontiguousarray(np.stack((pts[joined - 1], pts[joined]), axis=1), dtype=np.int32)
+            if stroke.effect == 1:  # Rainbow segments each have their own color
+                for (p0, p1), color in zip(segments.tolist(), inks[joined].tolist()):
+                    cv2.line(target, tuple(p0), tuple(p1), color, thickness, self.line_type)
+            else:
+                color = tuple(int(c) for c in np.atleast_1d(inks[joined[0]]))
+                cv2.polylines(target, segments, False, color, thickness, self.line_type)
+        
+        # Dots, the first point of a continuous run, and glow beads
+        if stroke.effect == 2 and stroke.line_mode:
+            dots = idx
+        else:
+            dots = idx[~stroke.joined[idx]]
+        positions = pts[dots]
+        radii = np.full(len(dots), thickness, dtype=np.int32)
+        
+        if stroke.effect == 2 and len(joined):  # Glow effect
+            times = stroke.start_time + stroke.times[joined].astype(np.float64)
+            glow_positions, glow_radii = self.brush.glow_stamps(pts[joined - 1], pts[joined], times, thickness, scale)
+            positions = np.concatenate((glow_positions, positions))
+            radii = np.concatenate((glow_radii, radii))
+        if len(positions) == 0:
+            return
+        
+        reach = int(radii.max()) + 1
+        x0, y0 = np.maximum(positions.min(axis=0) - reach, 0)
+        x1, y1 = np.minimum(positions.max(axis=0) + reach + 1, (target.shape[1], target.shape[0]))
+        if x0 >= x1 or y0 >= y1:
+            return
+        mask = np.zeros((y1 - y0, x1 - x0), dtype=np.uint8)
+        if stroke.effect != 1:
+            self.brush.accumulate(mask, (x0, y0), positions, radii)
+            self.brush.blend(target, (x0, y0), mask, inks[idx[0]])
+            return
+        
+        # Rainbow dots each have their own ink; where they overlap, the later
+        # dot's ink is used
+        labels = np.zeros(mask.shape, dtype=np.int32)
+        self.brush.accumulate(mask, (x0, y0), positions, radii, labels)
+        ys, xs = self.brush.covered(mask)
+        self.brush.blend(target, (x0, y0), mask, inks[dots][labels[ys, xs] - 1], (ys, xs))
     
     def redraw_points(self):
         """
-        Redraw all points in the drawing queue.
-        Used for dot mode or special effects that need redrawing.
+        Bring the canvas up to date with the strokes.
+        The regions around points added to the active strokes of the pens since
+        the last call, and the regions marked dirty by the eraser, are
+        re-rendered from the strokes that overlap them, so the canvas always
+        holds the pixels a full render would give. Nothing is drawn when
+        nothing changed.
+        """
+        if self.deferred:
+            return
+        for pen in self.pens.values():
+            stroke = pen.active_stroke
+            if stroke is None or pen.rendered_upto >= stroke.length:
+                continue
+            self.dirty.mark(*stroke.points_bbox(np.arange(pen.rendered_upto, stroke.length)))
+            pen.rendered_upto = stroke.length
+        
+        for rect in self.dirty.pop():
+            self._render_region(rect)
+            self._update_coverage(rect)
+    
+    def refresh(self):
+        """
+        Re-render the whole canvas from the strokes and rebuild its coverage
+        in one pass, e.g. after drawing with rendering deferred.
+        """
+        self.dirty.pop()
+        for pen in self.pens.values():
+            if pen.active_stroke is not None:
+                pen.rendered_upto = pen.active_stroke.length
+        self._clear_raster()
+        items = [(stroke, np.flatnonzero(stroke.alive[:stroke.length])) for stroke in self.strokes]
+        self._update_coverage(self._paint(items))
+    
+    def _render_region(self, rect):
+        """
+        Clear a region of the canvas and re-render the strokes that overlap it.
+        
+        Args:
+            rect (tuple): (x0, y0, x1, y1) region of the canvas
+        """
+        x0, y0, x1, y1 = rect
+        pad = self.max_extent
+        candidates = self.index.query(x0 - pad, y0 - pad, x1 + pad, y1 + pad)
+        items = [(stroke, candidates[stroke]) for stroke in sorted(candidates, key=lambda s: s.order)]
+        self._paint(items, rect)
+    
+    def _paint(self, items, rect=None):
+        """
+        Render stroke points onto the canvas through a scratch buffer that
+        holds their full geometry. OpenCV rasterizes clipped lines differently
+        from unclipped ones, so drawing unclipped keeps incremental updates and
+        region re-renders pixel-identical.
+        
+        Args:
+            items (list): (stroke, indices) pairs to render, in z-order
+            rect (tuple): If given, the (x0, y0, x1, y1) region is cleared and
+                only it is written back; otherwise ink is drawn over the canvas
+        
+        Returns:
+            tuple: (x0, y0, x1, y1) region of the canvas that was written
+        """
+        boxes = [stroke.points_bbox(indices) for stroke, indices in items if len(indices)]
+        if rect is not None:
+            boxes.append(rect)
+        if not boxes:
+            return (0, 0, 0, 0)
+        sx0, sy0 = min(b[0] for b in boxes), min(b[1] for b in boxes)
+        sx1, sy1 = max(b[2] for b in boxes), max(b[3] for b in boxes)
+        scratch = self._new_raster(sy1 - sy0, sx1 - sx0)
+        
+        # Region of the canvas to write back
+        x0, y0, x1, y1 = self._clip_rect(rect if rect is not None else (sx0, sy0, sx1, sy1))
+        if x0 >= x1 or y0 >= y1:
+            return (0, 0, 0, 0)
+        window = scratch[y0 - sy0:y1 - sy0, x0 - sx0:x1 - sx0]
+        if rect is None:
+            self._read_raster((x0, y0, x1, y1), window)
+        
+        for stroke, indices in items:
+            self._render_stroke(scratch, stroke, origin=(sx0, sy0), indices=indices)
+        self._write_raster((x0, y0, x1, y1), window)
+        return (x0, y0, x1, y1)
+    
+    def _clip_rect(self, rect):
+        """
+        Clip a rectangle to the area the canvas can store.
+        
+        Args:
+            rect (tuple): (x0, y0, x1, y1) rectangle
+        
+        Returns:
+            tuple: Clipped (x0, y0, x1, y1) rectangle
+        """
+        x0, y0, x1, y1 = rect
+        return (max(x0, 0), max(y0, 0), min(x1, self.frame_width), min(y1, self.frame_height))
+    
+    def _read_raster(self, rect, out):
+        """
+        Copy a region of the canvas pixels.
+        
+        Args:
+            rect (tuple): (x0, y0, x1, y1) region, inside the canvas
+            out (numpy.ndarray): Image to copy the region into
+        """
+        x0, y0, x1, y1 = rect
+        out[:] = self.canvas[y0:y1, x0:x1]
+    
+    def _write_raster(self, rect, pixels):
+        """
+        Overwrite a region of the canvas pixels.
+        
+        Args:
+            rect (tuple): (x0, y0, x1, y1) region, inside the canvas
+            pixels (numpy.ndarray): New pixels of the region
+        """
+        x0, y0, x1, y1 = rect
+        self.history.before_write(self.canvas, rect)
+        self.canvas[y0:y1, x0:x1] = pixels
+    
+    COVERAGE_REACH = 2  # Pixels around an ink pixel searched for its full-strength ink
+    
+    def _update_coverage(self, rect):
+        """
+        Record that a region of the canvas changed and refresh its coverage mask.
+        
+        Ink is drawn anti-aliased onto black, so a partly covered pixel holds
+        its ink scaled by its coverage. The coverage is estimated as the
+        brightest channel of a pixel divided by the brightest channel found
+        within COVERAGE_REACH pixels, which is the ink at full strength next to
+        an edge. Palette indices are written whole, so they cover fully.
+        
+        Args:
+            rect (tuple): (x0, y0, x1, y1) region of the canvas
+        """
+        x0, y0, x1, y1 = rect
+        if x0 >= x1 or y0 >= y1:
+            return
+        self.updated.mark(*rect)
+        if self.indexed:
+            region = self.coverage[y0:y1, x0:x1]
+            np.multiply(self.canvas[y0:y1, x0:x1] != 0, 255, out=region, casting="unsafe")
+        else:
+            # The estimate of the pixels around the region depends on it too
+            r = self.COVERAGE_REACH
+            height, width = self.coverage.shape
+            ox0, oy0, ox1, oy1 = max(x0 - r, 0), max(y0 - r, 0), min(x1 + r, width), min(y1 + r, height)
+            rx0, ry0, rx1, ry1 = max(ox0 - r, 0), max(oy0 - r, 0), min(ox1 + r, width), min(oy1 + r, height)
+            brightest = self.canvas[ry0:ry1, rx0:rx1].max(axis=2)
+            nearby = cv2.dilate(brightest, np.ones((2 * r + 1, 2 * r + 1), dtype=np.uint8))
+            alpha = cv2.divide(brightest, nearby, scale=255)
+            self.coverage[oy0:oy1, ox0:ox1] = alpha[oy0 - ry0:oy1 - ry0, ox0 - rx0:ox1 - rx0]
+            region = self.coverage[y0:y1, x0:x1]
+        if not region.any():
+            return
+        if self.ink_bounds is None:
+            self.ink_bounds = rect
+        else:
+            bx0, by0, bx1, by1 = self.ink_bounds
+            self.ink_bounds = (min(x0, bx0), min(y0, by0), max(x1, bx1), max(y1, by1))
+    
+    def get_coverage(self):
+        """
+        Get the mask of inked pixels and the bounding box that contains them.
+        
+        Returns:
+            tuple: (mask, bounds) with mask a uint8 image of the ink coverage
+                of every pixel (0-255), and bounds an (x0, y0, x1, y1) rectangle or None
+                if the canvas is empty
+        """
+        self.redraw_points()
+        return self.coverage, self.ink_bounds
+    
+    def pop_updated_regions(self):
+        """
+        Get the regions of the canvas whose pixels changed since the last call.
+        
+        Returns:
+            list: (x0, y0, x1, y1) rectangles
+        """
+        self.redraw_points()
+        return self.updated.pop()
+    
+    def render(self, width=None, height=None):
+        """
+        Render all strokes into a new image at any resolution.
+        
+        Args:
+            width (int): Width of the output image (defaults to the canvas width)
+            height (int): Height of the output image (defaults to the canvas height)
+        
+        Returns:
+            numpy.ndarray: The rendered image, in the canvas storage format
+        """
+        width = self.frame_width if width is None else width
+        height = self.frame_height if height is None else height
+        scale = min(width / self.frame_width, height / self.frame_height)
+        target = self._new_raster(height, width)
+        for stroke in self.strokes:
+            self._render_stroke(target, stroke, 0, scale)
+        return target
+    
+    def resize(self, frame_width, frame_height):
+        """
+        Resize the canvas, scaling the strokes and re-rendering them.
+        
+        Args:
+            frame_width (int): New width of the canvas
+            frame_height (int): New height of the canvas
+        """
+        sx = frame_width / self.frame_width
+        sy = frame_height / self.frame_height
+        for stroke in self.strokes:
+            n = stroke.length
+            stroke.points[:n] = np.round(stroke.points[:n] * (sx, sy)).astype(np.int32)
+        for pen in self.pens.values():
+            if pen.prev_point is not None:
+                pen.prev_point = (int(round(pen.prev_point[0] * sx)), int(round(pen.prev_point[1] * sy)))
+        self.frame_width = frame_width
+        self.frame_height = frame_height
+        self.index.rebuild(self.strokes)
+        self.max_extent = max((s.extent() for s in self.strokes), default=0)
+        self.history.clear()
+        self.action = None
+        self.dirty.resize(frame_width, frame_height)
+        self.dirty.pop()
+        self.updated.resize(frame_width, frame_height)
+        self.canvas = self.render()
+        self.coverage = np.zeros((frame_height, frame_width), dtype=np.uint8)
+        self.ink_bounds = None
+        self._update_coverage((0, 0, frame_width, frame_height))
+        for pen in self.pens.values():
+            if pen.active_stroke is not None:
+                pen.rendered_upto = pen.active_stroke.length
+    
+    def save_strokes(self, path):
+        """
+        Save the stroke model to a compressed .npz file.
+        
+        Args:
+            path (str): Destination file path
+        """
+        count = len(self.strokes)
+        arrays = [s.to_arrays() for s in self.strokes]
+        offsets = np.zeros(count + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([s.length for s in self.strokes])
+        
+        def concat(name, shape, dtype):
+            parts = [a[name] for a in arrays]
+            return np.concatenate(parts) if parts else np.empty(shape, dtype=dtype)
+        
+        np.savez_compressed(
+            path,
+            size=np.array((self.frame_width, self.frame_height), dtype=np.int32),
+            offsets=offsets,
+            colors=np.array([s.color for s in self.strokes], dtype=np.uint8).reshape(count, 3),
+            thickness=np.array([s.thickness for s in self.strokes], dtype=np.int16),
+            effect=np.array([s.effect for s in self.strokes], dtype=np.int8),
+            line_mode=np.array([s.line_mode for s in self.strokes], dtype=bool),
+            start_time=np.array([s.start_time for s in self.strokes], dtype=np.float64),
+            points=concat("points", (0, 2), np.int32),
+            times=concat("times", (0,), np.float32),
+            hues=concat("hues", (0,), np.uint16),
+            alive=concat("alive", (0,), bool),
+            joined=concat("joined", (0,), bool),
+        )
+    
+    def load_strokes(self, path):
+        """
+        Replace the drawing with strokes loaded from a file written by save_strokes().
+        Strokes are scaled to the current canvas size.
+        
+        Args:
+            path (str): Source file path
+        """
+        width, height, strokes = self._read_strokes(path)
+        current_size = (self.frame_width, self.frame_height)
+        self.clear_canvas()
+        self.strokes = strokes
+        self.frame_width, self.frame_height = width, height
+        self.resize(*current_size)
+    
+    @staticmethod
+    def _read_strokes(path):
+        """
+        Read strokes from a file written by save_strokes().
+        
+        Args:
+            path (str): Source file path
+        
+        Returns:
+            tuple: (width, height, strokes) with the canvas size the strokes were saved at
         """
-        if not self.line_mode or self.special_effect == 2:
-            for point in self.drawing_points:
-                x, y, color, thickness = point
-                if thickness > 0:  # Skip points marked for removal
-                    cv2.circle(self.canvas, (x, y), thickness, color, -1)
+        with np.load(path) as data:
+            width, height = (int(v) for v in data["size"])
+            offsets = data["offsets"]
+            strokes = []
+            for i in range(len(offsets) - 1):
+                a, b = offsets[i], offsets[i + 1]
+                strokes.append(Stroke.from_arrays(
+                    data["colors"][i], data["thickness"][i], data["effect"][i],
+                    data["line_mode"][i], data["start_time"][i],
+                    {name: data[name][a:b] for name in ("points", "times", "hues", "alive", "joined")}
+                ))
+        return width, height, strokes
     
     def get_canvas(self):
         """
         Get the current canvas.
         
         Returns:
-            numpy.ndarray: The current canvas
+            numpy.ndarray: The current canvas (an index image if the canvas is indexed)
+        """
+        self.redraw_points()
+        return self.canvas
+    
+    def get_palette(self):
+        """
+        Get the lookup table that maps canvas indices to colors.
+        
+        Returns:
+            numpy.ndarray: (256, 3) BGR lookup table, or None if the canvas is not indexed
+        """
+        return self.palette.lut if self.indexed else None
+    
+    def get_canvas_bgr(self):
+        """
+        Get the current canvas as a BGR image.
+        
+        Returns:
+            numpy.ndarray: The current canvas in BGR (a new image if the canvas is indexed)
         """
-        return self.canvas 
\ No newline at end of file
+        canvas = self.get_canvas()
+        return self.palette.expand(canvas) if self.indexed else canvas
\ No newline at end of file
@@ -1,5 +1,7 @@
 import mediapipe as mp
 import cv2
+import numpy as np
+import math
 import os
 import logging
 
@@ -7,14 +9,27 @@ import logging
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'  # Suppress TensorFlow logging
 logging.getLogger('mediapipe').setLevel(logging.ERROR)  # Suppress MediaPipe logging
 
+# Inference widths tried by the adaptive mode, smallest first
+INFERENCE_WIDTHS = (256, 320, 384, 480, 640)
+
 class HandTracker:
     """
     A class for tracking hand movements using MediaPipe.
     Provides functionality to detect and track hand landmarks.
+    
+    Inference runs on a copy of the frame downscaled to at most
+    `inference_width` pixels wide, so high-resolution cameras cost no more
+    than a 640-pixel-wide one. MediaPipe landmarks are normalized to the image
+    size and the aspect ratio is kept, so they map back onto the
+    full-resolution frame unchanged. In adaptive mode the tracker periodically
+    compares its landmarks with those found at `inference_width` and uses the
+    smallest width whose error stays below `max_landmark_error`.
     """
     
     def __init__(self, static_image_mode=False, max_num_hands=1, 
-                 min_detection_confidence=0.5, min_tracking_confidence=0.5):
+                 min_detection_confidence=0.5, min_tracking_confidence=0.5,
+                 inference_width=640, adaptive=False, max_landmark_error=4.0,
+                 calibration_interval=90):
         """
         Initialize the hand tracker with specified parameters.
         
@@ -23,6 +38,14 @@ class HandTracker:
             max_num_hands (int): Maximum number of hands to detect
             min_detection_confidence (float): Minimum confidence for detection
             min_tracking_confidence (float): Minimum confidence for tracking
+            inference_width (int): Maximum width of the image given to
+                MediaPipe, or None to use the full frame
+            adaptive (bool): Pick the smallest inference width that keeps the
+                landmark error below max_landmark_error
+            max_landmark_error (float): Largest acceptable mean landmark error,
+                in pixels of the full-resolution frame
+            calibration_interval (int): Frames between landmark error checks
+                in adaptive mode
         """
         self.mp_hands = mp.solutions.hands
         self.mp_drawing = mp.solutions.drawing_utils
@@ -35,6 +58,66 @@ class HandTracker:
             min_detection_confidence=min_detection_confidence,
             min_tracking_confidence=min_tracking_confidence
         )
+        
+        # Inference resolution
+        self.inference_width = inference_width
+        self.adaptive = adaptive
+        self.max_landmark_error = max_landmark_error
+        self.calibration_interval = calibration_interval
+        self.active_width = None  # Width currently used in adaptive mode
+        self.landmark_error = None  # Last measured landmark error in pixels
+        self.frame_count = 0
+        self.buffers = {}  # (width, height) -> (resized BGR, RGB) buffers
+        
+        # Reference tracker for adaptive mode. It treats every frame as a
+        # static image, so calibration does not disturb the tracking state.
+        self.reference_hands = None
+        if adaptive:
+            self.reference_hands = self.mp_hands.Hands(
+                static_image_mode=True,
+                max_num_hands=max_num_hands,
+                min_detection_confidence=min_detection_confidence
+            )
+    
+    def _widths(self, frame_width):
+        """
+        Get the inference widths available for a frame width.
+        
+        Args:
+            frame_width (int): Width of the full-resolution frame
+        
+        Returns:
+            list: Widths from smallest to largest; the last is the reference
+        """
+        reference = frame_width if self.inference_width is None else min(frame_width, self.inference_width)
+        return [w for w in INFERENCE_WIDTHS if w < reference] + [reference]
+    
+    def _prepare(self, frame, width):
+        """
+        Convert a frame to the RGB image given to MediaPipe, downscaling it
+        into a preallocated buffer if needed.
+        
+        Args:
+            frame (numpy.ndarray): Full-resolution BGR frame
+            width (int): Inference width
+        
+        Returns:
+            numpy.ndarray: RGB image
+        """
+        frame_height, frame_width = frame.shape[:2]
+        size = (width, max(1, round(frame_height * width / frame_width)))
+        buffers = self.buffers.get(size)
+        if buffers is None:
+            shape = (size[1], size[0], 3)
+            buffers = self.buffers[size] = (np.empty(shape, dtype=np.uint8), np.empty(shape, dtype=np.uint8))
+        resized, rgb = buffers
+        if width == frame_width:
+            cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=rgb)
+        else:
+            # Downscale first, so the color conversion runs on fewer pixels
+            cv2.resize(frame, size, dst=resized, interpolation=cv2.INTER_AREA)
+            cv2.cvtColor(resized, cv2.COLOR_BGR2RGB, dst=rgb)
+        return rgb
     
     def process_frame(self, frame):
         """
@@ -42,17 +125,86 @@ class HandTracker:
         
         Args:
             frame (numpy.ndarray): Input video frame
-            
+        
         Returns:
             results: MediaPipe hand detection results
         """
-        # Convert the BGR image to RGB
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        widths = self._widths(frame.shape[1])
+        if self.active_width not in widths:
+            self.active_width = widths[-1]
+        width = self.active_width if self.adaptive else widths[-1]
+        
+        # Convert the BGR image to RGB at the inference resolution
+        rgb_frame = self._prepare(frame, width)
         
         # Process the frame and find hands
         results = self.hands.process(rgb_frame)
+        
+        if self.adaptive:
+            self.frame_count += 1
+            if self.frame_count % self.calibration_interval == 0 and results.multi_hand_landmarks:
+                self._calibrate(frame, results, widths)
         return results
     
+    def _calibrate(self, frame, results, widths):
+        """
+        Measure the landmark error of the current inference width against the
+        reference width, and step to a larger width if it is too high or to a
+        smaller one if there is plenty of margin.
+        
+        Args:
+            frame (numpy.ndarray): Full-resolution BGR frame
+            results: MediaPipe results at the current width
+            widths (list): Available inference widths
+        """
+        i = widths.index(self.active_width)
+        if i == len(widths) - 1:
+            # Already at the reference width: try the next smaller one
+            if i > 0:
+                self.active_width = widths[i - 1]
+            return
+        reference = self.reference_hands.process(self._prepare(frame, widths[-1]))
+        error = self._landmark_error(results, reference, frame.shape[1], frame.shape[0])
+        if error is None:
+            return
+        self.landmark_error = error
+        if error > self.max_landmark_error:
+            self.active_width = widths[i + 1]
+        elif error < self.max_landmark_error / 2 and i > 0:
+            self.active_width = widths[i - 1]
+    
+    @staticmethod
+    def _landmark_error(results, reference, frame_width, frame_height):
+        """
+        Compute the mean landmark distance between two sets of results.
+        
+        Args:
+            results: MediaPipe results to check
+            reference: MediaPipe results to compare against
+            frame_width (int): Width of the full-resolution frame
+            frame_height (int): Height of the full-resolution frame
+        
+        Returns:
+            float: Worst mean landmark error over the hands in pixels, or None
+                if the two results did not find the same number of hands
+        """
+        hands = results.multi_hand_landmarks or []
+        reference_hands = reference.multi_hand_landmarks or []
+        if not hands or len(hands) != len(reference_hands):
+            return None
+        scale = np.array((frame_width, frame_height))
+        
+        def points(hand_landmarks):
+            return np.array([(l.x, l.y) for l in hand_landmarks.landmark]) * scale
+        
+        reference_points = [points(hand) for hand in reference_hands]
+        worst = 0.0
+        for hand in hands:
+            p = points(hand)
+            # Pair each hand with the closest reference hand
+            worst = max(worst, min(float(np.linalg.norm(p - r, axis=1).mean()) for r in reference_points))
+        return worst
+    
     def draw_landmarks(self, frame, hand_landmarks):
         """
         Draw hand landmarks on the frame.
@@ -60,7 +212,7 @@ class HandTracker:
         Args:
             frame (numpy.ndarray): Frame to draw on
             hand_landmarks: MediaPipe hand landmarks
-            
+        
         Returns:
             numpy.ndarray: Frame with landmarks drawn
         """
@@ -82,7 +234,7 @@ class HandTracker:
             frame_width (int): Width of the frame
             frame_height (int): Height of the frame
             landmark_index: Index of the landmark to get
-            
+        
         Returns:
             tuple: (x, y) coordinates of the landmark
         """
@@ -90,8 +242,93 @@ class HandTracker:
         x, y = int(landmark.x * frame_width), int(landmark.y * frame_height)
         return (x, y)
     
+    def get_handedness(self, results):
+        """
+        Get which hand each detected hand is.
+        
+        Args:
+            results: MediaPipe hand detection results
+        
+        Returns:
+            list: "Left" or "Right" for each hand in results.multi_hand_landmarks
+        """
+        if not results.multi_handedness:
+            return []
+        return [handedness.classification[0].label for handedness in results.multi_handedness]
+    
     def close(self):
         """
         Release resources used by the hand tracker.
         """
-        self.hands.close() 
\ No newline at end of file
+        self.hands.close()
+        if self.reference_hands is not None:
+            self.reference_hands.close() 
+
+class HandIdentities:
+    """
+    Gives every detected hand an id that stays the same from frame to frame,
+    so each hand can keep its own drawing state.
+    
+    Hands are matched to the hands of the previous frames by position, closest
+    pairs first, with a penalty when their handedness differs (MediaPipe
+    occasionally mislabels a hand for a frame). A hand unseen for more than
+    `max_missing` frames is forgotten, and new hands get the smallest free id.
+    """
+    
+    def __init__(self, max_distance=150.0, max_missing=10):
+        """
+        Initialize with no known hands.
+        
+        Args:
+            max_distance (float): Largest distance in pixels a hand can move
+                between frames and keep its id
+            max_missing (int): Frames a hand can go undetected and keep its id
+        """
+        self.max_distance = max_distance
+        self.max_missing = max_missing
+        self.tracks = {}  # Hand id -> [handedness, (x, y), frames missing]
+    
+    def update(self, hands):
+        """
+        Match the hands detected in a frame to known hands.
+        
+        Args:
+            hands (list): (handedness, (x, y)) of each detected hand, e.g. its
+                wrist position
+        
+        Returns:
+            tuple: (ids, forgotten) with the id of each detected hand and the
+                ids of hands forgotten in this frame
+        """
+        pairs = []
+        for i, (handedness, (x, y)) in enumerate(hands):
+            for hand_id, (track_handedness, (tx, ty), _) in self.tracks.items():
+                cost = math.hypot(x - tx, y - ty)
+                if handedness != track_handedness:
+                    cost += self.max_distance / 2
+                if cost <= self.max_distance:
+                    pairs.append((cost, i, hand_id))
+        pairs.sort()
+        
+        ids = [None] * len(hands)
+        matched = set()
+        for _, i, hand_id in pairs:
+            if ids[i] is None and hand_id not in matched:
+                ids[i] = hand_id
+                matched.add(hand_id)
+        for i, (handedness, position) in enumerate(hands):
+            if ids[i] is None:
+                hand_id = 0
+                while hand_id in self.tracks:
+                    hand_id += 1
+                ids[i] = hand_id
+            self.tracks[ids[i]] = [handedness, position, 0]
+        
+        forgotten = []
+        for hand_id, track in list(self.tracks.items()):
+            if hand_id not in ids:
+                track[2] += 1
+                if track[2] > self.max_missing:
+                    del self.tracks[hand_id]
+                    forgotten.append(hand_id)
+        return ids, forgotten
\ No newline at end of file
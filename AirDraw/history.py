@@ -0,0 +1,348 @@
+import numpy as np
+
+class HistoryEntry:
+    """
+    The state needed to undo or redo one drawing action: snapshots of the
+    raster tiles the action wrote to, the list of strokes, and copies of the
+    strokes it modified.
+    """
+    
+    def __init__(self, strokes):
+        """
+        Initialize an entry with the stroke list at the start of the action.
+        
+        Args:
+            strokes (list): Strokes on the canvas
+        """
+        self.tiles = {}
+        self.strokes = list(strokes)
+        self.stroke_states = {}
+        self.stroke_bytes = 0  # Total size of the stroke state copies
+    
+    def add_stroke_state(self, stroke, state):
+        """
+        Keep a copy of a stroke's point data.
+        
+        Args:
+            stroke (Stroke): Stroke the state belongs to
+            state (dict): Point arrays as returned by Stroke.snapshot()
+        
+        Returns:
+            int: Size of the state in bytes
+        """
+        self.stroke_states[stroke] = state
+        size = sum(arr.nbytes for arr in state.values())
+        self.stroke_bytes += size
+        return size
+
+class TileHistory:
+    """
+    An undo/redo history that snapshots only the fixed-size raster tiles an
+    action touched.
+    
+    Tile snapshots are read-only and shared copy-on-write: a tile that has not
+    been written since it was last captured reuses the same array, and empty
+    tiles all share one zero tile. The total size of the tile snapshots and
+    stroke copies is capped, evicting the oldest undo states first. The last
+    capture of a tile is only remembered while an entry still holds it.
+    """
+    
+    def __init__(self, tile_size=64, max_bytes=64 * 1024 * 1024):
+        """
+        Initialize an empty history.
+        
+        Args:
+            tile_size (int): Width and height of a tile in pixels
+            max_bytes (int): Maximum total size of the tile snapshots and
+                stroke copies
+        """
+        self.tile_size = tile_size
+        self.max_bytes = max_bytes
+        self.undo_stack = []
+        self.redo_stack = []
+        self.current = None  # Entry of the action in progress
+        self.versions = {}  # Tile key -> number of writes
+        self.latest = {}  # Tile key -> (version, snapshot) of the last capture
+        self.latest_keys = {}  # id(snapshot) -> tile keys whose last capture it is
+        self.refs = {}  # id(snapshot) -> [snapshot, reference count]
+        self.total_bytes = 0
+        self.zero_tiles = {}
+    
+    def tile_keys(self, rect, shape):
+        """
+        Get the tiles overlapping a rectangle of a raster.
+        
+        Args:
+            rect (tuple): (x0, y0, x1, y1) rectangle
+            shape (tuple): Shape of the raster, or None if it is unbounded
+        
+        Returns:
+            list: (tx, ty) tile keys
+        """
+        x0, y0, x1, y1 = rect
+        if shape is not None:
+            x0, y0 = max(0, x0), max(0, y0)
+            x1, y1 = min(shape[1], x1), min(shape[0], y1)
+        if x0 >= x1 or y0 >= y1:
+            return []
+        size = self.tile_size
+        return [(tx, ty)
+                for ty in range(y0 // size, (y1 - 1) // size + 1)
+                for tx in range(x0 // size, (x1 - 1) // size + 1)]
+    
+    def tile_rect(self, key, shape):
+        """
+        Get the rectangle covered by a tile.
+        
+        Args:
+            key (tuple): (tx, ty) tile key
+            shape (tuple): Shape of the raster, or None if it is unbounded
+        
+        Returns:
+            tuple: (x0, y0, x1, y1) rectangle clipped to the raster
+        """
+        tx, ty = key
+        size = self.tile_size
+        if shape is None:
+            return (tx * size, ty * size, (tx + 1) * size, (ty + 1) * size)
+        return (tx * size, ty * size, min(shape[1], (tx + 1) * size), min(shape[0], (ty + 1) * size))
+    
+    def raster_shape(self, raster):
+        """
+        Get the shape tiles are clipped to. Subclasses keeping the history of
+        other rasters override this, read_tile() and write_tile().
+        
+        Args:
+            raster (numpy.ndarray): Raster the history belongs to
+        
+        Returns:
+            tuple: Shape of the raster, or None if it is unbounded
+        """
+        return raster.shape
+    
+    def read_tile(self, raster, key):
+        """
+        Get the current pixels of a tile.
+        
+        Args:
+            raster (numpy.ndarray): Raster the tile belongs to
+            key (tuple): (tx, ty) tile key
+        
+        Returns:
+            numpy.ndarray: Pixels of the tile, possibly a view into the raster
+        """
+        x0, y0, x1, y1 = self.tile_rect(key, raster.shape)
+        return raster[y0:y1, x0:x1]
+    
+    def write_tile(self, raster, key, pixels):
+        """
+        Overwrite the pixels of a tile.
+        
+        Args:
+            raster (numpy.ndarray): Raster the tile belongs to
+            key (tuple): (tx, ty) tile key
+            pixels (numpy.ndarray): New pixels of the tile
+        """
+        x0, y0, x1, y1 = self.tile_rect(key, raster.shape)
+        raster[y0:y1, x0:x1] = pixels
+    
+    def _snapshot(self, raster, key):
+        """
+        Get a read-only snapshot of a tile, reusing the previous snapshot if
+        the tile has not been written since.
+        
+        Args:
+            raster (numpy.ndarray): Raster the tile belongs to
+            key (tuple): (tx, ty) tile key
+        
+        Returns:
+            numpy.ndarray: Tile snapshot
+        """
+        version = self.versions.get(key, 0)
+        latest = self.latest.get(key)
+        if latest is not None and latest[0] == version:
+            return latest[1]
+        tile = self.read_tile(raster, key)
+        if not tile.any():
+            shape = tile.shape + (tile.dtype.str,)
+            snapshot = self.zero_tiles.get(shape)
+            if snapshot is None:
+                snapshot = np.zeros(tile.shape, dtype=tile.dtype)
+                snapshot.setflags(write=False)
+                self.zero_tiles[shape] = snapshot
+        else:
+            snapshot = tile.copy()
+            snapshot.setflags(write=False)
+        if latest is not None:
+            self._forget_latest(key, latest[1])
+        self.latest[key] = (version, snapshot)
+        self.latest_keys.setdefault(id(snapshot), set()).add(key)
+        return snapshot
+    
+    def _forget_latest(self, key, snapshot):
+        keys = self.latest_keys.get(id(snapshot))
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.latest_keys[id(snapshot)]
+    
+    def _retain(self, snapshot):
+        ref = self.refs.get(id(snapshot))
+        if ref is None:
+            self.refs[id(snapshot)] = [snapshot, 1]
+            self.total_bytes += snapshot.nbytes
+        else:
+            ref[1] += 1
+    
+    def _release(self, snapshot):
+        ref = self.refs[id(snapshot)]
+        ref[1] -= 1
+        if ref[1] == 0:
+            del self.refs[id(snapshot)]
+            self.total_bytes -= snapshot.nbytes
+            # No entry holds the snapshot any more, so stop reusing it; the
+            # tiles' write counts are only needed to validate it
+            for key in self.latest_keys.pop(id(snapshot), ()):
+                del self.latest[key]
+                self.versions.pop(key, None)
+    
+    def _drop(self, entry):
+        for snapshot in entry.tiles.values():
+            self._release(snapshot)
+        self.total_bytes -= entry.stroke_bytes
+    
+    def begin(self, strokes):
+        """
+        Start a new action. Anything that could be redone is discarded.
+        
+        Args:
+            strokes (list): Strokes on the canvas before the action
+        """
+        self.end()
+        for entry in self.redo_stack:
+            self._drop(entry)
+        self.redo_stack.clear()
+        self.current = HistoryEntry(strokes)
+    
+    def end(self):
+        """
+        Finish the action in progress and push it onto the undo stack.
+        """
+        entry = self.current
+        self.current = None
+        if entry is None:
+            return
+        self.undo_stack.append(entry)
+        self._evict()
+    
+    def _evict(self):
+        # Keep at least the most recent state so the last action can be undone
+        while self.total_bytes > self.max_bytes and len(self.undo_stack) > 1:
+            self._drop(self.undo_stack.pop(0))
+    
+    def before_write(self, raster, rect):
+        """
+        Capture the tiles of a region before the current action writes to it.
+        
+        Args:
+            raster (numpy.ndarray): Raster about to be written
+            rect (tuple): (x0, y0, x1, y1) region about to be written
+        """
+        for key in self.tile_keys(rect, self.raster_shape(raster)):
+            if self.current is not None and key not in self.current.tiles:
+                snapshot = self._snapshot(raster, key)
+                self.current.tiles[key] = snapshot
+                self._retain(snapshot)
+            self.versions[key] = self.versions.get(key, 0) + 1
+    
+    def before_modify(self, stroke):
+        """
+        Capture a stroke before the current action modifies it.
+        
+        Args:
+            stroke (Stroke): Stroke about to be modified
+        """
+        if self.current is not None and stroke not in self.current.stroke_states:
+            self.total_bytes += self.current.add_stroke_state(stroke, stroke.snapshot())
+    
+    def _swap(self, entry, raster, strokes):
+        """
+        Build the entry that reverses `entry` from the current state, then
+        restore the raster tiles of `entry`.
+        
+        Args:
+            entry (HistoryEntry): Entry to restore
+            raster (numpy.ndarray): Raster to restore the tiles into
+            strokes (list): Current strokes on the canvas
+        
+        Returns:
+            tuple: (reverse entry, restored rectangles)
+        """
+        reverse = HistoryEntry(strokes)
+        for stroke in entry.stroke_states:
+            self.total_bytes += reverse.add_stroke_state(stroke, stroke.snapshot())
+        self.total_bytes -= entry.stroke_bytes
+        rects = []
+        for key, snapshot in entry.tiles.items():
+            current = self._snapshot(raster, key)
+            reverse.tiles[key] = current
+            self._retain(current)
+            self.write_tile(raster, key, snapshot)
+            self.versions[key] = self.versions.get(key, 0) + 1
+            self._release(snapshot)
+            rects.append(self.tile_rect(key, self.raster_shape(raster)))
+        return reverse, rects
+    
+    def undo(self, raster, strokes):
+        """
+        Undo the most recent action, restoring its raster tiles.
+        
+        Args:
+            raster (numpy.ndarray): Raster to restore the tiles into
+            strokes (list): Current strokes on the canvas
+        
+        Returns:
+            tuple: (entry, rects) with the entry whose stroke list and stroke
+                states should be restored and the rectangles of the raster that
+                changed, or None if there is nothing to undo
+        """
+        self.end()
+        if not self.undo_stack:
+            return None
+        entry = self.undo_stack.pop()
+        reverse, rects = self._swap(entry, raster, strokes)
+        self.redo_stack.append(reverse)
+        return entry, rects
+    
+    def redo(self, raster, strokes):
+        """
+        Redo the most recently undone action.
+        
+        Args:
+            raster (numpy.ndarray): Raster to restore the tiles into
+            strokes (list): Current strokes on the canvas
+        
+        Returns:
+            tuple: (entry, rects) as for undo(), or None if there is nothing to redo
+        """
+        self.end()
+        if not self.redo_stack:
+            return None
+        entry = self.redo_stack.pop()
+        reverse, rects = self._swap(entry, raster, strokes)
+        self.undo_stack.append(reverse)
+        self._evict()
+        return entry, rects
+    
+    def clear(self):
+        """
+        Forget all history.
+        """
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+        self.current = None
+        self.versions.clear()
+        self.latest.clear()
+        self.latest_keys.clear()
+        self.refs.clear()
+        self.total_bytes = 0
\ No newline at end of file
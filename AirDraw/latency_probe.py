@@ -0,0 +1,86 @@
+import time
+import cv2
+
+class LatencyProbe:
+    """
+    Measures how long it takes from capturing a camera frame to showing the
+    result on screen.
+    
+    Two latencies are recorded for every displayed frame: "video", from the
+    capture of the camera image shown, and "cursor", from the capture of the
+    frame the hand landmarks were found in. They differ when hand tracking
+    runs behind the video, as in pipeline mode. Both start when the capture
+    call returns, so they leave out the camera's own exposure and transfer
+    delay.
+    
+    To measure that too, enable the marker: a square in the bottom-right
+    corner that turns white and black every `marker_period` seconds. Film the
+    screen and your hand with an external camera, and line up the marker
+    changes in that video with the display times in the per-frame log.
+    """
+    
+    def __init__(self, stats, marker=False, marker_period=0.5, marker_size=48, log_path=None):
+        """
+        Initialize the probe.
+        
+        Args:
+            stats (LatencyStats): Statistics to record the latencies in
+            marker (bool): Draw the blinking marker
+            marker_period (float): Seconds between marker changes
+            marker_size (int): Width and height of the marker in pixels
+            log_path (str): Write the timestamps of every frame to this CSV file
+        """
+        self.stats = stats
+        self.marker = marker
+        self.marker_period = marker_period
+        self.marker_size = marker_size
+        self.marker_on = False
+        self.start = time.perf_counter()
+        self.frame_count = 0
+        self.log = None
+        if log_path:
+            self.log = open(log_path, "w")
+            self.log.write("frame,capture_s,landmarks_capture_s,displayed_s,marker_on\n")
+    
+    def draw_marker(self, frame):
+        """
+        Draw the blinking marker, if enabled, just before the frame is shown.
+        
+        Args:
+            frame (numpy.ndarray): Frame about to be shown
+        """
+        if not self.marker:
+            return
+        self.marker_on = int((time.perf_counter() - self.start) / self.marker_period) % 2 == 1
+        height, width = frame.shape[:2]
+        size = self.marker_size
+        color = (255, 255, 255) if self.marker_on else (0, 0, 0)
+        cv2.rectangle(frame, (width - size, height - size), (width - 1, height - 1), color, -1)
+    
+    def displayed(self, capture_time, landmarks_time=None):
+        """
+        Record a frame once it is on screen, i.e. after cv2.waitKey() has let
+        the window repaint.
+        
+        Args:
+            capture_time (float): time.perf_counter() when the camera image was captured
+            landmarks_time (float): time.perf_counter() when the frame the
+                hand landmarks came from was captured, if any
+        """
+        now = time.perf_counter()
+        self.stats.add("video", now - capture_time)
+        if landmarks_time is not None:
+            self.stats.add("cursor", now - landmarks_time)
+        if self.log is not None:
+            landmarks = "" if landmarks_time is None else f"{landmarks_time - self.start:.6f}"
+            self.log.write(f"{self.frame_count},{capture_time - self.start:.6f},{landmarks},"
+                           f"{now - self.start:.6f},{int(self.marker_on)}\n")
+        self.frame_count += 1
+    
+    def close(self):
+        """
+        Close the per-frame log, if any.
+        """
+        if self.log is not None:
+            self.log.close()
+            self.log = None
\ No newline at end of file
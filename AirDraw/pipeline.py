@@ -0,0 +1,314 @@
+import threading
+import time
+import cv2
+import numpy as np
+
+class Frame:
+    """
+    A camera frame held in a buffer of a FramePool.
+    Whoever receives a frame must release() it once done reading it, so the
+    buffer can be reused for a later capture.
+    """
+    
+    def __init__(self, pool, index, image):
+        self.pool = pool
+        self.index = index
+        self.image = image
+        self.seq = 0
+        self.capture_time = 0.0
+        self.refs = 0
+    
+    def retain(self):
+        """
+        Add a reference to the frame.
+        
+        Returns:
+            Frame: The frame itself
+        """
+        with self.pool.lock:
+            self.refs += 1
+        return self
+    
+    def release(self):
+        """
+        Drop a reference to the frame.
+        """
+        with self.pool.lock:
+            self.refs -= 1
+
+class FramePool:
+    """
+    A fixed set of reusable frame buffers with reference counts.
+    """
+    
+    def __init__(self, shape, count=4):
+        """
+        Allocate the frame buffers.
+        
+        Args:
+            shape (tuple): Shape of a frame
+            count (int): Number of buffers; one more than the number of frames
+                that can be held at once (capture, handoff and each consumer)
+        """
+        self.lock = threading.Lock()
+        self.frames = [Frame(self, i, np.empty(shape, dtype=np.uint8)) for i in range(count)]
+    
+    def acquire(self):
+        """
+        Get a buffer that nobody holds.
+        
+        Returns:
+            Frame: A frame with one reference, or None if every buffer is held
+        """
+        with self.lock:
+            for frame in self.frames:
+                if frame.refs == 0:
+                    frame.refs = 1
+                    return frame
+        return None
+
+class LatestSlot:
+    """
+    A single-item handoff between threads that always holds the newest item.
+    Publishing replaces the previous item, so a slow consumer skips stale
+    items instead of letting them queue up.
+    """
+    
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.item = None
+        self.seq = 0
+    
+    def put(self, item):
+        """
+        Publish an item, replacing the previous one.
+        
+        Args:
+            item: Item to publish
+        
+        Returns:
+            The replaced item, or None
+        """
+        with self.condition:
+            previous = self.item
+            self.item = item
+            self.seq += 1
+            self.condition.notify_all()
+        return previous
+    
+    def get(self, after=0, timeout=None, retain=False):
+        """
+        Get the newest item once it is newer than a sequence number.
+        
+        Args:
+            after (int): Sequence number of the last item seen
+            timeout (float): Maximum seconds to wait, or None to wait forever
+                (0 returns immediately)
+            retain (bool): Retain the item, a Frame, before returning it
+        
+        Returns:
+            tuple: (seq, item), or (after, None) if no newer item arrived in time
+        """
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.seq > after, timeout):
+                return after, None
+            item = self.item
+            if retain and item is not None:
+                # Retain before the lock is released, so the publisher cannot
+                # recycle the buffer in between
+                item.retain()
+            return self.seq, item
+
+class LatencyStats:
+    """
+    Rolling latency statistics per pipeline stage.
+    """
+    
+    def __init__(self, window=300):
+        """
+        Initialize empty statistics.
+        
+        Args:
+            window (int): Number of recent samples kept per stage
+        """
+        self.window = window
+        self.samples = {}
+        self.lock = threading.Lock()
+    
+    def add(self, stage, seconds):
+        """
+        Record one latency sample.
+        
+        Args:
+            stage (str): Stage name
+            seconds (float): Latency in seconds
+        """
+        with self.lock:
+            samples = self.samples.setdefault(stage, [])
+            samples.append(seconds)
+            if len(samples) > self.window:
+                del samples[:len(samples) - self.window]
+    
+    def summary(self):
+        """
+        Get the latency distribution of every stage.
+        
+        Returns:
+            dict: Stage name -> dict of mean, p50, p95 and max in milliseconds
+        """
+        with self.lock:
+            samples = {stage: np.array(values) * 1000 for stage, values in self.samples.items() if values}
+        return {stage: {"mean": float(v.mean()), "p50": float(np.percentile(v, 50)),
+                        "p95": float(np.percentile(v, 95)), "max": float(v.max())}
+                for stage, v in samples.items()}
+    
+    def report(self):
+        """
+        Format the latency distribution of every stage.
+        
+        Returns:
+            str: One line per stage
+        """
+        return "\n".join(f"{stage:>12}: mean {s['mean']:6.1f} ms  p50 {s['p50']:6.1f} ms  "
+                         f"p95 {s['p95']:6.1f} ms  max {s['max']:6.1f} ms"
+                         for stage, s in self.summary().items())
+
+class CapturePipeline:
+    """
+    A capture thread and a hand-inference worker running concurrently with the
+    render loop.
+    
+    The capture thread reads and mirrors frames into pooled buffers and
+    publishes the newest one. The inference worker always processes the newest
+    frame and publishes its landmarks. The render loop takes the newest frame
+    with next_frame() and the newest landmarks with latest_landmarks(), which
+    never blocks. Every stage runs at its own pace, so the frame rate is set
+    by the slowest stage rather than by the sum of all of them.
+    """
+    
+    def __init__(self, cap, hand_tracker, frame_shape, flip=True):
+        """
+        Initialize the pipeline. Call start() to start the threads.
+        
+        Args:
+            cap (cv2.VideoCapture): Opened camera
+            hand_tracker (HandTracker): Hand tracker used by the inference worker
+            frame_shape (tuple): Shape of the camera frames
+            flip (bool): Mirror frames horizontally
+        """
+        self.cap = cap
+        self.hand_tracker = hand_tracker
+        self.flip = flip
+        self.pool = FramePool(frame_shape)
+        self.frames = LatestSlot()
+        self.landmarks = LatestSlot()
+        self.stats = LatencyStats()
+        self.is_running = False
+        self.error = None
+        self.threads = []
+    
+    def start(self):
+        """
+        Start the capture and inference threads.
+        """
+        self.is_running = True
+        self.threads = [threading.Thread(target=self.capture_worker), threading.Thread(target=self.inference_worker)]
+        for thread in self.threads:
+            thread.daemon = True
+            thread.start()
+    
+    def stop(self):
+        """
+        Stop the threads and wait for them to finish.
+        """
+        self.is_running = False
+        for slot in (self.frames, self.landmarks):
+            with slot.condition:
+                slot.condition.notify_all()
+        for thread in self.threads:
+            thread.join(timeout=1.0)
+    
+    def capture_worker(self):
+        """
+        Background thread reading camera frames into pooled buffers.
+        """
+        raw = np.empty(self.pool.frames[0].image.shape, dtype=np.uint8)
+        seq = 0
+        while self.is_running:
+            frame = self.pool.acquire()
+            if frame is None:
+                time.sleep(0.001)  # Every buffer is still in use
+                continue
+            start = time.perf_counter()
+            ret, captured = self.cap.read(raw)
+            capture_time = time.perf_counter()
+            if not ret:
+                frame.release()
+                self.error = "Failed to capture frame. Camera may have been disconnected."
+                self.is_running = False
+                break
+            if self.flip:
+                cv2.flip(captured, 1, dst=frame.image)
+            else:
+                np.copyto(frame.image, captured)
+            seq += 1
+            frame.seq = seq
+            frame.capture_time = capture_time
+            self.stats.add("capture", capture_time - start)
+            previous = self.frames.put(frame)
+            if previous is not None:
+                previous.release()
+        with self.frames.condition:
+            self.frames.condition.notify_all()
+    
+    def inference_worker(self):
+        """
+        Background thread running hand inference on the newest frame.
+        """
+        seen = 0
+        while self.is_running:
+            seen, frame = self.frames.get(seen, timeout=0.1, retain=True)
+            if frame is None:
+                continue
+            try:
+                start = time.perf_counter()
+                self.stats.add("queued", start - frame.capture_time)
+                results = self.hand_tracker.process_frame(frame.image)
+                done = time.perf_counter()
+                self.stats.add("inference", done - start)
+                self.landmarks.put((frame.seq, frame.capture_time, results))
+            finally:
+                frame.release()
+    
+    def next_frame(self, timeout=1.0, after=0):
+        """
+        Get the newest frame once it is newer than the last one rendered.
+        Frames are published once each, so frame and slot sequence numbers
+        are the same.
+        
+        Args:
+            timeout (float): Maximum seconds to wait
+            after (int): Sequence number of the last frame rendered
+        
+        Returns:
+            Frame: The frame, which must be released after rendering, or None
+                if no new frame arrived in time
+        """
+        _, frame = self.frames.get(after, timeout, retain=True)
+        return frame
+    
+    def latest_landmarks(self, after=0):
+        """
+        Get the newest hand landmarks without waiting.
+        
+        Args:
+            after (int): Sequence number of the last landmarks used
+        
+        Returns:
+            tuple: (seq, capture_time, results) of the newest landmarks if they
+                are newer than `after`, else None
+        """
+        _, item = self.landmarks.get(timeout=0)
+        if item is None or item[0] <= after:
+            return None
+        return item
\ No newline at end of file
@@ -0,0 +1,115 @@
+import queue
+import threading
+import time
+import cv2
+import numpy as np
+
+class VideoRecorder:
+    """
+    Records frames to a video file without slowing down the caller.
+    
+    record() copies a frame into one of a fixed set of reusable buffers and
+    queues it; a background thread encodes the queued frames. When every
+    buffer is waiting to be encoded, the "drop" policy skips the frame and
+    the "block" policy waits for a buffer to be freed.
+    
+    Frames are sampled by time, so the video plays at the speed of the
+    session (or `timelapse` times faster) whatever the frame rate of the
+    caller: a frame that stands in for several video frames is written
+    several times, and frames arriving faster than the video frame rate are
+    skipped.
+    """
+    
+    def __init__(self, path, frame_size, fps=30.0, timelapse=1.0, policy="drop", buffers=8, codec="mp4v"):
+        """
+        Open the video file and start the writer thread.
+        
+        Args:
+            path (str): Video file path
+            frame_size (tuple): (width, height) of the frames
+            fps (float): Frame rate of the video
+            timelapse (float): Speed-up of the video relative to the session
+            policy (str): "drop" or "block", what to do when every buffer is queued
+            buffers (int): Number of frame buffers
+            codec (str): FourCC code of the video codec
+        
+        Raises:
+            ValueError: If the policy is unknown
+            OSError: If the video file cannot be opened
+        """
+        if policy not in ("drop", "block"):
+            raise ValueError(f"Unknown recording policy: {policy}")
+        self.path = path
+        self.policy = policy
+        self.interval = timelapse / fps  # Session seconds per video frame
+        width, height = frame_size
+        self.writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*codec), fps, (width, height))
+        if not self.writer.isOpened():
+            raise OSError(f"Could not open {path} for writing")
+        
+        self.free = queue.Queue()
+        for _ in range(buffers):
+            self.free.put(np.empty((height, width, 3), dtype=np.uint8))
+        self.pending = queue.Queue()
+        self.start_time = None
+        self.frames_due = 0  # Video frames covered so far
+        self.written = 0
+        self.dropped = 0
+        self.thread = threading.Thread(target=self.writer_worker)
+        self.thread.daemon = True
+        self.thread.start()
+    
+    def record(self, frame, timestamp=None):
+        """
+        Queue a frame for encoding.
+        
+        Args:
+            frame (numpy.ndarray): BGR frame of the recorder's frame size
+            timestamp (float): Time the frame was shown (defaults to now)
+        
+        Returns:
+            bool: False if the frame was dropped
+        """
+        now = time.perf_counter() if timestamp is None else timestamp
+        if self.start_time is None:
+            self.start_time = now
+        due = int((now - self.start_time) / self.interval) + 1
+        if due <= self.frames_due:
+            return True  # The video already has a frame for this time
+        
+        if self.policy == "block":
+            buffer = self.free.get()
+        else:
+            try:
+                buffer = self.free.get_nowait()
+            except queue.Empty:
+                self.dropped += 1
+                return False
+        np.copyto(buffer, frame)
+        # Cover any time skipped since the previous frame, up to a second
+        repeats = min(due - self.frames_due, max(1, int(round(1.0 / self.interval))))
+        self.frames_due = due
+        self.pending.put((buffer, repeats))
+        return True
+    
+    def writer_worker(self):
+        """
+        Background thread encoding queued frames.
+        """
+        while True:
+            item = self.pending.get()
+            if item is None:
+                break
+            buffer, repeats = item
+            for _ in range(repeats):
+                self.writer.write(buffer)
+            self.written += repeats
+            self.free.put(buffer)
+    
+    def close(self):
+        """
+        Encode the queued frames and close the video file.
+        """
+        self.pending.put(None)
+        self.thread.join()
+        self.writer.release()
\ No newline at end of file
@@ -0,0 +1,51 @@
+import argparse
+import time
+import cv2
+from stroke_log import LogPlayer, load_log, read_log
+from tiled_canvas import TiledCanvas
+
+def parse_arguments():
+    """
+    Parse command line arguments.
+    
+    Returns:
+        argparse.Namespace: Parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="Replay an AirDraw session log")
+    parser.add_argument("log", type=str, help="Session log written by AirDraw")
+    parser.add_argument("--speed", type=float, default=0, help="Timelapse speed (e.g. 10 for 10x); 0 shows the final drawing")
+    parser.add_argument("--width", type=int, default=1280, help="Width of the view")
+    parser.add_argument("--height", type=int, default=720, help="Height of the view")
+    parser.add_argument("--output", type=str, help="Save the final drawing to this image file")
+    return parser.parse_args()
+
+def main():
+    """
+    Replay a session log, either all at once or as a timelapse.
+    """
+    args = parse_arguments()
+    canvas = TiledCanvas(args.width, args.height)
+    
+    if args.speed <= 0:
+        start = time.perf_counter()
+        load_log(canvas, args.log)
+        print(f"Loaded {args.log} in {(time.perf_counter() - start) * 1000:.1f} ms")
+    else:
+        player = LogPlayer(canvas, read_log(args.log), args.speed)
+        start = time.perf_counter()
+        while not player.advance(time.perf_counter() - start):
+            cv2.imshow("AirDraw Replay", canvas.get_canvas_bgr())
+            if cv2.waitKey(1) & 0xFF == 27:  # ESC key
+                break
+    
+    if args.output:
+        cv2.imwrite(args.output, canvas.get_canvas_bgr())
+        print(f"Drawing saved to {args.output}")
+    
+    cv2.imshow("AirDraw Replay", canvas.get_canvas_bgr())
+    print("Press any key to close")
+    cv2.waitKey(0)
+    cv2.destroyAllWindows()
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
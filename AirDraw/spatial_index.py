@@ -0,0 +1,171 @@
+import numpy as np
+
+class SpatialGrid:
+    """
+    A uniform grid index over stroke points and segments.
+    Each entry is a (stroke, index) pair standing for point `index` of the stroke
+    and the segment that joins it to the previous point. Queries only visit the
+    cells overlapping the query rectangle, so their cost does not depend on the
+    size of the drawing.
+    """
+    
+    def __init__(self, cell_size=32):
+        """
+        Initialize an empty grid.
+        
+        Args:
+            cell_size (int): Width and height of a grid cell in pixels
+        """
+        self.cell_size = cell_size
+        self.cells = {}
+        self.entry_count = 0
+    
+    def _cell_range(self, x0, y0, x1, y1):
+        """
+        Get the cells overlapping a rectangle.
+        
+        Args:
+            x0, y0 (int): Top-left corner (inclusive)
+            x1, y1 (int): Bottom-right corner (inclusive)
+        
+        Returns:
+            generator: (cx, cy) cell keys
+        """
+        size = self.cell_size
+        for cy in range(int(y0) // size, int(y1) // size + 1):
+            for cx in range(int(x0) // size, int(x1) // size + 1):
+                yield (cx, cy)
+    
+    def _entry_cells(self, stroke, index):
+        """
+        Get the cells covered by a point and the segment leading to it.
+        
+        Args:
+            stroke (Stroke): Stroke owning the point
+            index (int): Point index
+        
+        Returns:
+            generator: (cx, cy) cell keys
+        """
+        x, y = stroke.points[index]
+        if index > 0 and stroke.joined[index]:
+            px, py = stroke.points[index - 1]
+            return self._cell_range(min(x, px), min(y, py), max(x, px), max(y, py))
+        return self._cell_range(x, y, x, y)
+    
+    def insert(self, stroke, index):
+        """
+        Add a stroke point to the index.
+        
+        Args:
+            stroke (Stroke): Stroke owning the point
+            index (int): Point index
+        """
+        entry = (stroke, index)
+        for key in self._entry_cells(stroke, index):
+            self.cells.setdefault(key, set()).add(entry)
+        self.entry_count += 1
+    
+    def insert_many(self, stroke, indices):
+        """
+        Add stroke points to the index, finding their cells in one pass.
+        
+        Args:
+            stroke (Stroke): Stroke owning the points
+            indices (numpy.ndarray): Point indices
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        if len(indices) == 0:
+            return
+        points = stroke.points[indices]
+        joined = (indices > 0) & stroke.joined[indices]
+        previous = np.where(joined[:, None], stroke.points[np.maximum(indices - 1, 0)], points)
+        low = (np.minimum(points, previous) // self.cell_size).tolist()
+        high = (np.maximum(points, previous) // self.cell_size).tolist()
+        cells = self.cells
+        for index, (cx0, cy0), (cx1, cy1) in zip(indices.tolist(), low, high):
+            entry = (stroke, index)
+            for cy in range(cy0, cy1 + 1):
+                for cx in range(cx0, cx1 + 1):
+                    cells.setdefault((cx, cy), set()).add(entry)
+        self.entry_count += len(indices)
+    
+    def remove(self, stroke, index):
+        """
+        Remove a stroke point from the index.
+        Must be called before the point's segment flag is cleared, so that the
+        same cells are visited as on insertion.
+        
+        Args:
+            stroke (Stroke): Stroke owning the point
+            index (int): Point index
+        """
+        entry = (stroke, index)
+        for key in self._entry_cells(stroke, index):
+            cell = self.cells.get(key)
+            if cell is not None:
+                cell.discard(entry)
+                if not cell:
+                    del self.cells[key]
+        self.entry_count -= 1
+    
+    def query(self, x0, y0, x1, y1):
+        """
+        Find entries whose cells overlap a rectangle.
+        
+        Args:
+            x0, y0 (int): Top-left corner (inclusive)
+            x1, y1 (int): Bottom-right corner (inclusive)
+        
+        Returns:
+            dict: Mapping of stroke to a sorted list of candidate point indices
+        """
+        found = set()
+        for key in self._cell_range(x0, y0, x1, y1):
+            cell = self.cells.get(key)
+            if cell:
+                found.update(cell)
+        candidates = {}
+        for stroke, index in found:
+            candidates.setdefault(stroke, []).append(index)
+        for indices in candidates.values():
+            indices.sort()
+        return candidates
+    
+    def insert_stroke(self, stroke):
+        """
+        Add all alive points of a stroke to the index.
+        
+        Args:
+            stroke (Stroke): Stroke to index
+        """
+        self.insert_many(stroke, np.flatnonzero(stroke.alive[:stroke.length]))
+    
+    def remove_stroke(self, stroke):
+        """
+        Remove all alive points of a stroke from the index.
+        
+        Args:
+            stroke (Stroke): Stroke to remove
+        """
+        for index in range(stroke.length):
+            if stroke.alive[index]:
+                self.remove(stroke, index)
+    
+    def rebuild(self, strokes):
+        """
+        Rebuild the index from scratch.
+        
+        Args:
+            strokes (list): Strokes to index
+        """
+        self.clear()
+        for stroke in strokes:
+            self.insert_stroke(stroke)
+    
+    def clear(self):
+        """
+        Remove all entries.
+        """
+        self.cells.clear()
+        self.entry_count = 0
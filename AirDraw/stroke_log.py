@@ -0,0 +1,335 @@
+import os
+import struct
+import time
+import zlib
+import numpy as np
+
+# Operations recorded in the log
+OP_POINT = 0  # A point drawn or erased with the current settings
+OP_SETTINGS = 1  # Color, thickness, effect, line mode, drawing mode and eraser kind
+OP_CLEAR = 2
+OP_UNDO = 3
+OP_REDO = 4
+OP_PEN = 5  # Later points and settings belong to the pen whose id is in arg
+
+# Flags of point records
+FLAG_NEW_STROKE = 1  # The pen was lifted before this point
+
+# Flags of settings records
+FLAG_LINE_MODE = 1
+FLAG_DRAWING_MODE = 2
+FLAG_STROKE_ERASER = 4
+
+# Every operation is one fixed-size record, so whole chunks decode with a
+# single np.frombuffer call. Settings records pack the color as 0xBBGGRR in
+# x, the brush thickness in y and the special effect in arg.
+RECORD = np.dtype([
+    ("op", "u1"),
+    ("flags", "u1"),
+    ("arg", "<i2"),
+    ("x", "<i4"),
+    ("y", "<i4"),
+    ("time", "<f8"),
+])
+
+MAGIC = b"AIRDRAW-LOG1\n"
+
+class StrokeLogWriter:
+    """
+    An append-only log of canvas operations.
+    Records are collected in a preallocated array and written as independently
+    zlib-compressed chunks, either when the array fills up or when
+    `flush_interval` seconds have passed, so logging a point costs one array
+    store and a crash loses at most the last unflushed chunk.
+    
+    Functions in `listeners` are called with every run of new records, e.g. to
+    stream them to other instances. The array passed is reused afterwards, so
+    listeners must copy what they keep.
+    """
+    
+    def __init__(self, path, chunk_records=4096, flush_interval=2.0, level=6):
+        """
+        Open a log for appending, creating it if needed.
+        
+        Args:
+            path (str): Log file path
+            chunk_records (int): Maximum number of records per chunk
+            flush_interval (float): Maximum seconds between writes to disk
+            level (int): zlib compression level
+        """
+        self.path = path
+        self.buffer = np.zeros(chunk_records, dtype=RECORD)
+        self.count = 0
+        self.flush_interval = flush_interval
+        self.level = level
+        self.last_flush = time.monotonic()
+        self.listeners = []
+        self.file = open(path, "ab")
+        if self.file.tell() == 0:
+            self.file.write(MAGIC)
+    
+    def append(self, op, flags=0, arg=0, x=0, y=0, timestamp=None):
+        """
+        Append one operation.
+        
+        Args:
+            op (int): Operation code
+            flags (int): Operation flags
+            arg (int): Small integer argument
+            x (int): X-coordinate or first argument
+            y (int): Y-coordinate or second argument
+            timestamp (float): Time of the operation (defaults to now)
+        """
+        self.buffer[self.count] = (op, flags, arg, x, y, time.time() if timestamp is None else timestamp)
+        self.count += 1
+        for listener in self.listeners:
+            listener(self.buffer[self.count - 1:self.count])
+        if self.count == len(self.buffer) or time.monotonic() - self.last_flush > self.flush_interval:
+            self.flush()
+    
+    def append_points(self, points, times, new_stroke):
+        """
+        Append a run of points drawn without lifting the pen.
+        
+        Args:
+            points (numpy.ndarray): (N, 2) point coordinates
+            times (numpy.ndarray): (N,) times the points were drawn
+            new_stroke (bool): Whether the pen was lifted before the first point
+        """
+        start = 0
+        while start < len(points):
+            end = min(len(points), start + len(self.buffer) - self.count)
+            chunk = self.buffer[self.count:self.count + end - start]
+            chunk["op"] = OP_POINT
+            chunk["flags"] = 0
+            chunk["arg"] = 0
+            chunk["x"] = points[start:end, 0]
+            chunk["y"] = points[start:end, 1]
+            chunk["time"] = times[start:end]
+            if start == 0 and new_stroke:
+                chunk["flags"][0] = FLAG_NEW_STROKE
+            for listener in self.listeners:
+                listener(chunk)
+            self.count += end - start
+            start = end
+            if self.count == len(self.buffer):
+                self.flush()
+        if time.monotonic() - self.last_flush > self.flush_interval:
+            self.flush()
+    
+    def append_settings(self, settings, timestamp=None):
+        """
+        Append a change of the drawing settings.
+        
+        Args:
+            settings (tuple): (color, thickness, effect, line_mode, drawing_mode,
+                stroke_eraser)
+            timestamp (float): Time of the change (defaults to now)
+        """
+        color, thickness, effect, line_mode, drawing_mode, stroke_eraser = settings
+        b, g, r = color
+        flags = ((FLAG_LINE_MODE if line_mode else 0) | (FLAG_DRAWING_MODE if drawing_mode else 0) |
+                 (FLAG_STROKE_ERASER if stroke_eraser else 0))
+        self.append(OP_SETTINGS, flags, effect, (b << 16) | (g << 8) | r, thickness, timestamp)
+    
+    def flush(self):
+        """
+        Compress the pending records and write them to disk.
+        """
+        if self.count:
+            data = zlib.compress(self.buffer[:self.count].tobytes(), self.level)
+            self.file.write(struct.pack("<I", len(data)))
+            self.file.write(data)
+            self.file.flush()
+            self.count = 0
+        self.last_flush = time.monotonic()
+    
+    def close(self):
+        """
+        Flush the pending records and close the log.
+        """
+        self.flush()
+        self.file.close()
+
+def read_log(path):
+    """
+    Read all records of a log. A chunk cut short by a crash ends the log.
+    
+    Args:
+        path (str): Log file path
+    
+    Returns:
+        numpy.ndarray: Structured array of RECORD entries
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(MAGIC):
+        raise ValueError(f"{path} is not an AirDraw log")
+    chunks = []
+    pos = len(MAGIC)
+    while pos + 4 <= len(data):
+        size, = struct.unpack_from("<I", data, pos)
+        pos += 4
+        if pos + size > len(data):
+            break
+        try:
+            chunks.append(np.frombuffer(zlib.decompress(data[pos:pos + size]), dtype=RECORD))
+        except zlib.error:
+            break
+        pos += size
+    if not chunks:
+        return np.zeros(0, dtype=RECORD)
+    return np.concatenate(chunks)
+
+def _apply_settings(canvas, record):
+    """
+    Apply a settings record to a canvas.
+    
+    Args:
+        canvas (DrawingCanvas): Canvas to update
+        record (numpy.void): Settings record
+    """
+    packed = int(record["x"])
+    color = ((packed >> 16) & 255, (packed >> 8) & 255, packed & 255)
+    if color in canvas.colors:
+        canvas.set_color(canvas.colors.index(color))
+    else:
+        canvas.current_color = color
+    canvas.brush_thickness = int(record["y"])
+    canvas.special_effect = int(record["arg"])
+    canvas.line_mode = bool(record["flags"] & FLAG_LINE_MODE)
+    canvas.drawing_mode = bool(record["flags"] & FLAG_DRAWING_MODE)
+    canvas.stroke_eraser = bool(record["flags"] & FLAG_STROKE_ERASER)
+
+def apply_records(canvas, records, log_records=False):
+    """
+    Replay records onto a canvas. Consecutive points of one stroke are applied
+    as a single batch.
+    
+    Args:
+        canvas (DrawingCanvas): Canvas to replay onto
+        records (numpy.ndarray): Structured array of RECORD entries
+        log_records (bool): Also write the operations to the canvas's log,
+            e.g. when they come from another instance; by default they are
+            not logged again
+    """
+    if len(records) == 0:
+        return
+    op = records["op"]
+    is_point = op == OP_POINT
+    
+    # A batch starts at every non-point record, at every pen lift and after
+    # every non-point record
+    starts = ~is_point | ((records["flags"] & FLAG_NEW_STROKE) != 0)
+    starts[1:] |= ~is_point[:-1]
+    starts[0] = True
+    starts = np.flatnonzero(starts)
+    ends = np.append(starts[1:], len(records))
+    points = np.stack((records["x"], records["y"]), axis=1)
+    
+    log = canvas.log
+    if not log_records:
+        canvas.log = None
+    try:
+        for a, b in zip(starts, ends):
+            kind = op[a]
+            if kind == OP_POINT:
+                if records["flags"][a] & FLAG_NEW_STROKE:
+                    canvas.prev_point = None
+                canvas.draw_points(points[a:b], records["time"][a:b])
+            elif kind == OP_SETTINGS:
+                _apply_settings(canvas, records[a])
+            elif kind == OP_CLEAR:
+                canvas.clear_canvas()
+            elif kind == OP_UNDO:
+                canvas.undo()
+            elif kind == OP_REDO:
+                canvas.redo()
+            elif kind == OP_PEN:
+                canvas.select_pen(int(records["arg"][a]))
+    finally:
+        canvas.log = log
+
+def load_log(canvas, path):
+    """
+    Rebuild a drawing from a log all at once. Rendering is deferred while
+    the records are applied and the canvas is rendered once at the end; undo
+    history is only recorded when the log undoes something, and is cleared
+    afterwards.
+    
+    Args:
+        canvas (DrawingCanvas): Canvas to replay onto
+        path (str): Log file path
+    """
+    records = read_log(path)
+    undo_enabled = canvas.undo_enabled
+    canvas.undo_enabled = undo_enabled and bool(np.any(records["op"] == OP_UNDO))
+    canvas.deferred = True
+    try:
+        apply_records(canvas, records)
+    finally:
+        canvas.deferred = False
+        canvas.undo_enabled = undo_enabled
+        canvas.history.clear()
+    canvas.refresh()
+    canvas.redraw_points()
+
+class LogPlayer:
+    """
+    A timelapse replay of a log: each call to advance() applies the records
+    that fall in the elapsed time multiplied by the playback speed.
+    """
+    
+    def __init__(self, canvas, records, speed=1.0):
+        """
+        Initialize a replay onto a canvas.
+        
+        Args:
+            canvas (DrawingCanvas): Canvas to replay onto
+            records (numpy.ndarray): Structured array of RECORD entries
+            speed (float): Playback speed relative to the recorded session
+        """
+        self.canvas = canvas
+        self.records = records
+        self.speed = speed
+        # Session time of every record, with pauses longer than a second
+        # shortened so the timelapse does not stall
+        gaps = np.diff(records["time"], prepend=records["time"][:1])
+        self.offsets = np.cumsum(np.clip(gaps, 0.0, 1.0))
+        self.position = 0
+    
+    def advance(self, elapsed):
+        """
+        Apply every record up to a playback time.
+        
+        Args:
+            elapsed (float): Seconds since the replay started
+        
+        Returns:
+            bool: True once every record has been applied
+        """
+        end = int(np.searchsorted(self.offsets, elapsed * self.speed, side="right"))
+        if end > self.position:
+            apply_records(self.canvas, self.records[self.position:end])
+            self.position = end
+        return self.done
+    
+    @property
+    def done(self):
+        """
+        Whether every record has been applied.
+        """
+        return self.position >= len(self.records)
+
+def session_log_path(directory="sessions"):
+    """
+    Get a new log path for a drawing session, named after the current time.
+    
+    Args:
+        directory (str): Directory to keep session logs in
+    
+    Returns:
+        str: Log file path
+    """
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, time.strftime("airdraw-%Y%m%d-%H%M%S.log"))
\ No newline at end of file
@@ -0,0 +1,89 @@
+"""
+Tests for the canvas_sync module.
+"""
+import sys
+import os
+import time
+import unittest
+import numpy as np
+
+# Add the AirDraw directory to the Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from canvas_sync import CanvasSync, SyncHub
+from drawing_utils import DrawingCanvas
+
+WIDTH, HEIGHT = 320, 240
+
+class TestCanvasSync(unittest.TestCase):
+    """Test cases for canvases shared through a local hub."""
+    
+    def setUp(self):
+        self.hub = SyncHub(port=0)
+        self.hub.start()
+        self.addCleanup(self.hub.stop)
+        self.syncs = []
+    
+    def join(self):
+        canvas = DrawingCanvas(WIDTH, HEIGHT)
+        sync = CanvasSync(canvas, *self.hub.address)
+        self.addCleanup(sync.close)
+        self.syncs.append(sync)
+        return canvas, sync
+    
+    def draw(self, canvas, points, color_idx, t=0.0):
+        canvas.set_color(color_idx)
+        for x, y in points:
+            canvas.prev_point = canvas.draw_point(x, y, True, t)
+            t += 0.01
+        canvas.prev_point = None
+    
+    def settle(self):
+        for _ in range(25):
+            for sync in self.syncs:
+                sync.update()
+                sync.canvas.redraw_points()
+            time.sleep(0.02)
+    
+    def assertCanvasesEqual(self, a, b):
+        a.redraw_points()
+        b.redraw_points()
+        np.testing.assert_array_equal(a.get_canvas(), b.get_canvas())
+    
+    def test_overlapping_strokes_match(self):
+        """Test that strokes drawn at once on two canvases stack the same way on both."""
+        canvas_a, sync_a = self.join()
+        canvas_b, sync_b = self.join()
+        self.settle()
+        # Both strokes are drawn before either canvas hears of the other
+        self.draw(canvas_a, [(x, 120) for x in range(60, 260, 10)], 0)
+        self.draw(canvas_b, [(160, y) for y in range(40, 200, 10)], 2)
+        canvas_a.redraw_points()
+        canvas_b.redraw_points()
+        sync_b.update()
+        sync_a.update()
+        self.settle()
+        self.assertTrue(canvas_a.get_canvas()[120, 160].any())
+        self.assertCanvasesEqual(canvas_a, canvas_b)
+        
+        # A late joiner rebuilds the same canvas from the hub's snapshot
+        canvas_c, _ = self.join()
+        self.settle()
+        self.assertCanvasesEqual(canvas_a, canvas_c)
+    
+    def test_later_strokes_stay_on_top(self):
+        """Test that a stroke drawn after another is confirmed is drawn over it everywhere."""
+        canvas_a, _ = self.join()
+        canvas_b, _ = self.join()
+        self.settle()
+        self.draw(canvas_a, [(x, 120) for x in range(60, 260, 10)], 0)
+        self.settle()
+        self.draw(canvas_b, [(160, y) for y in range(40, 200, 10)], 2, t=1.0)
+        self.settle()
+        self.draw(canvas_a, [(x, 130) for x in range(60, 260, 10)], 1, t=2.0)
+        self.settle()
+        self.assertCanvasesEqual(canvas_a, canvas_b)
+        np.testing.assert_array_equal(canvas_a.get_canvas()[130, 160], (0, 255, 0))
+
+if __name__ == '__main__':
+    unittest.main()
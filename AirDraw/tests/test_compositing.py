@@ -0,0 +1,62 @@
+"""
+Tests for compositing the canvas over the video.
+"""
+import sys
+import os
+import unittest
+import numpy as np
+
+# Add the AirDraw directory to the Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from drawing_utils import DrawingCanvas
+from ui_manager import UIManager
+
+WIDTH, HEIGHT = 320, 240
+
+class TestOpaqueCompositing(unittest.TestCase):
+    """Test cases for painting anti-aliased ink over the video."""
+    
+    def setUp(self):
+        self.canvas = DrawingCanvas(WIDTH, HEIGHT)
+        self.canvas.set_color(0)  # Blue, (255, 0, 0)
+        t = 0.0
+        for x, y in zip(range(40, 280, 6), range(40, 200, 4)):  # A diagonal, so most edges are partly covered
+            self.canvas.prev_point = self.canvas.draw_point(x, y, True, t)
+            t += 0.01
+        self.canvas.prev_point = None
+        self.coverage, self.bounds = self.canvas.get_coverage()
+        self.ink = self.canvas.get_canvas()
+        self.frame = np.full((HEIGHT, WIDTH, 3), 255, dtype=np.uint8)
+        self.out = UIManager(WIDTH, HEIGHT).combine_frame_and_canvas(
+            self.frame.copy(), self.ink, mask=self.coverage, bounds=self.bounds, blend_mode="opaque")
+    
+    def test_coverage_is_fractional(self):
+        """Test that anti-aliased edge pixels are partly covered, in proportion to their ink."""
+        edges = (self.coverage > 0) & (self.coverage < 255)
+        self.assertGreater(edges.sum(), 0)
+        np.testing.assert_allclose(self.coverage[edges], self.ink[..., 0][edges], atol=1)
+    
+    def test_covered_pixels_are_ink(self):
+        """Test that fully covered pixels show the ink."""
+        full = self.coverage == 255
+        self.assertGreater(full.sum(), 0)
+        np.testing.assert_array_equal(self.out[full], self.ink[full])
+    
+    def test_uncovered_pixels_are_video(self):
+        """Test that pixels without ink show the video."""
+        empty = self.coverage == 0
+        np.testing.assert_array_equal(self.out[empty], self.frame[empty])
+    
+    def test_edge_pixels_blend_with_video(self):
+        """Test that edge pixels mix the ink with the video instead of darkening it."""
+        edges = (self.coverage > 0) & (self.coverage < 255)
+        alpha = self.coverage[edges].astype(np.float64) / 255
+        out = self.out[edges].astype(np.float64)
+        # Blue ink over white video: blue stays full, green and red fade with coverage
+        np.testing.assert_allclose(out[:, 0], 255, atol=1)
+        np.testing.assert_allclose(out[:, 1], 255 * (1 - alpha), atol=2)
+        np.testing.assert_allclose(out[:, 2], 255 * (1 - alpha), atol=2)
+
+if __name__ == '__main__':
+    unittest.main()
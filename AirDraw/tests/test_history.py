@@ -0,0 +1,87 @@
+"""
+Tests for the history module.
+"""
+import sys
+import os
+import unittest
+import numpy as np
+
+# Add the AirDraw directory to the Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from drawing_utils import DrawingCanvas, Stroke
+from history import TileHistory
+
+class TestTileHistory(unittest.TestCase):
+    """Test cases for the memory held by the tile history."""
+    
+    def paint(self, history, raster, rect, value):
+        history.begin([])
+        history.before_write(raster, rect)
+        x0, y0, x1, y1 = rect
+        raster[y0:y1, x0:x1] = value
+        history.end()
+    
+    def test_evicted_tiles_are_forgotten(self):
+        """Test that painting new areas does not keep every tile's last capture."""
+        raster = np.zeros((64, 64 * 200, 3), dtype=np.uint8)
+        tile_bytes = 64 * 64 * 3
+        history = TileHistory(tile_size=64, max_bytes=4 * tile_bytes)
+        for i in range(200):
+            self.paint(history, raster, (i * 64, 0, i * 64 + 10, 10), 255)
+            self.paint(history, raster, (i * 64 + 20, 0, i * 64 + 30, 10), 255)
+        self.assertLessEqual(history.total_bytes, 4 * tile_bytes)
+        self.assertLessEqual(len(history.latest), len(history.refs))
+        self.assertLessEqual(len(history.versions), len(history.refs))
+    
+    def test_stroke_copies_count_toward_cap(self):
+        """Test that stroke copies are counted and evicted with their entries."""
+        history = TileHistory(max_bytes=64 * 1024)
+        strokes = []
+        for _ in range(50):
+            stroke = Stroke((255, 0, 0), 5, 0, True)
+            for x in range(500):
+                stroke.append(x, 0, 0.0)
+            strokes.append(stroke)
+            history.begin(strokes)
+            history.before_modify(stroke)
+            history.end()
+        self.assertGreater(history.total_bytes, 0)
+        self.assertLessEqual(history.total_bytes, 64 * 1024)
+        self.assertLess(len(history.undo_stack), 50)
+        expected = sum(entry.stroke_bytes for entry in history.undo_stack)
+        self.assertEqual(history.total_bytes, expected)
+        history.clear()
+        self.assertEqual(history.total_bytes, 0)
+
+class TestCanvasUndo(unittest.TestCase):
+    """Test cases for undoing and redoing drawing on a canvas."""
+    
+    def draw_line(self, canvas, y, t):
+        for x in range(20, 200, 8):
+            canvas.prev_point = canvas.draw_point(x, y, True, t)
+            t += 0.01
+        canvas.prev_point = None
+        canvas.redraw_points()
+        return t
+    
+    def test_undo_redo_restores_pixels(self):
+        """Test that undo and redo give back the canvas of each state."""
+        canvas = DrawingCanvas(240, 160)
+        t = self.draw_line(canvas, 40, 0.0)
+        first = canvas.get_canvas().copy()
+        self.draw_line(canvas, 100, t)
+        second = canvas.get_canvas().copy()
+        self.assertTrue(canvas.undo())
+        np.testing.assert_array_equal(canvas.get_canvas(), first)
+        self.assertTrue(canvas.redo())
+        np.testing.assert_array_equal(canvas.get_canvas(), second)
+        self.assertTrue(canvas.undo())
+        self.assertTrue(canvas.undo())
+        self.assertFalse(canvas.get_canvas().any())
+        self.assertEqual(canvas.history.total_bytes,
+                         sum(canvas.history.refs[k][0].nbytes for k in canvas.history.refs)
+                         + sum(e.stroke_bytes for e in canvas.history.redo_stack + canvas.history.undo_stack))
+
+if __name__ == '__main__':
+    unittest.main()
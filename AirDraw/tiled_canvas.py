@@ -0,0 +1,429 @@
+import math
+import numpy as np
+from dirty_regions import DirtyRegionTracker
+from drawing_utils import DrawingCanvas
+from history import TileHistory
+
+class TileStore:
+    """
+    A sparse raster made of fixed-size square tiles.
+    Tiles are allocated the first time ink is written to them and freed once
+    they are blank again, so memory follows the inked area rather than the
+    extent of the raster. Coordinates may be negative.
+    """
+    
+    def __init__(self, tile_size=128, channels=3):
+        """
+        Initialize an empty tile store.
+        
+        Args:
+            tile_size (int): Width and height of a tile in pixels
+            channels (int): Channels per pixel, or None for single-channel tiles
+        """
+        self.tile_size = tile_size
+        self.channels = channels
+        self.tiles = {}
+    
+    def _new_tile(self):
+        size = self.tile_size
+        if self.channels is None:
+            return np.zeros((size, size), dtype=np.uint8)
+        return np.zeros((size, size, self.channels), dtype=np.uint8)
+    
+    def _overlaps(self, rect):
+        """
+        Get the tiles overlapping a rectangle and the part of each that overlaps.
+        
+        Args:
+            rect (tuple): (x0, y0, x1, y1) rectangle
+        
+        Returns:
+            generator: ((tx, ty), (ix0, iy0, ix1, iy1)) pairs with the
+                intersection in raster coordinates
+        """
+        x0, y0, x1, y1 = rect
+        size = self.tile_size
+        for ty in range(y0 // size, (y1 - 1) // size + 1):
+            for tx in range(x0 // size, (x1 - 1) // size + 1):
+                ix0, iy0 = max(x0, tx * size), max(y0, ty * size)
+                ix1, iy1 = min(x1, (tx + 1) * size), min(y1, (ty + 1) * size)
+                yield (tx, ty), (ix0, iy0, ix1, iy1)
+    
+    def read(self, rect, out):
+        """
+        Copy a region of the raster. Unallocated tiles read as blank.
+        
+        Args:
+            rect (tuple): (x0, y0, x1, y1) region
+            out (numpy.ndarray): Image of the region's size to copy into
+        """
+        x0, y0, x1, y1 = rect
+        out[:] = 0
+        if x0 >= x1 or y0 >= y1:
+            return
+        size = self.tile_size
+        for (tx, ty), (ix0, iy0, ix1, iy1) in self._overlaps(rect):
+            tile = self.tiles.get((tx, ty))
+            if tile is not None:
+                out[iy0 - y0:iy1 - y0, ix0 - x0:ix1 - x0] = \
+                    tile[iy0 - ty * size:iy1 - ty * size, ix0 - tx * size:ix1 - tx * size]
+    
+    def write(self, rect, pixels):
+        """
+        Overwrite a region of the raster, allocating and freeing tiles as needed.
+        
+        Args:
+            rect (tuple): (x0, y0, x1, y1) region
+            pixels (numpy.ndarray): New pixels of the region
+        """
+        x0, y0, x1, y1 = rect
+        if x0 >= x1 or y0 >= y1:
+            return
+        size = self.tile_size
+        for key, (ix0, iy0, ix1, iy1) in self._overlaps(rect):
+            part = pixels[iy0 - y0:iy1 - y0, ix0 - x0:ix1 - x0]
+            inked = part.any()
+            tile = self.tiles.get(key)
+            if tile is None:
+                if not inked:
+                    continue
+                tile = self.tiles[key] = self._new_tile()
+            tx, ty = key
+            tile[iy0 - ty * size:iy1 - ty * size, ix0 - tx * size:ix1 - tx * size] = part
+            if not inked and not tile.any():
+                del self.tiles[key]
+    
+    def bounds(self):
+        """
+        Get the rectangle covered by the allocated tiles.
+        
+        Returns:
+            tuple: (x0, y0, x1, y1) rectangle, or None if no tile is allocated
+        """
+        if not self.tiles:
+            return None
+        keys = np.array(list(self.tiles))
+        size = self.tile_size
+        (tx0, ty0), (tx1, ty1) = keys.min(axis=0), keys.max(axis=0)
+        return (int(tx0) * size, int(ty0) * size, (int(tx1) + 1) * size, (int(ty1) + 1) * size)
+    
+    @property
+    def nbytes(self):
+        """
+        Memory used by the allocated tiles in bytes.
+        """
+        return sum(tile.nbytes for tile in self.tiles.values())
+    
+    def clear(self):
+        """
+        Free all tiles.
+        """
+        self.tiles.clear()
+
+class TileStoreHistory(TileHistory):
+    """
+    An undo/redo history of the tiles of a TileStore. History tiles are the
+    store's tiles, so a snapshot is a copy of one allocated tile, and
+    unallocated tiles share the zero tile.
+    """
+    
+    def raster_shape(self, raster):
+        return None
+    
+    def read_tile(self, raster, key):
+        tile = raster.tiles.get(key)
+        return tile if tile is not None else raster._new_tile()
+    
+    def write_tile(self, raster, key, pixels):
+        raster.write(self.tile_rect(key, None), pixels)
+
+class Viewport:
+    """
+    The mapping from the camera view onto a region of an unbounded canvas.
+    A screen pixel (x, y) shows the canvas point (origin + (x, y) / zoom).
+    """
+    
+    def __init__(self, width, height, min_zoom=0.25, max_zoom=4.0):
+        """
+        Initialize a viewport showing the canvas region at the origin unscaled.
+        
+        Args:
+            width (int): Width of the view in pixels
+            height (int): Height of the view in pixels
+            min_zoom (float): Smallest allowed zoom factor
+            max_zoom (float): Largest allowed zoom factor
+        """
+        self.width = width
+        self.height = height
+        self.x = 0.0
+        self.y = 0.0
+        self.zoom = 1.0
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+    
+    def to_canvas(self, x, y):
+        """
+        Convert a screen position to canvas coordinates.
+        
+        Args:
+            x (int): X-coordinate on screen
+            y (int): Y-coordinate on screen
+        
+        Returns:
+            tuple: (x, y) canvas pixel shown at that position
+        """
+        return (int(math.floor(self.x + (x + 0.5) / self.zoom)),
+                int(math.floor(self.y + (y + 0.5) / self.zoom)))
+    
+    def to_screen_rect(self, rect):
+        """
+        Get the screen rectangle showing a canvas rectangle.
+        
+        Args:
+            rect (tuple): (x0, y0, x1, y1) canvas rectangle
+        
+        Returns:
+            tuple: (x0, y0, x1, y1) screen rectangle, possibly off screen
+        """
+        x0, y0, x1, y1 = rect
+        z = self.zoom
+        return (int(math.floor((x0 - self.x) * z)) - 1, int(math.floor((y0 - self.y) * z)) - 1,
+                int(math.ceil((x1 - self.x) * z)) + 1, int(math.ceil((y1 - self.y) * z)) + 1)
+    
+    def sample_grid(self):
+        """
+        Get the canvas pixel shown by every screen column and row.
+        
+        Returns:
+            tuple: (cols, rows) integer arrays of canvas x and y coordinates
+        """
+        cols = np.floor(self.x + (np.arange(self.width) + 0.5) / self.zoom).astype(np.int64)
+        rows = np.floor(self.y + (np.arange(self.height) + 0.5) / self.zoom).astype(np.int64)
+        return cols, rows
+    
+    def pan(self, dx, dy):
+        """
+        Move the canvas with the hand.
+        
+        Args:
+            dx (float): Horizontal movement in screen pixels
+            dy (float): Vertical movement in screen pixels
+        """
+        self.x -= dx / self.zoom
+        self.y -= dy / self.zoom
+    
+    def zoom_at(self, factor, x, y):
+        """
+        Zoom by a factor, keeping the canvas point under a screen position fixed.
+        
+        Args:
+            factor (float): Zoom factor to apply
+            x (float): X-coordinate of the zoom center on screen
+            y (float): Y-coordinate of the zoom center on screen
+        
+        Returns:
+            bool: True if the zoom changed
+        """
+        zoom = min(self.max_zoom, max(self.min_zoom, self.zoom * factor))
+        if zoom == self.zoom:
+            return False
+        self.x += x / self.zoom - x / zoom
+        self.y += y / self.zoom - y / zoom
+        self.zoom = zoom
+        return True
+    
+    def resize(self, width, height):
+        """
+        Resize the view.
+        
+        Args:
+            width (int): New width of the view
+            height (int): New height of the view
+        """
+        self.width = width
+        self.height = height
+
+class TiledCanvas(DrawingCanvas):
+    """
+    A drawing canvas without fixed bounds.
+    Strokes are stored in canvas coordinates and rasterized into a sparse
+    TileStore, so memory follows the inked area. A Viewport maps the camera
+    view onto the canvas and can be panned and zoomed; get_canvas() and
+    get_coverage() return the view, which is refreshed from the visible tiles
+    only where the drawing or the viewport changed.
+    """
+    
+    def __init__(self, frame_width, frame_height, indexed=False, tile_size=128):
+        """
+        Initialize the canvas with a view of the given frame size.
+        
+        Args:
+            frame_width (int): Width of the video frame
+            frame_height (int): Height of the video frame
+            indexed (bool): Store one palette index per pixel instead of BGR
+            tile_size (int): Width and height of a raster tile in pixels
+        """
+        super().__init__(frame_width, frame_height, indexed)
+        self.tiles = TileStore(tile_size, None if indexed else 3)
+        self.history = TileStoreHistory(tile_size)
+        self.viewport = Viewport(frame_width, frame_height)
+        self.view_cols, self.view_rows = self.viewport.sample_grid()
+        
+        # Stroke regions to re-render are in canvas coordinates and unbounded;
+        # view regions to refresh from the tiles are in screen coordinates
+        self.dirty = DirtyRegionTracker(None, None)
+        self.view_dirty = DirtyRegionTracker(frame_width, frame_height)
+    
+    def draw_point(self, x, y, is_drawing, current_time):
+        """
+        Draw a point or line at a screen position.
+        
+        Args:
+            x (int): X-coordinate on screen
+            y (int): Y-coordinate on screen
+            is_drawing (bool): Whether drawing is active
+            current_time (float): Current time for special effects
+        
+        Returns:
+            tuple: Updated previous point, in canvas coordinates
+        """
+        return super().draw_point(*self.viewport.to_canvas(x, y), is_drawing, current_time)
+    
+    def pan(self, dx, dy):
+        """
+        Pan the view.
+        
+        Args:
+            dx (float): Horizontal movement in screen pixels
+            dy (float): Vertical movement in screen pixels
+        """
+        if dx or dy:
+            self.viewport.pan(dx, dy)
+            self._view_changed()
+    
+    def zoom_at(self, factor, x, y):
+        """
+        Zoom the view around a screen position.
+        
+        Args:
+            factor (float): Zoom factor to apply
+            x (float): X-coordinate of the zoom center on screen
+            y (float): Y-coordinate of the zoom center on screen
+        """
+        if self.viewport.zoom_at(factor, x, y):
+            self._view_changed()
+    
+    def _view_changed(self):
+        self.view_cols, self.view_rows = self.viewport.sample_grid()
+        self.ink_bounds = None
+        self.view_dirty.mark_all()
+    
+    def _clip_rect(self, rect):
+        return rect
+    
+    def _read_raster(self, rect, out):
+        self.tiles.read(rect, out)
+    
+    def _history_raster(self):
+        return self.tiles
+    
+    def _write_raster(self, rect, pixels):
+        self.history.before_write(self.tiles, rect)
+        self.tiles.write(rect, pixels)
+    
+    def _clear_raster(self):
+        for key in self.tiles.tiles:
+            self.history.before_write(self.tiles, self.history.tile_rect(key, None))
+        self.tiles.clear()
+        self.canvas[:] = 0
+        self.coverage[:] = 0
+        self.ink_bounds = None
+        self.updated.mark_all()
+    
+    def _update_coverage(self, rect):
+        """
+        Record that a region of the canvas changed, so the part of the view
+        showing it is refreshed.
+        
+        Args:
+            rect (tuple): (x0, y0, x1, y1) region in canvas coordinates
+        """
+        x0, y0, x1, y1 = rect
+        if x0 < x1 and y0 < y1:
+            self.view_dirty.mark(*self.viewport.to_screen_rect(rect))
+    
+    def redraw_points(self):
+        """
+        Bring the tiles up to date with the strokes, then refresh the parts of
+        the view that changed.
+        """
+        super().redraw_points()
+        for rect in self.view_dirty.pop():
+            x0, y0, x1, y1 = rect
+            cols, rows = self.view_cols[x0:x1], self.view_rows[y0:y1]
+            source = (int(cols[0]), int(rows[0]), int(cols[-1]) + 1, int(rows[-1]) + 1)
+            if self.viewport.zoom == 1.0:
+                self.tiles.read(source, self.canvas[y0:y1, x0:x1])
+            else:
+                pixels = self._new_raster(source[3] - source[1], source[2] - source[0])
+                self.tiles.read(source, pixels)
+                self.canvas[y0:y1, x0:x1] = pixels[np.ix_(rows - source[1], cols - source[0])]
+            super()._update_coverage(rect)
+    
+    def render(self, width=None, height=None):
+        """
+        Render the strokes shown in the view into a new image at any resolution.
+        
+        Args:
+            width (int): Width of the output image (defaults to the view width)
+            height (int): Height of the output image (defaults to the view height)
+        
+        Returns:
+            numpy.ndarray: The rendered image, in the canvas storage format
+        """
+        width = self.frame_width if width is None else width
+        height = self.frame_height if height is None else height
+        scale = self.viewport.zoom * min(width / self.frame_width, height / self.frame_height)
+        origin = (int(round(self.viewport.x)), int(round(self.viewport.y)))
+        target = self._new_raster(height, width)
+        for stroke in self.strokes:
+            self._render_stroke(target, stroke, 0, scale, origin)
+        return target
+    
+    def resize(self, frame_width, frame_height):
+        """
+        Resize the view. Strokes keep their canvas coordinates.
+        
+        Args:
+            frame_width (int): New width of the view
+            frame_height (int): New height of the view
+        """
+        self.redraw_points()
+        self.frame_width = frame_width
+        self.frame_height = frame_height
+        self.viewport.resize(frame_width, frame_height)
+        self.canvas = self._new_raster(frame_height, frame_width)
+        self.coverage = np.zeros((frame_height, frame_width), dtype=np.uint8)
+        self.updated.resize(frame_width, frame_height)
+        self.view_dirty.resize(frame_width, frame_height)
+        self._view_changed()
+    
+    def load_strokes(self, path):
+        """
+        Replace the drawing with strokes loaded from a file written by
+        save_strokes(). Strokes keep the coordinates they were saved with.
+        
+        Args:
+            path (str): Source file path
+        """
+        _, _, strokes = self._read_strokes(path)
+        self.clear_canvas()
+        self.strokes = strokes
+        self.index.rebuild(strokes)
+        self.max_extent = max((s.extent() for s in strokes), default=0)
+        self.history.clear()
+        self.action = None
+        for stroke in strokes:
+            box = stroke.bbox()
+            if box is not None:
+                self.dirty.mark(*box)
\ No newline at end of file
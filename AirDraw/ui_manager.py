@@ -1,4 +1,5 @@
 import cv2
+import numpy as np
 
 class UIManager:
     """
@@ -6,77 +7,234 @@ class UIManager:
     Handles UI rendering and user interactions with UI elements.
     """
     
-    def __init__(self, frame_width, frame_height):
+    BLEND_MODES = ("opaque", "additive", "weighted")
+    
+    def __init__(self, frame_width, frame_height, blend_mode="opaque"):
         """
         Initialize the UI manager with specified frame dimensions.
         
         Args:
             frame_width (int): Width of the frame
             frame_height (int): Height of the frame
+            blend_mode (str): How ink is combined with the video, one of BLEND_MODES
         """
+        if blend_mode not in self.BLEND_MODES:
+            raise ValueError(f"Unknown blend mode: {blend_mode}")
         self.frame_width = frame_width
         self.frame_height = frame_height
+        self.blend_mode = blend_mode
         self.exit_program = False
+        
+        # Cached toolbar overlay and the layout it was rendered from
+        self.layout = None
+        self.layout_colors = 0
+        self.hit_map = None
+        self.overlay = None
+        self.overlay_bands = []
+        self.overlay_state = None
+        
+        # Scratch image of the video's share of every pixel, reused every frame
+        self.transparency = None
     
-    def display_ui(self, img, color_idx, drawing_mode, line_mode, brush_thickness, special_effect, colors):
+    def _build_layout(self, num_colors):
         """
-        Display UI elements on the frame.
+        Build the table of UI elements used both to render the toolbar and to
+        hit-test mouse clicks.
         
         Args:
-            img (numpy.ndarray): Frame to draw UI on
-            color_idx (int): Index of the current color
-            drawing_mode (bool): Current drawing mode
-            line_mode (bool): Current line mode
-            brush_thickness (int): Current brush thickness
-            special_effect (int): Current special effect
-            colors (list): List of available colors
-            
+            num_colors (int): Number of colors in the palette
+        
         Returns:
-            numpy.ndarray: Frame with UI elements
+            list: UI elements, each a dict with the element name, the rectangle
+                it is drawn in, the rectangle that responds to clicks, its fill
+                color and the position of its label
         """
+        w = self.frame_width
+        gray = (50, 50, 50)
         # Display color palette
-        for i in range(len(colors)):
-            cv2.rectangle(img, (10 + i*30, 10), (30 + i*30, 30), colors[i], -1)
-        
-        # Highlight selected color
-        cv2.rectangle(img, (10 + color_idx * 30, 10), (30 + color_idx * 30, 30), (255, 255, 255), 2)
+        layout = [{"name": f"color_{i}", "rect": (10 + i*30, 10, 30 + i*30, 30),
+                   "hit": (11 + i*30, 0, 30 + i*30, 30), "fill": None, "text": None}
+                  for i in range(num_colors)]
+        layout += [
+            {"name": "mode", "rect": (130, 10, 230, 40), "hit": (131, 0, 230, 40), "fill": gray, "text": (135, 30)},
+            {"name": "style", "rect": (230, 10, 330, 40), "hit": (231, 0, 330, 40), "fill": gray, "text": (235, 30)},
+            {"name": "effect", "rect": (330, 10, 430, 40), "hit": (331, 0, 430, 40), "fill": gray, "text": (335, 30)},
+            {"name": "undo", "rect": (130, 45, 190, 75), "hit": (131, 45, 190, 75), "fill": gray, "text": (139, 65)},
+            {"name": "redo", "rect": (190, 45, 250, 75), "hit": (191, 45, 250, 75), "fill": gray, "text": (199, 65)},
+            {"name": "size", "rect": (w - 300, 10, w - 250, 40), "hit": (w - 299, 0, w - 250, 40), "fill": gray, "text": (w - 295, 30)},
+            # Split the +/- button visually to show it has two functions
+            {"name": "minus", "rect": (w - 250, 10, w - 225, 40), "hit": (w - 249, 0, w - 225, 40), "fill": gray, "text": (w - 240, 30)},
+            {"name": "plus", "rect": (w - 225, 10, w - 200, 40), "hit": (w - 224, 0, w - 200, 40), "fill": gray, "text": (w - 220, 30)},
+            # Add clickable buttons
+            {"name": "clear", "rect": (w - 200, 10, w - 100, 40), "hit": (w - 199, 0, w - 100, 50), "fill": (0, 0, 200), "text": (w - 180, 30)},
+            {"name": "exit", "rect": (w - 100, 10, w - 20, 40), "hit": (w - 99, 0, w, 50), "fill": (200, 0, 0), "text": (w - 80, 30)},
+        ]
+        return layout
+    
+    def _ensure_layout(self, num_colors):
+        """
+        Build the layout and its hit map if they do not match the palette size.
         
-        # Display mode buttons
-        draw_mode_text = "Draw" if drawing_mode else "Erase"
-        cv2.rectangle(img, (130, 10), (230, 40), (50, 50, 50), -1)
-        cv2.putText(img, f"Mode: {draw_mode_text}", (135, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
+        Args:
+            num_colors (int): Number of colors in the palette
+        """
+        if self.layout is None or self.layout_colors != num_colors:
+            self.layout = self._build_layout(num_colors)
+            self.layout_colors = num_colors
+            self._build_hit_map()
+    
+    def _build_hit_map(self):
+        """
+        Rasterize the click rectangles of the layout into a lookup image, so a
+        click is resolved with a single array access whatever the number of
+        buttons.
+        """
+        height = max(e["hit"][3] for e in self.layout)
+        self.hit_map = np.full((height, self.frame_width), -1, dtype=np.int16)
+        # Later elements take priority where click areas overlap, so buttons
+        # win over the palette swatches they are drawn on top of
+        for i, element in enumerate(self.layout):
+            x0, y0, x1, y1 = element["hit"]
+            self.hit_map[max(0, y0):y1, max(0, x0):max(0, x1)] = i
+    
+    def _element_label(self, name, state):
+        """
+        Get the label text of a UI element for the given settings.
         
-        line_mode_text = "Line" if line_mode else "Dots"
-        cv2.rectangle(img, (230, 10), (330, 40), (50, 50, 50), -1)
-        cv2.putText(img, f"Style: {line_mode_text}", (235, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
+        Args:
+            name (str): Element name
+            state (tuple): Current UI settings
         
-        effect_names = ["No Effect", "Rainbow", "Glow"]
-        cv2.rectangle(img, (330, 10), (430, 40), (50, 50, 50), -1)
-        cv2.putText(img, f"Effect: {effect_names[special_effect]}", (335, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
+        Returns:
+            str: Label text
+        """
+        color_idx, drawing_mode, line_mode, brush_thickness, special_effect, _, stroke_eraser = state
+        if name == "mode":
+            return f"Mode: {'Draw' if drawing_mode else 'Stroke' if stroke_eraser else 'Erase'}"
+        if name == "style":
+            return f"Style: {'Line' if line_mode else 'Dots'}"
+        if name == "effect":
+            return f"Effect: {['No Effect', 'Rainbow', 'Glow'][special_effect]}"
+        if name == "size":
+            return f"Size: {brush_thickness}"
+        return {"minus": "-", "plus": "+", "clear": "CLEAR", "exit": "EXIT",
+                "undo": "UNDO", "redo": "REDO"}[name]
+    
+    def _render_overlay(self, state):
+        """
+        Render the toolbar for the given settings into the cached BGRA overlay
+        and precompute the mask and row bands used to composite it.
         
-        # Thickness controls
-        cv2.rectangle(img, (self.frame_width - 300, 10), (self.frame_width - 250, 40), (50, 50, 50), -1)
-        cv2.putText(img, f"Size: {brush_thickness}", (self.frame_width - 295, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
+        Args:
+            state (tuple): Current UI settings
+        """
+        color_idx, colors = state[0], state[5]
+        self._ensure_layout(len(colors))
         
-        # Split the +/- button visually to show it has two functions
-        cv2.rectangle(img, (self.frame_width - 250, 10), (self.frame_width - 225, 40), (50, 50, 50), -1)
-        cv2.putText(img, "-", (self.frame_width - 240, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
+        # Colors are drawn on black and coverage into a separate alpha plane,
+        # so anti-aliased text edges end up as premultiplied colors
+        overlay = np.zeros((self.frame_height, self.frame_width, 3), dtype=np.uint8)
+        alpha = np.zeros((self.frame_height, self.frame_width), dtype=np.uint8)
         
-        cv2.rectangle(img, (self.frame_width - 225, 10), (self.frame_width - 200, 40), (50, 50, 50), -1)
-        cv2.putText(img, "+", (self.frame_width - 220, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
+        def rectangle(pt1, pt2, color, thickness):
+            cv2.rectangle(overlay, pt1, pt2, color, thickness)
+            cv2.rectangle(alpha, pt1, pt2, 255, thickness)
         
-        # Add clickable buttons
-        cv2.rectangle(img, (self.frame_width - 200, 10), (self.frame_width - 100, 40), (0, 0, 200), -1)
-        cv2.putText(img, "CLEAR", (self.frame_width - 180, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
+        def put_text(text, org, thickness):
+            cv2.putText(overlay, text, org, cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), thickness)
+            cv2.putText(alpha, text, org, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 255, thickness)
         
-        cv2.rectangle(img, (self.frame_width - 100, 10), (self.frame_width - 20, 40), (200, 0, 0), -1)
-        cv2.putText(img, "EXIT", (self.frame_width - 80, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
+        for element in self.layout:
+            x0, y0, x1, y1 = element["rect"]
+            if element["fill"] is None:  # Palette swatch
+                i = int(element["name"].split("_")[1])
+                rectangle((x0, y0), (x1, y1), tuple(colors[i]), -1)
+                if i == len(colors) - 1:
+                    # Highlight selected color
+                    rectangle((10 + color_idx * 30, 10), (30 + color_idx * 30, 30), (255, 255, 255), 2)
+                continue
+            rectangle((x0, y0), (x1, y1), element["fill"], -1)
+            put_text(self._element_label(element["name"], state), element["text"], 2)
         
         # Display instructions
-        cv2.putText(img, "Click on buttons to change settings", (10, self.frame_height - 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+        put_text("Click on buttons to change settings", (10, self.frame_height - 20), 1)
+        
+        self.overlay = np.dstack((overlay, alpha))
+        
+        # Split the overlay into bands around contiguous runs of UI rows, each
+        # cropped to its UI columns. Opaque pixels are copied through a mask;
+        # the few anti-aliased text edges are kept as premultiplied colors and
+        # blended individually.
+        mask = alpha > 0
+        rows = np.flatnonzero(mask.any(axis=1))
+        breaks = np.flatnonzero(np.diff(rows) > 1)
+        starts = np.concatenate(([rows[0]], rows[breaks + 1])) if len(rows) else []
+        ends = np.concatenate((rows[breaks], [rows[-1]])) + 1 if len(rows) else []
+        self.overlay_bands = []
+        for y0, y1 in zip(starts, ends):
+            cols = np.flatnonzero(mask[y0:y1].any(axis=0))
+            x0, x1 = cols[0], cols[-1] + 1
+            band = overlay[y0:y1, x0:x1]
+            band_alpha = alpha[y0:y1, x0:x1]
+            edges = np.nonzero((band_alpha > 0) & (band_alpha < 255))
+            self.overlay_bands.append((
+                (int(y0), int(y1), int(x0), int(x1)),
+                np.ascontiguousarray(band),
+                (band_alpha == 255).astype(np.uint8),
+                edges,
+                band[edges].astype(np.float32),
+                1.0 - band_alpha[edges][:, None].astype(np.float32) / 255.0
+            ))
+        self.overlay_state = state
+    
+    def display_ui(self, img, color_idx, drawing_mode, line_mode, brush_thickness, special_effect, colors,
+                   stroke_eraser=False):
+        """
+        Display UI elements on the frame.
+        The toolbar is rendered once into a cached overlay and only redrawn when
+        one of the displayed settings changes.
+        
+        Args:
+            img (numpy.ndarray): Frame to draw UI on
+            color_idx (int): Index of the current color
+            drawing_mode (bool): Current drawing mode
+            line_mode (bool): Current line mode
+            brush_thickness (int): Current brush thickness
+            special_effect (int): Current special effect
+            colors (list): List of available colors
+            stroke_eraser (bool): Whether the eraser removes whole strokes
+        
+        Returns:
+            numpy.ndarray: Frame with UI elements
+        """
+        state = (color_idx, drawing_mode, line_mode, brush_thickness, special_effect,
+                 tuple(tuple(c) for c in colors), stroke_eraser)
+        if state != self.overlay_state:
+            self._render_overlay(state)
+        
+        for (y0, y1, x0, x1), bgr, opaque, edges, edge_colors, edge_keep in self.overlay_bands:
+            region = img[y0:y1, x0:x1]
+            cv2.copyTo(bgr, opaque, region)
+            region[edges] = (edge_colors + region[edges] * edge_keep + 0.5).astype(np.uint8)
         
         return img
     
+    def hit_test(self, x, y):
+        """
+        Find the UI element under a point.
+        
+        Args:
+            x (int): X-coordinate
+            y (int): Y-coordinate
+        
+        Returns:
+            str: Name of the element, or None if the point is not on the UI
+        """
+        if self.hit_map is None or not (0 <= y < self.hit_map.shape[0] and 0 <= x < self.frame_width):
+            return None
+        i = self.hit_map[y, x]
+        return self.layout[i]["name"] if i >= 0 else None
+    
     def handle_mouse_event(self, event, x, y, flags, param, canvas):
         """
         Handle mouse events for UI interaction.
@@ -88,71 +246,123 @@ class UIManager:
             flags (int): Mouse event flags
             param: Additional parameters
             canvas: Drawing canvas object
-            
+        
         Returns:
             bool: Whether the program should exit
         """
-        if event == cv2.EVENT_LBUTTONDOWN:
-            # Check if click is in the exit button area
-            if x > self.frame_width - 100 and y < 50:
-                self.exit_program = True
-            
-            # Check if click is in the clear button area
-            elif x > self.frame_width - 200 and x < self.frame_width - 100 and y < 50:
-                canvas.clear_canvas()
-                
-            # Check if click is in the drawing mode area
-            elif x > 130 and x < 230 and y < 40:
-                new_mode = canvas.toggle_drawing_mode()
-                print(f"Mode changed to: {'Drawing' if new_mode else 'Erasing'}")
-                
-            # Check if click is in the line mode area
-            elif x > 230 and x < 330 and y < 40:
-                new_mode = canvas.toggle_line_mode()
-                print(f"Line mode changed to: {'Continuous' if new_mode else 'Dots'}")
-                
-            # Check if click is in the special effects area
-            elif x > 330 and x < 430 and y < 40:
-                new_effect = canvas.cycle_special_effect()
-                effect_names = ["None", "Rainbow", "Glow"]
-                print(f"Special effect changed to: {effect_names[new_effect]}")
-                
-            # Check if click is in the thickness display area - now does nothing
-            elif x > self.frame_width - 300 and x < self.frame_width - 250 and y < 40:
-                # This area now just displays the current size
-                pass
-                
-            # Check if click is in the +/- area
-            elif x > self.frame_width - 250 and x < self.frame_width - 225 and y < 40:
-                # Left half of +/- button (decrease)
-                new_thickness = canvas.adjust_brush_thickness(-1)
-                print(f"Brush thickness decreased to: {new_thickness}")
-            elif x > self.frame_width - 225 and x < self.frame_width - 200 and y < 40:
-                # Right half of +/- button (increase)
-                new_thickness = canvas.adjust_brush_thickness(1)
-                print(f"Brush thickness increased to: {new_thickness}")
-                
-            # Check if click is in the color palette area
-            for i in range(len(canvas.colors)):
-                if x > 10 + i*30 and x < 30 + i*30 and y < 30:
-                    canvas.set_color(i)
-                    print(f"Color changed to: {canvas.color_names[i]}")
-                    break
+        if event != cv2.EVENT_LBUTTONDOWN:
+            return self.exit_program
+        
+        self._ensure_layout(len(canvas.colors))
+        
+        name = self.hit_test(x, y)
+        if name == "exit":
+            self.exit_program = True
+        elif name == "clear":
+            canvas.clear_canvas()
+        elif name == "undo":
+            if not canvas.undo_enabled:
+                print("Undo is not available on a shared canvas")
+            elif not canvas.undo():
+                print("Nothing to undo")
+        elif name == "redo":
+            if not canvas.undo_enabled:
+                print("Redo is not available on a shared canvas")
+            elif not canvas.redo():
+                print("Nothing to redo")
+        elif name == "mode":
+            new_mode = canvas.toggle_drawing_mode()
+            mode = "Drawing" if new_mode else "Erasing strokes" if canvas.stroke_eraser else "Erasing"
+            print(f"Mode changed to: {mode}")
+        elif name == "style":
+            new_mode = canvas.toggle_line_mode()
+            print(f"Line mode changed to: {'Continuous' if new_mode else 'Dots'}")
+        elif name == "effect":
+            new_effect = canvas.cycle_special_effect()
+            effect_names = ["None", "Rainbow", "Glow"]
+            print(f"Special effect changed to: {effect_names[new_effect]}")
+        elif name == "minus":
+            # Left half of +/- button (decrease)
+            new_thickness = canvas.adjust_brush_thickness(-1)
+            print(f"Brush thickness decreased to: {new_thickness}")
+        elif name == "plus":
+            # Right half of +/- button (increase)
+            new_thickness = canvas.adjust_brush_thickness(1)
+            print(f"Brush thickness increased to: {new_thickness}")
+        elif name is not None and name.startswith("color_"):
+            i = int(name.split("_")[1])
+            canvas.set_color(i)
+            print(f"Color changed to: {canvas.color_names[i]}")
+        # The size display does nothing when clicked
         
         return self.exit_program
     
-    def combine_frame_and_canvas(self, frame, canvas):
+    def combine_frame_and_canvas(self, frame, canvas, out=None, mask=None, bounds=None, blend_mode=None, palette=None):
         """
         Combine the video frame and drawing canvas.
         
+        With a coverage mask, the frame is only modified where the canvas has
+        ink, and only inside the bounding box of the ink, so the cost follows
+        the amount drawn. Passing the frame itself as `out` composites in place
+        without allocating. Palette-indexed canvases are expanded to BGR only
+        inside the ink bounds.
+        
         Args:
             frame (numpy.ndarray): Video frame
             canvas (numpy.ndarray): Drawing canvas
-            
+            out (numpy.ndarray): Preallocated output buffer (allocated if None)
+            mask (numpy.ndarray): uint8 ink coverage of every pixel (0-255);
+                in "opaque" mode, partly covered pixels are blended by it
+            bounds (tuple): (x0, y0, x1, y1) bounding box of the ink, or None
+                for an empty canvas when a mask is given
+            blend_mode (str): "opaque" to paint ink over the video, "additive"
+                to add it to the video like light, or "weighted" for the
+                original 70/30 mix of the whole frame (defaults to self.blend_mode)
+            palette (numpy.ndarray): (256, 3) BGR lookup table if the canvas
+                holds palette indices
+        
         Returns:
             numpy.ndarray: Combined output
         """
-        return cv2.addWeighted(frame, 0.7, canvas, 0.3, 0)
+        blend_mode = self.blend_mode if blend_mode is None else blend_mode
+        if blend_mode not in self.BLEND_MODES:
+            raise ValueError(f"Unknown blend mode: {blend_mode}")
+        if out is None:
+            out = np.empty_like(frame)
+        
+        if blend_mode == "weighted":
+            if palette is not None:
+                canvas = np.take(palette, canvas, axis=0)
+            return cv2.addWeighted(frame, 0.7, canvas, 0.3, 0, dst=out)
+        
+        if out is not frame:
+            np.copyto(out, frame)
+        if mask is None:
+            mask = (canvas != 0 if palette is not None else canvas.any(axis=2)).astype(np.uint8) * 255
+            bounds = (0, 0, canvas.shape[1], canvas.shape[0])
+        if bounds is None:
+            return out
+        
+        x0, y0, x1, y1 = bounds
+        region = out[y0:y1, x0:x1]
+        ink = canvas[y0:y1, x0:x1]
+        if palette is not None:
+            ink = np.take(palette, ink, axis=0)
+        if blend_mode == "opaque":
+            # Ink is drawn on black, so it is already scaled by its coverage:
+            # dim the video by the coverage and add the ink. Fully covered
+            # pixels become the ink, and anti-aliased edges mix with the video.
+            if self.transparency is None or self.transparency.shape[:2] != mask.shape:
+                self.transparency = np.empty(mask.shape + (3,), dtype=np.uint8)
+            transparency = self.transparency[y0:y1, x0:x1]
+            coverage = mask[y0:y1, x0:x1]
+            cv2.cvtColor(coverage, cv2.COLOR_GRAY2BGR, dst=transparency)
+            cv2.bitwise_not(transparency, dst=transparency)
+            cv2.multiply(region, transparency, dst=region, scale=1.0 / 255)
+            cv2.add(region, ink, dst=region)
+        else:
+            cv2.add(region, ink, dst=region, mask=mask[y0:y1, x0:x1])
+        return out
     
     def print_instructions(self):
         """
@@ -163,8 +373,8 @@ class UIManager:
         print("Click on the UI buttons to control the application")
         print("Click EXIT to quit")
         print("Click CLEAR to clear the canvas")
-        print("Click on Mode to toggle between Draw and Erase")
+        print("Click on Mode to switch between Draw, Erase and Stroke (erase whole strokes)")
         print("Click on Style to toggle between Line and Dots")
         print("Click on Effect to cycle through special effects")
         print("Click on colors to change drawing color")
-        print("Click on +/- to adjust brush thickness\n") 
\ No newline at end of file
+        print("Click on +/- to adjust brush thickness\n")
\ No newline at end of file
@@ -0,0 +1,412 @@
+"""
+Async Detection Engine Module
+
+This module provides an asyncio path for detection requests to the OpenAI
+API: an async backend that reuses one pooled HTTP connection and retries
+rate-limited and failed requests with jittered exponential backoff, and an
+engine running the requests of an ObjectDetector on an event loop instead of
+blocking one thread per request.
+"""
+
+import asyncio
+import base64
+import email.utils
+import random
+import threading
+import time
+import cv2
+from backends import DEFAULT_MODEL, OpenAIBackend, SYSTEM_PROMPT, USER_PROMPT
+
+DEFAULT_REQUEST_TIMEOUT = 30.0  # Seconds before a request attempt is abandoned
+DEFAULT_MAX_RETRIES = 5
+
+def parse_retry_after(headers):
+    """
+    Get the delay a server asked for before retrying.
+    
+    Args:
+        headers (Mapping): Response headers
+    
+    Returns:
+        float: Seconds to wait, or None if the server did not say
+    """
+    if headers is None:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000.0
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        # An HTTP date
+        try:
+            return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+def backoff_delay(attempt, base=0.5, cap=30.0, retry_after=None):
+    """
+    Compute the delay before a retry: exponential backoff with full jitter,
+    and never shorter than the delay the server asked for.
+    
+    Args:
+        attempt (int): Number of the failed attempt, from 0
+        base (float): Delay bound of the first retry in seconds
+        cap (float): Maximum delay bound in seconds
+        retry_after (float): Delay the server asked for, if any
+    
+    Returns:
+        float: Seconds to wait
+    """
+    delay = random.uniform(0, min(cap, base * 2 ** attempt))
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+def encode_image(frame):
+    """
+    Encode a frame as a base64 JPEG for the API.
+    
+    Args:
+        frame (numpy.ndarray): BGR video frame
+    
+    Returns:
+        str: Base64 encoded JPEG
+    """
+    _, buffer = cv2.imencode('.jpg', frame)
+    return base64.b64encode(buffer).decode('utf-8')
+
+class AsyncOpenAIBackend(OpenAIBackend):
+    """
+    Detection backend sending frames to the OpenAI API with asyncio.
+    
+    One AsyncOpenAI client, and so one pool of keep-alive connections, is
+    shared by all requests on the event loop. The client's own retries are
+    turned off: rate limits (429), server errors (5xx), timeouts and
+    connection errors are retried here with jittered exponential backoff,
+    honoring the server's Retry-After header.
+    """
+    
+    is_async = True
+    
+    def __init__(self, api_key, model=DEFAULT_MODEL, base_url=None, timeout=DEFAULT_REQUEST_TIMEOUT,
+                 max_retries=DEFAULT_MAX_RETRIES, backoff_base=0.5, backoff_cap=30.0):
+        """
+        Initialize the backend.
+        
+        Args:
+            api_key (str): OpenAI API key
+            model (str): OpenAI model to use
+            base_url (str): API URL, e.g. of a local OpenAI-compatible server
+                (defaults to OpenAI's)
+            timeout (float): Seconds before a request attempt is abandoned
+            max_retries (int): Retries of a failed request
+            backoff_base (float): Delay bound of the first retry in seconds
+            backoff_cap (float): Maximum delay bound in seconds
+        """
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.client = None
+        self.client_loop = None
+        self.sync_loop = None  # Event loop running detect() calls from synchronous code
+        self.sync_thread = None
+        self.sync_lock = threading.Lock()
+        self.retries = 0
+        super().__init__(api_key, model)
+    
+    def setup_openai_client(self, api_key):
+        """
+        Check the API key. The client itself is created on the event loop
+        that first uses it, since its connections belong to that loop.
+        
+        Args:
+            api_key (str): OpenAI API key
+        """
+        if not (api_key and api_key.startswith("sk-")):
+            print("Invalid API key format")
+            raise ValueError("Invalid API key format. API key should start with 'sk-'")
+        self.api_key = api_key
+    
+    def get_client(self):
+        """
+        Get the client of the running event loop.
+        
+        Returns:
+            AsyncOpenAI: Client
+        """
+        loop = asyncio.get_running_loop()
+        if self.client is None or self.client_loop is not loop:
+            if self.client is not None and self.client_loop.is_running():
+                # Close the previous client's connections on the loop they belong to
+                asyncio.run_coroutine_threadsafe(self.client.close(), self.client_loop)
+            # Imported here so the local backend works without the openai package
+            from openai import AsyncOpenAI
+            self.client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url,
+                                      timeout=self.timeout, max_retries=0)
+            self.client_loop = loop
+        return self.client
+    
+    async def detect_async(self, frame):
+        """
+        Send a frame to the API, retrying failed attempts, and parse the
+        detections in the response.
+        
+        Args:
+            frame (numpy.ndarray): BGR video frame
+        
+        Returns:
+            list: Detections as dicts with label, confidence and bbox
+        
+        Raises:
+            openai.APIError: If the request fails for good
+            asyncio.TimeoutError: If the last attempt timed out
+        """
+        import openai
+        
+        # Encode image for OpenAI API, off the event loop so other requests keep running
+        loop = asyncio.get_running_loop()
+        base64_image = await loop.run_in_executor(None, encode_image, frame)
+        messages = [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": [
+                {"type": "text", "text": USER_PROMPT},
+                {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}}
+            ]}
+        ]
+        
+        client = self.get_client()
+        attempt = 0
+        while True:
+            retry_after = None
+            try:
+                print("Sending API request...")
+                response = await asyncio.wait_for(
+                    client.chat.completions.create(model=self.model, messages=messages),
+                    self.timeout)
+                break
+            except openai.APIStatusError as e:
+                if e.status_code != 429 and e.status_code < 500:
+                    raise  # Retrying will not help
+                retry_after = parse_retry_after(e.response.headers)
+                error = e
+            except (openai.APIConnectionError, asyncio.TimeoutError) as e:
+                error = e  # Includes openai.APITimeoutError
+            if attempt >= self.max_retries:
+                raise error
+            delay = backoff_delay(attempt, self.backoff_base, self.backoff_cap, retry_after)
+            print(f"API request failed ({type(error).__name__}), retrying in {delay:.1f}s")
+            self.retries += 1
+            attempt += 1
+            await asyncio.sleep(delay)
+        
+        # Parse the response
+        result_text = response.choices[0].message.content.strip()
+        print(f"API response received successfully, length: {len(result_text)} characters")
+        
+        # Extract JSON from response
+        return self.extract_json_from_response(result_text)
+    
+    def detect(self, frame):
+        """
+        Detect objects in a frame from synchronous code. The request runs on
+        an event loop kept in a background thread, so that every call reuses
+        the same client and connections.
+        
+        Args:
+            frame (numpy.ndarray): BGR video frame
+        
+        Returns:
+            list: Detections as dicts with label, confidence and bbox
+        """
+        with self.sync_lock:
+            if self.sync_loop is None:
+                self.sync_loop = asyncio.new_event_loop()
+                self.sync_thread = threading.Thread(target=self.sync_loop.run_forever)
+                self.sync_thread.daemon = True
+                self.sync_thread.start()
+            loop = self.sync_loop
+        return asyncio.run_coroutine_threadsafe(self.detect_async(frame), loop).result()
+    
+    async def aclose(self):
+        """
+        Close the client and its connections, if they belong to the running
+        event loop.
+        """
+        if self.client is not None and self.client_loop is asyncio.get_running_loop():
+            await self.client.close()
+            self.client = None
+    
+    def close(self):
+        """
+        Close the client used by synchronous calls and stop their event loop.
+        """
+        with self.sync_lock:
+            loop, self.sync_loop = self.sync_loop, None
+        if loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self.aclose(), loop).result(timeout=5.0)
+        except Exception as e:
+            print(f"Error closing the API client: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+        self.sync_thread.join(timeout=1.0)
+        if not loop.is_running():
+            loop.close()
+
+class AsyncDetectionEngine:
+    """
+    Runs the detection requests of an ObjectDetector on an asyncio event loop
+    in a background thread.
+    
+    Up to `concurrency` requests are in flight at once, like the detector's
+    thread pool, but without a thread per request. When a frame's detections
+    are shown, requests still in flight for older frames are cancelled,
+    since their results would be dropped anyway.
+    """
+    
+    def __init__(self, detector, concurrency=1):
+        """
+        Initialize the engine. Call start() to start the event loop.
+        
+        Args:
+            detector (ObjectDetector): Detector whose frames to process, with
+                an async backend
+            concurrency (int): Number of requests that may run at once
+        """
+        self.detector = detector
+        self.backend = detector.backend
+        self.concurrency = max(1, concurrency)
+        self.loop = None
+        self.thread = None
+        self.in_flight = {}  # Frame number -> set of request tasks
+        self.cancelled = 0
+    
+    def start(self):
+        """
+        Start the event loop thread.
+        """
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+    
+    def run(self):
+        """
+        Background thread running the event loop until the detector stops.
+        """
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self.main())
+        finally:
+            self.loop.close()
+    
+    async def main(self):
+        """
+        Run the request slots, then close the backend's connections.
+        """
+        try:
+            await asyncio.gather(*(self.slot() for _ in range(self.concurrency)))
+        finally:
+            await self.backend.aclose()
+    
+    async def slot(self):
+        """
+        One request slot: take frames and detect objects in them, one at a time.
+        """
+        detector = self.detector
+        loop = asyncio.get_running_loop()
+        while detector.is_running:
+            request = detector.next_request(timeout=0)
+            if request is None:
+                await asyncio.sleep(0.02)
+                continue
+            seq, frame = request
+            try:
+                # Hashing and the SQLite lookup would block the other slots
+                detections, cache_key = await loop.run_in_executor(None, detector.lookup_cache, frame)
+                if detections is None:
+                    if not await self.wait_for_rate_limit(frame):
+                        break  # Stopped while waiting
+                    if seq < detector.shown_seq:
+                        continue  # Superseded while waiting
+                    task = asyncio.ensure_future(self.backend.detect_async(frame))
+                    # Keep a set per number, so a repeated number cannot drop another request's entry
+                    tasks = self.in_flight.setdefault(seq, set())
+                    tasks.add(task)
+                    start = time.time()
+                    try:
+                        detections = await task
+                    finally:
+                        tasks.discard(task)
+                        if not tasks:
+                            self.in_flight.pop(seq, None)
+                    detector.record_round_trip(time.time() - start)
+                    await loop.run_in_executor(None, detector.store_cache, cache_key, detections)
+                if detector.deliver(seq, detections):
+                    self.cancel_superseded(seq)
+            except asyncio.CancelledError:
+                if not detector.is_running:
+                    break  # Stopped
+                self.cancelled += 1  # Superseded by a newer frame
+            except Exception as e:
+                detector.report_error(e)
+                await asyncio.sleep(1)  # Wait before retrying
+    
+    async def wait_for_rate_limit(self, frame):
+        """
+        Wait until the detector's rate limiter allows a request for a frame.
+        
+        Args:
+            frame (numpy.ndarray): Frame about to be sent
+        
+        Returns:
+            bool: True if the request may be sent, False if the detector was stopped
+        """
+        rate_limiter = self.detector.rate_limiter
+        if rate_limiter is None:
+            return True
+        tokens = self.backend.estimate_tokens(frame)
+        while self.detector.is_running:
+            wait = rate_limiter.try_acquire(tokens)
+            if wait == 0:
+                return True
+            await asyncio.sleep(min(wait, 0.1))
+        return False
+    
+    def cancel_superseded(self, seq):
+        """
+        Cancel the requests in flight for frames older than a shown frame.
+        
+        Args:
+            seq (int): Number of the shown frame
+        """
+        for other, tasks in self.in_flight.items():
+            if other < seq:
+                for task in tasks:
+                    task.cancel()
+    
+    def cancel_all(self):
+        """
+        Cancel every request in flight.
+        """
+        for tasks in self.in_flight.values():
+            for task in tasks:
+                task.cancel()
+    
+    def stop(self):
+        """
+        Cancel the requests in flight and wait for the event loop to finish,
+        once the detector stopped running.
+        """
+        if self.thread is not None and self.thread.is_alive():
+            self.loop.call_soon_threadsafe(self.cancel_all)
+            self.thread.join(timeout=2.0) 
\ No newline at end of file
@@ -0,0 +1,462 @@
+"""
+Detection Backends Module
+
+This module provides the interchangeable backends that ObjectDetector uses to
+find objects in a frame: OpenAI's GPT-4o Vision API, and a local detector
+running an ONNX model with OpenCV's DNN module on the CPU.
+
+Every backend returns a list of detections in the same format:
+{"label": "object name", "confidence": 0.95, "bbox": [x1, y1, x2, y2]}
+with the bounding box given as proportions of the image (0-1).
+"""
+
+import base64
+import hashlib
+import json
+import math
+import os
+import cv2
+import numpy as np
+
+DEFAULT_MODEL = "gpt-4o"  # Using GPT-4o for vision capabilities
+
+SYSTEM_PROMPT = "You are an object detection system. Identify all visible objects in the image with their bounding box coordinates. Return a JSON array with objects, their confidence scores, and bounding boxes [x1,y1,x2,y2] as proportions of image (0-1)."
+USER_PROMPT = "Detect all objects in this image with bounding boxes. Return a JSON array with format [{\"label\": \"object name\", \"confidence\": 0.95, \"bbox\": [x1, y1, x2, y2]}]"
+
+# Class names of models trained on COCO, such as the YOLOv5 and YOLOv8 models
+COCO_LABELS = [
+    "person", "bicycle", "car", "motorcycle", "airplane", "bus", "train", "truck", "boat",
+    "traffic light", "fire hydrant", "stop sign", "parking meter", "bench", "bird", "cat",
+    "dog", "horse", "sheep", "cow", "elephant", "bear", "zebra", "giraffe", "backpack",
+    "umbrella", "handbag", "tie", "suitcase", "frisbee", "skis", "snowboard", "sports ball",
+    "kite", "baseball bat", "baseball glove", "skateboard", "surfboard", "tennis racket",
+    "bottle", "wine glass", "cup", "fork", "knife", "spoon", "bowl", "banana", "apple",
+    "sandwich", "orange", "broccoli", "carrot", "hot dog", "pizza", "donut", "cake", "chair",
+    "couch", "potted plant", "bed", "dining table", "toilet", "tv", "laptop", "mouse",
+    "remote", "keyboard", "cell phone", "microwave", "oven", "toaster", "sink",
+    "refrigerator", "book", "clock", "vase", "scissors", "teddy bear", "hair drier",
+    "toothbrush"
+]
+
+class DetectionBackend:
+    """
+    Base class of the detection backends.
+    
+    Subclasses implement detect(), which is called from ObjectDetector's
+    detection thread with one frame at a time.
+    """
+    
+    name = "backend"
+    verbose = False  # Print a message for every detection
+    
+    @property
+    def cache_key(self):
+        """
+        Name of the backend configuration, under which detections are cached.
+        Backends that can give different results for the same frame, e.g.
+        with another model, must return different keys.
+        
+        Returns:
+            str: Cache namespace
+        """
+        return self.name
+    
+    def detect(self, frame):
+        """
+        Detect objects in a frame.
+        
+        Args:
+            frame (numpy.ndarray): BGR video frame
+        
+        Returns:
+            list: Detections as dicts with label, confidence and bbox
+        """
+        raise NotImplementedError
+    
+    def estimate_tokens(self, frame):
+        """
+        Estimate the API tokens a request for a frame uses, for rate limiting.
+        
+        Args:
+            frame (numpy.ndarray): BGR video frame
+        
+        Returns:
+            int: Estimated tokens
+        """
+        return 0
+    
+    def close(self):
+        """
+        Release any resources held by the backend.
+        """
+        pass
+
+class OpenAIBackend(DetectionBackend):
+    """
+    Detection backend sending frames to OpenAI's GPT-4o Vision API.
+    """
+    
+    name = "openai"
+    verbose = True
+    
+    def __init__(self, api_key, model=DEFAULT_MODEL):
+        """
+        Initialize the backend.
+        
+        Args:
+            api_key (str): OpenAI API key
+            model (str): OpenAI model to use
+        """
+        self.model = model
+        self.setup_openai_client(api_key)
+    
+    @property
+    def cache_key(self):
+        """
+        Name of the model and prompt, under which detections are cached.
+        
+        Returns:
+            str: Cache namespace
+        """
+        prompt = hashlib.sha1((SYSTEM_PROMPT + USER_PROMPT).encode("utf-8")).hexdigest()[:12]
+        return f"{self.name}:{self.model}:{prompt}"
+    
+    def estimate_tokens(self, frame, max_output_tokens=500):
+        """
+        Estimate the tokens a request for a frame uses, which is what counts
+        against the tokens-per-minute limit: the prompt, the image and the
+        longest expected response.
+        
+        Args:
+            frame (numpy.ndarray): BGR video frame
+            max_output_tokens (int): Expected maximum length of the response
+        
+        Returns:
+            int: Estimated tokens
+        """
+        # Images are scaled to fit 2048x2048, then to a shortest side of at
+        # most 768 pixels, and cost 170 tokens per 512x512 tile plus 85
+        height, width = frame.shape[:2]
+        scale = min(1.0, 2048 / max(width, height))
+        if min(width, height) * scale > 768:
+            scale = 768 / min(width, height)
+        tiles = math.ceil(width * scale / 512) * math.ceil(height * scale / 512)
+        prompt_tokens = (len(SYSTEM_PROMPT) + len(USER_PROMPT)) // 4
+        return prompt_tokens + 85 + 170 * tiles + max_output_tokens
+    
+    def setup_openai_client(self, api_key):
+        """
+        Set up the OpenAI client with the provided API key.
+        
+        Args:
+            api_key (str): OpenAI API key
+        """
+        # Imported here so the local backend works without the openai package
+        from openai import OpenAI
+        
+        # Check API key format, if it's sk-proj format, try special handling
+        if api_key and api_key.startswith("sk-"):
+            print("Setting up OpenAI client...")
+            # Ensure environment variable is set
+            os.environ["OPENAI_API_KEY"] = api_key
+            
+            try:
+                # Try to initialize client using environment variable
+                self.client = OpenAI()
+                print("Using environment variable to initialize OpenAI client")
+            except Exception as e:
+                print(f"Failed to initialize OpenAI client using environment variable: {e}")
+                # Fall back to direct API key
+                self.client = OpenAI(api_key=api_key)
+                print("Falling back to direct API key")
+        else:
+            print("Invalid API key format")
+            raise ValueError("Invalid API key format. API key should start with 'sk-'")
+    
+    def detect(self, frame):
+        """
+        Send a frame to the API and parse the detections in its response.
+        
+        Args:
+            frame (numpy.ndarray): BGR video frame
+        
+        Returns:
+            list: Detections as dicts with label, confidence and bbox
+        """
+        # Encode image for OpenAI API
+        _, buffer = cv2.imencode('.jpg', frame)
+        base64_image = base64.b64encode(buffer).decode('utf-8')
+        
+        print("Sending API request...")
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": [
+                    {"type": "text", "text": USER_PROMPT},
+                    {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}}
+                ]}
+            ]
+        )
+        
+        # Parse the response
+        result_text = response.choices[0].message.content.strip()
+        print(f"API response received successfully, length: {len(result_text)} characters")
+        
+        # Extract JSON from response
+        return self.extract_json_from_response(result_text)
+    
+    def extract_json_from_response(self, result_text):
+        """
+        Extract JSON data from the API response text.
+        
+        Args:
+            result_text (str): API response text
+        
+        Returns:
+            list: List of detection objects
+        """
+        try:
+            # Try to directly parse the entire response
+            detections = json.loads(result_text)
+        except json.JSONDecodeError:
+            print("Direct JSON parsing failed, attempting to extract JSON portion...")
+            # If direct parsing fails, try to extract JSON part
+            try:
+                if "```json" in result_text:
+                    json_text = result_text.split("```json")[1].split("```")[0].strip()
+                elif "```" in result_text:
+                    json_text = result_text.split("```")[1].split("```")[0].strip()
+                else:
+                    # Try to find JSON array start and end
+                    start_idx = result_text.find('[')
+                    end_idx = result_text.rfind(']') + 1
+                    if start_idx >= 0 and end_idx > start_idx:
+                        json_text = result_text[start_idx:end_idx]
+                    else:
+                        # If no JSON array found, try to find JSON object
+                        start_idx = result_text.find('{')
+                        end_idx = result_text.rfind('}') + 1
+                        if start_idx >= 0 and end_idx > start_idx:
+                            json_text = result_text[start_idx:end_idx]
+                        else:
+                            # If no objects detected in response, create empty list
+                            print("No JSON data found in response, possibly no objects detected")
+                            return []
+                
+                print(f"Extracted JSON text: {json_text[:100]}...")
+                detections = json.loads(json_text)
+            except Exception as e:
+                print(f"JSON parsing failed: {e}")
+                # If all parsing attempts fail, return empty list
+                return []
+        
+        # Ensure detections is a list
+        if not isinstance(detections, list):
+            if isinstance(detections, dict) and 'objects' in detections:
+                detections = detections['objects']
+            else:
+                print(f"Warning: Detected result is not list format: {type(detections)}")
+                detections = []
+        
+        # Ensure each detection has necessary fields
+        valid_detections = []
+        for d in detections:
+            if isinstance(d, dict) and 'label' in d and 'bbox' in d:
+                # Add default confidence if missing
+                if 'confidence' not in d:
+                    d['confidence'] = 0.9
+                
+                # Ensure bounding box is correct format [x1, y1, x2, y2]
+                if len(d['bbox']) == 4:
+                    valid_detections.append(d)
+                else:
+                    print(f"Warning: Skipping invalid bounding box format: {d['bbox']}")
+        
+        return valid_detections
+
+class OpenCVDNNBackend(DetectionBackend):
+    """
+    Detection backend running an ONNX object detector locally on the CPU with
+    OpenCV's DNN module, without network access.
+    
+    Supports the output layouts of YOLOv5 (boxes, objectness and class
+    scores), YOLOv8 (boxes and class scores, transposed) and SSD-style
+    detectors ([image_id, class_id, confidence, x1, y1, x2, y2] rows).
+    """
+    
+    name = "local"
+    
+    def __init__(self, model_path, labels=None, input_size=640, score_threshold=0.25,
+                 nms_threshold=0.45, scale=1 / 255.0, mean=0.0):
+        """
+        Load the model.
+        
+        Args:
+            model_path (str): Path to the ONNX model
+            labels (list): Class names in the order of the model's class ids
+                (defaults to the 80 COCO classes)
+            input_size (int): Width and height of the model input
+            score_threshold (float): Minimum score of a candidate detection
+            nms_threshold (float): Overlap above which non-maximum suppression
+                drops the weaker of two boxes of the same class
+            scale (float): Multiplier applied to the pixel values
+            mean (float): Value subtracted from the pixel values before scaling
+        
+        Raises:
+            FileNotFoundError: If the model file does not exist
+        """
+        if not os.path.isfile(model_path):
+            raise FileNotFoundError(f"Model file not found: {model_path}")
+        print(f"Loading local detection model: {model_path}")
+        self.model_path = model_path
+        self.net = cv2.dnn.readNet(model_path)
+        self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        self.labels = labels or COCO_LABELS
+        self.input_size = input_size
+        self.score_threshold = score_threshold
+        self.nms_threshold = nms_threshold
+        self.scale = scale
+        self.mean = mean
+        # Letterboxed model input, reused between frames
+        self.letterbox = np.full((input_size, input_size, 3), 114, dtype=np.uint8)
+    
+    @property
+    def cache_key(self):
+        """
+        Name of the model and its settings, under which detections are cached.
+        
+        Returns:
+            str: Cache namespace
+        """
+        return f"{self.name}:{os.path.abspath(self.model_path)}:{self.input_size}:{self.score_threshold}:{self.nms_threshold}"
+    
+    def detect(self, frame):
+        """
+        Run the model on a frame.
+        
+        Args:
+            frame (numpy.ndarray): BGR video frame
+        
+        Returns:
+            list: Detections as dicts with label, confidence and bbox
+        """
+        height, width = frame.shape[:2]
+        
+        # Scale the frame to fit the model input, keeping its aspect ratio,
+        # and pad the rest
+        ratio = min(self.input_size / width, self.input_size / height)
+        new_width, new_height = int(round(width * ratio)), int(round(height * ratio))
+        self.letterbox[:] = 114
+        self.letterbox[:new_height, :new_width] = cv2.resize(frame, (new_width, new_height),
+                                                              interpolation=cv2.INTER_LINEAR)
+        blob = cv2.dnn.blobFromImage(self.letterbox, self.scale, (self.input_size, self.input_size),
+                                     self.mean, swapRB=True, crop=False)
+        self.net.setInput(blob)
+        output = self.net.forward()
+        
+        if output.ndim == 4 and output.shape[-1] == 7:
+            # SSD boxes are proportions of the model input
+            return self.parse_ssd(output, self.input_size / new_width, self.input_size / new_height)
+        return self.parse_yolo(output, ratio * width, ratio * height)
+    
+    def parse_yolo(self, output, content_width, content_height):
+        """
+        Parse YOLOv5 or YOLOv8 output.
+        
+        Args:
+            output (numpy.ndarray): Model output of shape (1, rows, columns)
+                for YOLOv5 or (1, columns, rows) for YOLOv8
+            content_width (float): Width of the frame within the model input
+            content_height (float): Height of the frame within the model input
+        
+        Returns:
+            list: Detections as dicts with label, confidence and bbox
+        """
+        rows = output[0]
+        if rows.shape[0] < rows.shape[1]:
+            rows = rows.T  # YOLOv8 puts the boxes in columns
+        if rows.shape[1] == len(self.labels) + 5:
+            # YOLOv5: class scores are conditional on the objectness score
+            class_scores = rows[:, 5:] * rows[:, 4:5]
+        else:
+            class_scores = rows[:, 4:]
+        class_ids = class_scores.argmax(axis=1)
+        scores = class_scores[np.arange(len(rows)), class_ids]
+        keep = scores >= self.score_threshold
+        if not keep.any():
+            return []
+        boxes, scores, class_ids = rows[keep, :4], scores[keep], class_ids[keep]
+        
+        # Center and size to corners, as proportions of the frame
+        corners = np.empty_like(boxes)
+        corners[:, 0] = (boxes[:, 0] - boxes[:, 2] / 2) / content_width
+        corners[:, 1] = (boxes[:, 1] - boxes[:, 3] / 2) / content_height
+        corners[:, 2] = (boxes[:, 0] + boxes[:, 2] / 2) / content_width
+        corners[:, 3] = (boxes[:, 1] + boxes[:, 3] / 2) / content_height
+        return self.suppress(corners, scores, class_ids)
+    
+    def parse_ssd(self, output, x_scale, y_scale):
+        """
+        Parse SSD-style output.
+        
+        Args:
+            output (numpy.ndarray): Model output of shape (1, 1, rows, 7)
+            x_scale (float): Model input width divided by the width of the
+                frame within it
+            y_scale (float): Model input height divided by the height of the
+                frame within it
+        
+        Returns:
+            list: Detections as dicts with label, confidence and bbox
+        """
+        rows = output.reshape(-1, 7)
+        rows = rows[rows[:, 2] >= self.score_threshold]
+        if not len(rows):
+            return []
+        corners = rows[:, 3:7] * np.array([x_scale, y_scale, x_scale, y_scale], dtype=rows.dtype)
+        return self.suppress(corners, rows[:, 2], rows[:, 1].astype(int))
+    
+    def suppress(self, corners, scores, class_ids):
+        """
+        Apply per-class non-maximum suppression and build the detections.
+        
+        Args:
+            corners (numpy.ndarray): (N, 4) boxes [x1, y1, x2, y2] as proportions of the frame
+            scores (numpy.ndarray): (N,) confidence scores
+            class_ids (numpy.ndarray): (N,) class ids
+        
+        Returns:
+            list: Detections as dicts with label, confidence and bbox
+        """
+        corners = np.clip(corners, 0.0, 1.0)
+        # Shift each class to its own region, so boxes of different classes
+        # never overlap and are suppressed separately
+        offsets = class_ids[:, None] * 2.0
+        boxes = np.concatenate((corners[:, :2] + offsets, corners[:, 2:] - corners[:, :2]), axis=1)
+        indices = cv2.dnn.NMSBoxes(boxes.tolist(), scores.tolist(), self.score_threshold, self.nms_threshold)
+        
+        detections = []
+        for i in np.array(indices).reshape(-1):
+            class_id = int(class_ids[i])
+            label = self.labels[class_id] if 0 <= class_id < len(self.labels) else str(class_id)
+            detections.append({
+                "label": label,
+                "confidence": round(float(scores[i]), 3),
+                "bbox": [round(float(v), 4) for v in corners[i]]
+            })
+        return detections
+
+def load_labels(path):
+    """
+    Load class names from a text file with one name per line.
+    
+    Args:
+        path (str): Path to the labels file
+    
+    Returns:
+        list: Class names
+    """
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip()] 
\ No newline at end of file
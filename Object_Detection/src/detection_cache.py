@@ -0,0 +1,185 @@
+"""
+Detection Cache Module
+
+This module provides a cache of detection results keyed by a perceptual hash
+of the frame, so identical or near-identical frames are answered locally
+instead of by another API request.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+import cv2
+import numpy as np
+
+DEFAULT_CACHE_TTL = 3600.0  # Seconds a cached result stays valid
+DEFAULT_CACHE_SIZE = 1000  # Entries kept in memory
+DEFAULT_DISK_CACHE_SIZE = 10000  # Entries kept on disk
+
+def perceptual_hash(frame, hash_size=8):
+    """
+    Compute the perceptual hash (pHash) of a frame.
+    
+    The frame is shrunk to a 32x32 grayscale image, and each bit tells
+    whether one of its lowest spatial frequencies (the top-left corner of
+    its discrete cosine transform, without the average brightness) is above
+    their median. Small changes such as sensor noise or recompression flip
+    few bits or none, while a different scene flips about half of them.
+    
+    Args:
+        frame (numpy.ndarray): BGR video frame
+        hash_size (int): Frequencies kept per axis
+    
+    Returns:
+        int: Hash of hash_size * hash_size - 1 bits
+    """
+    size = hash_size * 4
+    small = cv2.resize(frame, (size, size), interpolation=cv2.INTER_AREA)
+    gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY).astype(np.float32)
+    low = cv2.dct(gray)[:hash_size, :hash_size].flatten()[1:]
+    bits = low > np.median(low)
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+def hamming_distance(a, b):
+    """
+    Count the bits that differ between two hashes.
+    
+    Args:
+        a (int): First hash
+        b (int): Second hash
+    
+    Returns:
+        int: Number of differing bits
+    """
+    return bin(a ^ b).count("1")
+
+class DetectionCache:
+    """
+    LRU cache of parsed detections, in memory and optionally on disk.
+    
+    Entries are keyed by a namespace naming the backend, model and prompt,
+    and by the perceptual hash of the frame. A lookup first tries the exact
+    hash in memory, then any hash in memory within `max_distance` bits of
+    it, then the exact hash on disk. Entries older than `ttl` seconds count
+    as missing and are removed. The disk cache is a SQLite database, so it
+    survives restarts and can be shared by replays of the same video.
+    """
+    
+    def __init__(self, path=None, ttl=DEFAULT_CACHE_TTL, max_entries=DEFAULT_CACHE_SIZE,
+                 max_disk_entries=DEFAULT_DISK_CACHE_SIZE, max_distance=2):
+        """
+        Initialize the cache.
+        
+        Args:
+            path (str): SQLite file for the disk cache, or None to cache in memory only
+            ttl (float): Seconds an entry stays valid
+            max_entries (int): Entries kept in memory
+            max_disk_entries (int): Entries kept on disk
+            max_distance (int): Bits two hashes may differ by and still match
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.max_distance = max_distance
+        self.entries = OrderedDict()  # (namespace, hash) -> (created, detections)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        
+        self.db = None
+        if path:
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            self.db.execute("CREATE TABLE IF NOT EXISTS detections ("
+                            "namespace TEXT, hash TEXT, created REAL, used REAL, detections TEXT, "
+                            "PRIMARY KEY (namespace, hash))")
+            self.db.execute("DELETE FROM detections WHERE created < ?", (time.time() - ttl,))
+            self.db.commit()
+    
+    def get(self, namespace, frame_hash, exact=False):
+        """
+        Look up the detections of a frame.
+        
+        Args:
+            namespace (str): Backend, model and prompt the detections came from
+            frame_hash (int): Perceptual hash of the frame
+            exact (bool): Only match the exact hash, not nearby ones
+        
+        Returns:
+            list: Cached detections, or None on a miss
+        """
+        now = time.time()
+        with self.lock:
+            key = (namespace, frame_hash)
+            if key not in self.entries and self.max_distance > 0 and not exact:
+                # Nearest hash within the allowed distance
+                best = None
+                for other in self.entries:
+                    if other[0] == namespace:
+                        distance = hamming_distance(other[1], frame_hash)
+                        if distance <= self.max_distance and (best is None or distance < best[0]):
+                            best = (distance, other)
+                if best is not None:
+                    key = best[1]
+            entry = self.entries.get(key)
+            if entry is not None:
+                if now - entry[0] <= self.ttl:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self.entries[key]
+            
+            if self.db is not None:
+                row = self.db.execute("SELECT created, detections FROM detections WHERE namespace = ? AND hash = ?",
+                                      (namespace, format(frame_hash, "x"))).fetchone()
+                if row is not None and now - row[0] <= self.ttl:
+                    detections = json.loads(row[1])
+                    self.db.execute("UPDATE detections SET used = ? WHERE namespace = ? AND hash = ?",
+                                    (now, namespace, format(frame_hash, "x")))
+                    self.db.commit()
+                    self._remember((namespace, frame_hash), row[0], detections)
+                    self.hits += 1
+                    return detections
+            
+            self.misses += 1
+            return None
+    
+    def put(self, namespace, frame_hash, detections):
+        """
+        Store the detections of a frame.
+        
+        Args:
+            namespace (str): Backend, model and prompt the detections came from
+            frame_hash (int): Perceptual hash of the frame
+            detections (list): Parsed detections
+        """
+        now = time.time()
+        with self.lock:
+            self._remember((namespace, frame_hash), now, detections)
+            if self.db is not None:
+                self.db.execute("INSERT OR REPLACE INTO detections VALUES (?, ?, ?, ?, ?)",
+                                (namespace, format(frame_hash, "x"), now, now, json.dumps(detections)))
+                # Evict the least recently used entries beyond the size cap
+                self.db.execute("DELETE FROM detections WHERE rowid IN (SELECT rowid FROM detections "
+                                "ORDER BY used DESC LIMIT -1 OFFSET ?)", (self.max_disk_entries,))
+                self.db.commit()
+    
+    def _remember(self, key, created, detections):
+        """
+        Add an entry to the memory cache, evicting the least recently used
+        entries beyond the size cap. Called with the lock held.
+        """
+        self.entries[key] = (created, detections)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+    
+    def close(self):
+        """
+        Close the disk cache, if any.
+        """
+        with self.lock:
+            if self.db is not None:
+                self.db.close()
+                self.db = None 
\ No newline at end of file
@@ -2,21 +2,20 @@
 Object Detector Module
 
 This module provides the core functionality for real-time object detection
-using OpenAI's GPT-4o Vision API.
+using OpenAI's GPT-4o Vision API or a local ONNX model.
 """
 
 import cv2
 import numpy as np
-import base64
 import time
-import os
 import threading
 import queue
-import json
-from openai import OpenAI
+from backends import DEFAULT_MODEL, OpenAIBackend
+from scene_change import DEFAULT_SCENE_CHANGE_GAP, SceneChangeDetector
+from detection_cache import perceptual_hash
+from async_engine import AsyncDetectionEngine
 
 # Default configuration
-DEFAULT_MODEL = "gpt-4o"  # Using GPT-4o for vision capabilities
 DEFAULT_DETECTION_INTERVAL = 2.0  # Seconds between API calls to avoid rate limiting
 DEFAULT_CONFIDENCE_THRESHOLD = 0.6  # Minimum confidence score to display a detection
 
@@ -33,74 +32,112 @@ COLORS = {
 
 class ObjectDetector:
     """
-    Real-time object detector using OpenAI's GPT-4o Vision API.
+    Real-time object detector.
     
-    This class handles the detection of objects in video frames by sending
-    images to the OpenAI API and processing the responses.
+    This class handles the detection of objects in video frames on a pool
+    of background threads, using a detection backend: OpenAI's GPT-4o Vision
+    API by default, or a local model (see backends.py).
+    
+    Each thread has at most one request in flight, so `concurrency` requests
+    can overlap and results arrive as often as requests are started rather
+    than once per round trip. Requests start at most every
+    `detection_interval` seconds, or with scene change gating, as soon as
+    the scene changes but at most every `scene_change_gap` seconds. With
+    several threads, they also start at most every measured round trip
+    divided by their number, which spreads them evenly over a round trip; a
+    rate limiter paces them further. Frames are numbered as they are taken
+    from the queue, and a result is only shown if no newer frame's result
+    was shown before it, so responses arriving out of order never replace
+    newer ones.
     """
     
-    def __init__(self, api_key, model=DEFAULT_MODEL, 
+    def __init__(self, api_key=None, model=DEFAULT_MODEL, 
                  detection_interval=DEFAULT_DETECTION_INTERVAL,
-                 confidence_threshold=DEFAULT_CONFIDENCE_THRESHOLD):
+                 confidence_threshold=DEFAULT_CONFIDENCE_THRESHOLD,
+                 backend=None, scene_change_threshold=None, cache=None,
+                 concurrency=1, rate_limiter=None, tracker=None,
+                 scene_change_gap=DEFAULT_SCENE_CHANGE_GAP):
         """
         Initialize the object detector.
         
         Args:
-            api_key (str): OpenAI API key
-            model (str): OpenAI model to use
-            detection_interval (float): Seconds between API calls
+            api_key (str): OpenAI API key, used when no backend is given
+            model (str): OpenAI model to use, used when no backend is given
+            detection_interval (float): Minimum seconds between the starts of
+                detections, without scene change gating
             confidence_threshold (float): Minimum confidence score for detections
-        """
-        print(f"Initializing ObjectDetector with model: {model}")
+            backend (DetectionBackend): Backend to detect objects with
+                (defaults to an OpenAIBackend)
+            scene_change_threshold (float): Fraction of the image that must
+                change for a detection; None detects every interval
+            cache (DetectionCache): Cache of detections of earlier frames
+            concurrency (int): Number of detections that may run at once
+            rate_limiter (TokenBucket): Limit of requests and tokens per minute
+            tracker (ObjectTracker): Tracker moving the boxes between detections
+            scene_change_gap (float): Minimum seconds between the starts of
+                detections with scene change gating, which keeps noise that
+                crosses the threshold from sending a request every frame
         
-        # Initialize OpenAI client
-        self.setup_openai_client(api_key)
+        With an async backend, such as AsyncOpenAIBackend, the requests run
+        on an asyncio event loop instead of the thread pool.
+        """
+        if backend is None:
+            print(f"Initializing ObjectDetector with model: {model}")
+            backend = OpenAIBackend(api_key, model)
+        else:
+            print(f"Initializing ObjectDetector with {backend.name} backend")
+        self.backend = backend
+        self.cache = cache
+        self.rate_limiter = rate_limiter
+        self.tracker = tracker
+        self.tracked_seq = 0  # Number of the request whose detections are tracked
+        self.frame_number = 0  # Number of the last frame passed to detect_objects()
+        self.request_frames = {}  # Request number -> (number, (width, height)) of its frame
+        self.shown_frame = 0  # Number of the frame whose detections are shown
+        self.shown_size = None  # (width, height) of the image they were made on
         
         # Store configuration
         self.model = model
         self.detection_interval = detection_interval
         self.confidence_threshold = confidence_threshold
+        self.concurrency = max(1, concurrency)
         
         # Initialize state variables
         self.detections = []
         self.last_detection_time = 0
+        self.last_request_time = 0
+        self.round_trip = None  # Moving average of the backend's response time
+        self.request_seq = 0  # Number of the last frame taken for detection
+        self.shown_seq = 0  # Number of the frame whose detections are shown
+        self.dropped_results = 0
         self.frame_queue = queue.Queue(maxsize=1)
         self.result_queue = queue.Queue()
         self.is_running = True
         self.lock = threading.Lock()
         self.auto_detect = True  # Flag to control automatic detection
         
-        # Start detection thread
-        self.detection_thread = threading.Thread(target=self.detection_worker)
-        self.detection_thread.daemon = True
-        self.detection_thread.start()
-        print("Detection thread started")
-    
-    def setup_openai_client(self, api_key):
-        """
-        Set up the OpenAI client with the provided API key.
+        # Scene change gating: detect as soon as the scene changed, never
+        # while it stays the same
+        self.scene_change = None
+        self.scene_change_gap = scene_change_gap
+        if scene_change_threshold is not None:
+            self.scene_change = SceneChangeDetector(scene_change_threshold)
+        self.scene_changed = True
         
-        Args:
-            api_key (str): OpenAI API key
-        """
-        # Check API key format, if it's sk-proj format, try special handling
-        if api_key.startswith("sk-"):
-            print("Setting up OpenAI client...")
-            # Ensure environment variable is set
-            os.environ["OPENAI_API_KEY"] = api_key
-            
-            try:
-                # Try to initialize client using environment variable
-                self.client = OpenAI()
-                print("Using environment variable to initialize OpenAI client")
-            except Exception as e:
-                print(f"Failed to initialize OpenAI client using environment variable: {e}")
-                # Fall back to direct API key
-                self.client = OpenAI(api_key=api_key)
-                print("Falling back to direct API key")
+        # Start detection threads, or the event loop of an async backend
+        self.detection_threads = []
+        self.engine = None
+        if getattr(backend, "is_async", False):
+            self.engine = AsyncDetectionEngine(self, concurrency)
+            self.engine.start()
+            print("Async detection engine started")
         else:
-            print("Invalid API key format")
-            raise ValueError("Invalid API key format. API key should start with 'sk-'")
+            for _ in range(self.concurrency):
+                thread = threading.Thread(target=self.detection_worker)
+                thread.daemon = True
+                thread.start()
+                self.detection_threads.append(thread)
+            print(f"{len(self.detection_threads)} detection thread(s) started")
     
     def get_color(self, category):
         """
@@ -108,7 +145,7 @@ class ObjectDetector:
         
         Args:
             category (str): Object category name
-            
+        
         Returns:
             tuple: BGR color tuple
         """
@@ -124,142 +161,207 @@ class ObjectDetector:
         """
         while self.is_running:
             try:
-                # Only check timing if auto-detect is on
-                if self.auto_detect and time.time() - self.last_detection_time < self.detection_interval:
-                    time.sleep(0.1)  # Sleep to avoid busy waiting
+                request = self.next_request()
+                if request is None:
                     continue
+                seq, frame = request
                 
+                # Detect objects with the backend, unless a similar frame was
+                # already answered
                 try:
-                    frame = self.frame_queue.get(block=False)
-                except queue.Empty:
-                    time.sleep(0.1)
-                    continue
-                
-                # Encode image for OpenAI API
-                _, buffer = cv2.imencode('.jpg', frame)
-                base64_image = base64.b64encode(buffer).decode('utf-8')
+                    detections, cache_key = self.lookup_cache(frame)
+                    if detections is None:
+                        if self.rate_limiter is not None and not self.wait_for_rate_limit(frame):
+                            break  # Stopped while waiting
+                        start = time.time()
+                        detections = self.backend.detect(frame)
+                        self.record_round_trip(time.time() - start)
+                        self.store_cache(cache_key, detections)
+                    self.deliver(seq, detections)
                 
-                # Make API call
-                try:
-                    print("Sending API request...")
-                    
-                    response = self.client.chat.completions.create(
-                        model=self.model,
-                        messages=[
-                            {"role": "system", "content": "You are an object detection system. Identify all visible objects in the image with their bounding box coordinates. Return a JSON array with objects, their confidence scores, and bounding boxes [x1,y1,x2,y2] as proportions of image (0-1)."},
-                            {"role": "user", "content": [
-                                {"type": "text", "text": "Detect all objects in this image with bounding boxes. Return a JSON array with format [{\"label\": \"object name\", \"confidence\": 0.95, \"bbox\": [x1, y1, x2, y2]}]"},
-                                {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}}
-                            ]}
-                        ]
-                    )
-                    
-                    # Parse the response
-                    result_text = response.choices[0].message.content.strip()
-                    print(f"API response received successfully, length: {len(result_text)} characters")
-                    
-                    # Extract JSON from response
-                    detections = self.extract_json_from_response(result_text)
-                    
-                    # Filter out low confidence detections
-                    valid_detections = [d for d in detections if d.get('confidence', 0) >= self.confidence_threshold]
-                    
-                    # Update detections with timestamp
-                    with self.lock:
-                        self.detections = valid_detections
-                        self.last_detection_time = time.time()
-                        self.result_queue.put(valid_detections)
-                        
-                    print(f"Detected {len(valid_detections)} objects")
-                    
                 except Exception as e:
-                    print(f"API call error: {e}")
-                    print(f"Error type: {type(e).__name__}")
-                    print(f"Error details: {str(e)}")
+                    self.report_error(e)
                     time.sleep(1)  # Wait before retrying
-                
+            
             except Exception as e:
                 print(f"Detection thread error: {e}")
                 time.sleep(0.1)
     
-    def extract_json_from_response(self, result_text):
+    def next_request(self, timeout=0.1):
         """
-        Extract JSON data from the API response text.
+        Take the next frame to detect objects in, once it is time for a new
+        detection, and number it.
         
         Args:
-            result_text (str): API response text
-            
+            timeout (float): Maximum seconds to wait for a frame
+        
         Returns:
-            list: List of detection objects
+            tuple: (seq, frame), or None if no frame is due
         """
+        # Only check timing if auto-detect is on
+        remaining = self.last_request_time + self.request_spacing() - time.time()
+        if self.auto_detect and remaining > 0:
+            time.sleep(min(timeout, remaining))  # Sleep to avoid busy waiting
+            return None
+        
         try:
-            # Try to directly parse the entire response
-            detections = json.loads(result_text)
-        except json.JSONDecodeError:
-            print("Direct JSON parsing failed, attempting to extract JSON portion...")
-            # If direct parsing fails, try to extract JSON part
-            try:
-                if "```json" in result_text:
-                    json_text = result_text.split("```json")[1].split("```")[0].strip()
-                elif "```" in result_text:
-                    json_text = result_text.split("```")[1].split("```")[0].strip()
-                else:
-                    # Try to find JSON array start and end
-                    start_idx = result_text.find('[')
-                    end_idx = result_text.rfind(']') + 1
-                    if start_idx >= 0 and end_idx > start_idx:
-                        json_text = result_text[start_idx:end_idx]
-                    else:
-                        # If no JSON array found, try to find JSON object
-                        start_idx = result_text.find('{')
-                        end_idx = result_text.rfind('}') + 1
-                        if start_idx >= 0 and end_idx > start_idx:
-                            json_text = result_text[start_idx:end_idx]
-                        else:
-                            # If no objects detected in response, create empty list
-                            print("No JSON data found in response, possibly no objects detected")
-                            return []
-            
-                print(f"Extracted JSON text: {json_text[:100]}...")
-                detections = json.loads(json_text)
-            except Exception as e:
-                print(f"JSON parsing failed: {e}")
-                # If all parsing attempts fail, return empty list
-                return []
-        
-        # Ensure detections is a list
-        if not isinstance(detections, list):
-            if isinstance(detections, dict) and 'objects' in detections:
-                detections = detections['objects']
+            item = self.frame_queue.get(timeout=timeout) if timeout else self.frame_queue.get(block=False)
+        except queue.Empty:
+            return None
+        number, frame = item
+        with self.lock:
+            self.request_seq += 1
+            self.last_request_time = time.time()
+            self.request_frames[self.request_seq] = (number, (frame.shape[1], frame.shape[0]))
+            return self.request_seq, frame
+    
+    def request_spacing(self):
+        """
+        Get the minimum seconds between the starts of requests: the detection
+        interval, or the scene change gap with scene change gating, or with
+        several requests in flight, the measured round trip divided by their
+        number if that is longer.
+        
+        Returns:
+            float: Seconds between request starts
+        """
+        spacing = self.detection_interval if self.scene_change is None else self.scene_change_gap
+        if self.concurrency > 1 and self.round_trip is not None:
+            return max(spacing, self.round_trip / self.concurrency)
+        return spacing
+    
+    def record_round_trip(self, seconds):
+        """
+        Add the response time of a backend request to the moving average.
+        
+        Args:
+            seconds (float): Seconds the request took
+        """
+        with self.lock:
+            if self.round_trip is None:
+                self.round_trip = seconds
             else:
-                print(f"Warning: Detected result is not list format: {type(detections)}")
-                detections = []
-        
-        # Ensure each detection has necessary fields
-        valid_detections = []
-        for d in detections:
-            if isinstance(d, dict) and 'label' in d and 'bbox' in d:
-                # Add default confidence if missing
-                if 'confidence' not in d:
-                    d['confidence'] = 0.9
-                
-                # Ensure bounding box is correct format [x1, y1, x2, y2]
-                if len(d['bbox']) == 4:
-                    valid_detections.append(d)
-                else:
-                    print(f"Warning: Skipping invalid bounding box format: {d['bbox']}")
+                self.round_trip += 0.2 * (seconds - self.round_trip)
+    
+    def lookup_cache(self, frame):
+        """
+        Look up the detections of a frame in the cache. With scene change
+        gating, a frame is only sent because the scene changed, so nearby
+        hashes would answer it with the detections of the old scene; only
+        the exact hash is looked up then.
         
-        return valid_detections
+        Args:
+            frame (numpy.ndarray): Frame to detect objects in
+        
+        Returns:
+            tuple: (detections or None, cache key to store the result under)
+        """
+        if self.cache is None:
+            return None, None
+        cache_key = (self.backend.cache_key, perceptual_hash(frame))
+        detections = self.cache.get(*cache_key, exact=self.scene_change is not None)
+        if detections is not None and self.backend.verbose:
+            print("Using cached detections")
+        return detections, cache_key
+    
+    def store_cache(self, cache_key, detections):
+        """
+        Store the detections of a frame in the cache.
+        
+        Args:
+            cache_key (tuple): Key returned by lookup_cache()
+            detections (list): Detections returned by the backend
+        """
+        if self.cache is not None:
+            self.cache.put(*cache_key, detections)
+    
+    def deliver(self, seq, detections):
+        """
+        Show the detections of a frame, unless a newer frame's detections are
+        already shown.
+        
+        Args:
+            seq (int): Number of the frame
+            detections (list): Detections returned by the backend
+        
+        Returns:
+            bool: True if the detections are shown, False if they were stale
+        """
+        # Filter out low confidence detections
+        valid_detections = [d for d in detections if d.get('confidence', 0) >= self.confidence_threshold]
+        
+        # Update detections with timestamp
+        with self.lock:
+            if seq < self.shown_seq:
+                self.dropped_results += 1
+                return False
+            self.shown_seq = seq
+            self.shown_frame, self.shown_size = self.request_frames.get(seq, (self.frame_number, None))
+            for other in [other for other in self.request_frames if other <= seq]:
+                del self.request_frames[other]
+            self.detections = valid_detections
+            self.last_detection_time = time.time()
+            self.result_queue.put(valid_detections)
+        
+        if self.backend.verbose:
+            print(f"Detected {len(valid_detections)} objects")
+        return True
+    
+    def report_error(self, error):
+        """
+        Report a failed detection.
+        
+        Args:
+            error (Exception): The error
+        """
+        print(f"Detection error: {error}")
+        print(f"Error type: {type(error).__name__}")
+        print(f"Error details: {str(error)}")
+        if self.scene_change is not None:
+            self.scene_change.reset()  # Retry even if the scene stays the same
+    
+    def wait_for_rate_limit(self, frame):
+        """
+        Wait until the rate limiter allows a request for a frame.
+        
+        Args:
+            frame (numpy.ndarray): Frame about to be sent
+        
+        Returns:
+            bool: True if the request may be sent, False if the detector was stopped
+        """
+        tokens = self.backend.estimate_tokens(frame)
+        while self.is_running:
+            if self.rate_limiter.acquire(tokens, timeout=0.1):
+                return True
+        return False
     
     def detect_objects(self, frame):
         """
         Queue a frame for processing if ready for a new detection.
         
+        A frame is queued once the request spacing (see request_spacing())
+        has passed since the last request. With scene change gating, every
+        frame is compared with the last queued frame, and it is only queued
+        if the scene differs, so a change is sent as soon as the short scene
+        change gap allows, while an unchanged scene keeps the current
+        detections and makes no requests. Frames are numbered, so that
+        detections can be tracked from the frame they were made on.
+        
         Args:
             frame (numpy.ndarray): Video frame to process
         """
-        # If the queue is not full and it's time for a new detection
-        if not self.frame_queue.full() and time.time() - self.last_detection_time >= self.detection_interval:
+        self.frame_number += 1
+        if self.scene_change is not None:
+            self.scene_changed = self.scene_change.check(frame)
+        if self.frame_queue.full():
+            return  # The previous frame is still waiting
+        ready = time.time() - self.last_request_time >= self.request_spacing()
+        if self.scene_change is not None:
+            ready = ready and self.scene_changed
+        
+        # If it's time for a new detection
+        if ready:
             try:
                 # Resize frame to reduce API cost and processing time
                 height, width = frame.shape[:2]
@@ -268,99 +370,134 @@ class ObjectDetector:
                     scale = max_dim / max(height, width)
                     frame = cv2.resize(frame, (int(width * scale), int(height * scale)))
                 
-                self.frame_queue.put(frame.copy(), block=False)
+                self.frame_queue.put((self.frame_number, frame.copy()), block=False)
+                if self.scene_change is not None:
+                    self.scene_change.accept()
             except queue.Full:
                 pass  # Queue is full, skip this frame
     
     def draw_detections(self, frame):
         """
-        Draw bounding boxes and labels on the frame.
+        Draw bounding boxes and labels on the frame. With a tracker, the
+        boxes are first moved along with the objects to this frame, and boxes
+        of lost objects fade out.
         
         Args:
             frame (numpy.ndarray): Video frame to draw on
-            
+        
         Returns:
             numpy.ndarray: Frame with detections drawn
         """
         height, width = frame.shape[:2]
         
         with self.lock:
-            # Display number of detected objects
-            num_detections = len(self.detections)
-            cv2.putText(frame, f"Detected objects: {num_detections}", 
-                       (10, 90), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-            
-            # Draw each detection
-            for detection in self.detections:
-                try:
-                    # Get bounding box coordinates
-                    bbox = detection.get('bbox', [0, 0, 0, 0])
-                    if len(bbox) != 4:
-                        print(f"Warning: Skipping invalid bounding box format: {bbox}")
-                        continue
-                        
-                    x1, y1, x2, y2 = bbox
-                    
-                    # Ensure coordinates are in valid range
-                    if not (0 <= x1 <= 1 and 0 <= y1 <= 1 and 0 <= x2 <= 1 and 0 <= y2 <= 1):
-                        # If coordinates are not proportions, try to convert them
-                        if max(x1, y1, x2, y2) > 1:
-                            x1, y1 = x1 / width, y1 / height
-                            x2, y2 = x2 / width, y2 / height
-                    
-                    # Convert to pixel coordinates
-                    x1, y1 = int(x1 * width), int(y1 * height)
-                    x2, y2 = int(x2 * width), int(y2 * height)
-                    
-                    # Ensure coordinates are valid
-                    x1, y1 = max(0, x1), max(0, y1)
-                    x2, y2 = min(width, x2), min(height, y2)
-                    
-                    # Skip if bounding box is too small
-                    if x2 - x1 < 10 or y2 - y1 < 10:
-                        continue
-                    
-                    # Get label and confidence
-                    label = detection.get('label', 'unknown')
-                    confidence = detection.get('confidence', 0)
-                    
-                    # Determine color based on object category
-                    color = self.get_color(label)
-                    
-                    # Draw bounding box
-                    cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
-                    
-                    # Prepare label text
-                    text = f"{label} ({confidence:.2f})"
-                    
-                    # Calculate text size and position
-                    font = cv2.FONT_HERSHEY_SIMPLEX
-                    font_scale = 0.6
-                    thickness = 2
-                    (text_width, text_height), _ = cv2.getTextSize(text, font, font_scale, thickness)
-                    
-                    # Draw text background
-                    cv2.rectangle(frame, (x1, y1 - text_height - 10), (x1 + text_width, y1), color, -1)
-                    
-                    # Draw text
-                    cv2.putText(frame, text, (x1, y1 - 5), font, font_scale, (0, 0, 0), thickness)
-                except Exception as e:
-                    print(f"Error drawing detection result: {e}")
+            detections = self.detections
+            seq = self.shown_seq
+            shown_frame = self.shown_frame
+            shown_size = self.shown_size
+        
+        # Move the boxes along with the objects, before drawing on the frame.
+        # New detections are tracked from the frame they were made on.
+        if self.tracker is not None:
+            self.tracker.track(frame, self.frame_number)
+            if seq != self.tracked_seq:
+                self.tracker.reset(detections, shown_frame, shown_size)
+                self.tracked_seq = seq
+            detections = self.tracker.results()
+        
+        # Display number of detected objects
+        num_detections = sum(1 for d in detections if d.get('alpha', 1.0) >= 1.0)
+        cv2.putText(frame, f"Detected objects: {num_detections}", 
+                   (10, 90), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+        
+        # Draw each detection
+        for detection in detections:
+            try:
+                # Get bounding box coordinates
+                bbox = detection.get('bbox', [0, 0, 0, 0])
+                if len(bbox) != 4:
+                    print(f"Warning: Skipping invalid bounding box format: {bbox}")
                     continue
+                
+                x1, y1, x2, y2 = bbox
+                
+                # Ensure coordinates are in valid range
+                if not (0 <= x1 <= 1 and 0 <= y1 <= 1 and 0 <= x2 <= 1 and 0 <= y2 <= 1):
+                    # If coordinates are not proportions, try to convert them
+                    if max(x1, y1, x2, y2) > 1:
+                        x1, y1 = x1 / width, y1 / height
+                        x2, y2 = x2 / width, y2 / height
+                
+                # Convert to pixel coordinates
+                x1, y1 = int(x1 * width), int(y1 * height)
+                x2, y2 = int(x2 * width), int(y2 * height)
+                
+                # Ensure coordinates are valid
+                x1, y1 = max(0, x1), max(0, y1)
+                x2, y2 = min(width, x2), min(height, y2)
+                
+                # Skip if bounding box is too small
+                if x2 - x1 < 10 or y2 - y1 < 10:
+                    continue
+                
+                # Get label and confidence
+                label = detection.get('label', 'unknown')
+                confidence = detection.get('confidence', 0)
+                
+                # Determine color based on object category
+                color = self.get_color(label)
+                
+                # Prepare label text
+                text = f"{label} ({confidence:.2f})"
+                
+                # Calculate text size and position
+                font = cv2.FONT_HERSHEY_SIMPLEX
+                font_scale = 0.6
+                thickness = 2
+                (text_width, text_height), _ = cv2.getTextSize(text, font, font_scale, thickness)
+                
+                # Keep what is under a fading track, to blend its drawing in
+                alpha = detection.get('alpha', 1.0)
+                if alpha < 1.0:
+                    region = frame[max(0, y1 - text_height - 10):y2 + 2, x1:max(x2, x1 + text_width) + 2]
+                    original = region.copy()
+                
+                # Draw bounding box
+                cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+                
+                # Draw text background
+                cv2.rectangle(frame, (x1, y1 - text_height - 10), (x1 + text_width, y1), color, -1)
+                
+                # Draw text
+                cv2.putText(frame, text, (x1, y1 - 5), font, font_scale, (0, 0, 0), thickness)
+                
+                if alpha < 1.0:
+                    cv2.addWeighted(region, alpha, original, 1 - alpha, 0, dst=region)
+            except Exception as e:
+                print(f"Error drawing detection result: {e}")
+                continue
         
         # Draw last detection timestamp
-        time_since_last = time.time() - self.last_detection_time
-        ready_for_new = time_since_last >= self.detection_interval
+        time_since_last = time.time() - self.last_request_time
+        spacing = self.request_spacing()
+        ready_for_new = time_since_last >= spacing
         
         # Display countdown to next detection
         if not ready_for_new:
-            time_remaining = self.detection_interval - time_since_last
+            time_remaining = spacing - time_since_last
             status_text = f"Next detection in: {time_remaining:.1f}s"
             status_color = (0, 165, 255)  # Orange
+        elif self.scene_change is not None:
+            if self.scene_changed:
+                status_text = "Scene changed, detecting"
+                status_color = (0, 255, 0)  # Green
+            else:
+                status_text = f"Scene unchanged ({self.scene_change.score * 100:.1f}% changed)"
+                status_color = (200, 200, 200)  # Gray
         else:
             status_text = "Ready for new detection"
             status_color = (0, 255, 0)  # Green
-            
+        
         # Draw timestamp and status
         cv2.putText(frame, f"Last detection: {time.strftime('%H:%M:%S', time.localtime(self.last_detection_time))}", 
                    (10, height - 40), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
@@ -371,8 +508,14 @@ class ObjectDetector:
     
     def stop(self):
         """
-        Stop the detection thread.
+        Stop the detection threads and release the backend.
         """
         self.is_running = False
-        if self.detection_thread.is_alive():
-            self.detection_thread.join(timeout=1.0) 
\ No newline at end of file
+        for thread in self.detection_threads:
+            if thread.is_alive():
+                thread.join(timeout=1.0)
+        if self.engine is not None:
+            self.engine.stop()
+        self.backend.close()
+        if self.cache is not None:
+            self.cache.close()  
\ No newline at end of file
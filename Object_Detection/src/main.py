@@ -10,6 +10,8 @@ Usage:
 3. Specify API key: python main.py --api-key "your-api-key"
 4. Debug mode: python main.py --debug
 5. Manual detection mode: python main.py --manual
+6. Local model: python main.py --backend local --model-path yolov8n.onnx
+7. Asyncio API client: python main.py --async --concurrency 4
 
 Controls:
 - ESC: Exit program
@@ -25,7 +27,13 @@ import queue
 import os
 
 # Import local modules
-from detector import ObjectDetector
+from detector import ObjectDetector, DEFAULT_DETECTION_INTERVAL
+from scene_change import DEFAULT_SCENE_CHANGE_GAP, DEFAULT_SCENE_CHANGE_THRESHOLD
+from detection_cache import DetectionCache, DEFAULT_CACHE_TTL, DEFAULT_CACHE_SIZE
+from rate_limiter import TokenBucket
+from async_engine import AsyncOpenAIBackend, DEFAULT_REQUEST_TIMEOUT, DEFAULT_MAX_RETRIES
+from tracker import ObjectTracker
+from backends import OpenCVDNNBackend, load_labels
 from camera_utils import open_camera, suggest_camera_connection
 from api_utils import validate_api_key, get_api_key
 
@@ -42,6 +50,33 @@ def parse_arguments():
     parser.add_argument('--api-key', type=str, help='OpenAI API key')
     parser.add_argument('--manual', action='store_true', help='Manual detection mode')
     parser.add_argument('--url', type=str, help='IP camera URL (e.g., http://192.168.1.100:8080/video)')
+    parser.add_argument('--backend', choices=['openai', 'local'], default='openai',
+                        help='Detect objects with the OpenAI API or a local ONNX model')
+    parser.add_argument('--model-path', type=str, help='ONNX model file for the local backend (e.g., yolov8n.onnx)')
+    parser.add_argument('--labels', type=str, help='Class names file for the local backend, one per line (default: COCO)')
+    parser.add_argument('--input-size', type=int, default=640, help='Model input size for the local backend')
+    parser.add_argument('--interval', type=float,
+                        help=f'Minimum seconds between detections (default: {DEFAULT_DETECTION_INTERVAL} for openai, '
+                             '0 for local or with --concurrency, --rpm or --tpm); with scene change gating, '
+                             'a given interval is kept as the minimum --scene-gap')
+    parser.add_argument('--scene-threshold', type=float, default=DEFAULT_SCENE_CHANGE_THRESHOLD,
+                        help='Fraction of the image that must change to trigger a detection (0 disables scene change gating)')
+    parser.add_argument('--scene-gap', type=float,
+                        help=f'Minimum seconds between detections triggered by scene changes (default: '
+                             f'{DEFAULT_SCENE_CHANGE_GAP} for openai, 0 for local or with --concurrency, --rpm or --tpm)')
+    parser.add_argument('--concurrency', type=int, default=1, help='Number of detection requests that may run at once')
+    parser.add_argument('--rpm', type=float, help='Maximum API requests per minute')
+    parser.add_argument('--tpm', type=float, help='Maximum API tokens per minute')
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help='Send API requests from an asyncio event loop, with retries and backoff')
+    parser.add_argument('--base-url', type=str, help='URL of an OpenAI-compatible API, e.g. a local test server (implies --async)')
+    parser.add_argument('--timeout', type=float, default=DEFAULT_REQUEST_TIMEOUT, help='Seconds before an API request is abandoned')
+    parser.add_argument('--max-retries', type=int, default=DEFAULT_MAX_RETRIES, help='Retries of a failed API request')
+    parser.add_argument('--no-track', action='store_true', help='Do not move boxes along with objects between detections')
+    parser.add_argument('--no-cache', action='store_true', help='Do not cache detections of similar frames')
+    parser.add_argument('--cache-file', type=str, help='Also keep cached detections in this SQLite file between runs')
+    parser.add_argument('--cache-ttl', type=float, default=DEFAULT_CACHE_TTL, help='Seconds cached detections stay valid')
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE, help='Detections kept in the memory cache')
     return parser.parse_args()
 
 def print_debug_info():
@@ -83,19 +118,51 @@ def main():
         print("Debug mode enabled")
         print_debug_info()
     
-    # Get API key
-    api_key = get_api_key(args.api_key)
-    if not api_key:
-        print("Error: OpenAI API key not provided.")
-        print("Please provide an API key using the --api-key parameter or set the OPENAI_API_KEY environment variable.")
-        return
+    # Set up the detection backend
+    backend = None
+    api_key = None
+    if args.backend == 'local':
+        if not args.model_path:
+            print("Error: The local backend needs an ONNX model. Please provide one using the --model-path parameter.")
+            return
+        labels = load_labels(args.labels) if args.labels else None
+        try:
+            backend = OpenCVDNNBackend(args.model_path, labels, input_size=args.input_size)
+        except (OSError, cv2.error) as e:
+            print(f"Error: Could not load the model: {e}")
+            return
+    else:
+        # Get API key
+        api_key = get_api_key(args.api_key)
+        if not api_key:
+            print("Error: OpenAI API key not provided.")
+            print("Please provide an API key using the --api-key parameter or set the OPENAI_API_KEY environment variable.")
+            return
+        
+        # Validate API key, unless another server stands in for the API
+        if not args.base_url:
+            is_valid, message = validate_api_key(api_key)
+            if not is_valid:
+                print(f"Error: {message}")
+                print("Please provide a valid OpenAI API key.")
+                return
+        
+        if args.use_async or args.base_url:
+            backend = AsyncOpenAIBackend(api_key, base_url=args.base_url, timeout=args.timeout,
+                                         max_retries=args.max_retries)
     
-    # Validate API key
-    is_valid, message = validate_api_key(api_key)
-    if not is_valid:
-        print(f"Error: {message}")
-        print("Please provide a valid OpenAI API key.")
-        return
+    # Local models are fast and free, so they can run on every frame. Several
+    # concurrent requests or rate limits pace API requests by themselves.
+    no_interval = args.backend == 'local' or args.concurrency > 1 or args.rpm or args.tpm
+    interval = args.interval
+    if interval is None:
+        interval = 0.0 if no_interval else DEFAULT_DETECTION_INTERVAL
+    scene_gap = args.scene_gap
+    if scene_gap is None:
+        scene_gap = 0.0 if no_interval else DEFAULT_SCENE_CHANGE_GAP
+    if args.interval is not None and args.scene_threshold > 0:
+        # Scene change gating replaces the interval, so keep it as a floor
+        scene_gap = max(scene_gap, args.interval)
     
     # Open camera
     cap, success = open_camera(args.camera, args.url)
@@ -104,7 +171,17 @@ def main():
     
     # Initialize object detector
     print("Initializing object detector...")
-    detector = ObjectDetector(api_key)
+    scene_threshold = args.scene_threshold if args.scene_threshold > 0 else None
+    cache = None
+    if not args.no_cache:
+        cache = DetectionCache(args.cache_file, ttl=args.cache_ttl, max_entries=args.cache_size)
+    rate_limiter = None
+    if args.rpm or args.tpm:
+        rate_limiter = TokenBucket(args.rpm, args.tpm)
+    detector = ObjectDetector(api_key, detection_interval=interval, backend=backend,
+                              scene_change_threshold=scene_threshold, cache=cache,
+                              concurrency=args.concurrency, rate_limiter=rate_limiter,
+                              tracker=None if args.no_track else ObjectTracker(), scene_change_gap=scene_gap)
     
     # Set initial auto detection mode based on args
     if args.manual:
@@ -152,12 +229,12 @@ def main():
                 print("Manually triggering detection")
                 # Force queue a frame for detection regardless of timing
                 try:
-                    detector.frame_queue.put(frame.copy(), block=False)
+                    detector.frame_queue.put((detector.frame_number, frame.copy()), block=False)
                 except queue.Full:
                     # If queue is full, clear it and try again
                     try:
                         detector.frame_queue.get(block=False)
-                        detector.frame_queue.put(frame.copy(), block=False)
+                        detector.frame_queue.put((detector.frame_number, frame.copy()), block=False)
                     except:
                         pass
             elif key == ord('a'):  # Toggle automatic detection
@@ -0,0 +1,98 @@
+"""
+Rate Limiter Module
+
+This module provides a token bucket limiting how many API requests, and how
+many API tokens, are used per minute.
+"""
+
+import threading
+import time
+
+class TokenBucket:
+    """
+    Token bucket rate limiter for requests and tokens per minute.
+    
+    Each limit is a bucket holding up to a minute's allowance, refilled
+    continuously at the per-minute rate. A request takes one request and its
+    estimated number of tokens, and waits until both buckets hold enough.
+    The buckets start full, so a burst of up to a minute's allowance goes
+    through at once, like the limits of the OpenAI API.
+    """
+    
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None):
+        """
+        Initialize the buckets.
+        
+        Args:
+            requests_per_minute (float): Allowed requests per minute, or None for no limit
+            tokens_per_minute (float): Allowed tokens per minute, or None for no limit
+        """
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.requests = requests_per_minute or 0.0
+        self.tokens = tokens_per_minute or 0.0
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def _refill(self, now):
+        """
+        Add the allowance accrued since the last refill. Called with the lock held.
+        """
+        elapsed = now - self.last_refill
+        self.last_refill = now
+        if self.requests_per_minute:
+            self.requests = min(self.requests_per_minute, self.requests + elapsed * self.requests_per_minute / 60.0)
+        if self.tokens_per_minute:
+            self.tokens = min(self.tokens_per_minute, self.tokens + elapsed * self.tokens_per_minute / 60.0)
+    
+    def try_acquire(self, tokens=0):
+        """
+        Take a request and its tokens if both buckets hold enough.
+        
+        Args:
+            tokens (int): Estimated tokens of the request; requests larger than
+                the per-minute limit wait for a full bucket
+        
+        Returns:
+            float: 0 if acquired, else the seconds to wait before trying again
+        """
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            wait = 0.0
+            if self.requests_per_minute and self.requests < 1:
+                wait = max(wait, (1 - self.requests) * 60.0 / self.requests_per_minute)
+            if self.tokens_per_minute:
+                tokens = min(tokens, self.tokens_per_minute)
+                if self.tokens < tokens:
+                    wait = max(wait, (tokens - self.tokens) * 60.0 / self.tokens_per_minute)
+            if wait > 0:
+                return wait
+            if self.requests_per_minute:
+                self.requests -= 1
+            if self.tokens_per_minute:
+                self.tokens -= tokens
+            return 0.0
+    
+    def acquire(self, tokens=0, timeout=None):
+        """
+        Wait until a request and its tokens can be taken, then take them.
+        
+        Args:
+            tokens (int): Estimated tokens of the request
+            timeout (float): Maximum seconds to wait, or None to wait forever
+        
+        Returns:
+            bool: True if acquired, False if the timeout expired first
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait == 0:
+                return True
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait) 
\ No newline at end of file
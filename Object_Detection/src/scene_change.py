@@ -0,0 +1,89 @@
+"""
+Scene Change Module
+
+This module provides a cheap detector of changes in the camera view, used to
+skip detection requests while the scene stays the same.
+"""
+
+import cv2
+import numpy as np
+
+DEFAULT_SCENE_CHANGE_THRESHOLD = 0.01  # Fraction of the image that must change
+DEFAULT_SCENE_CHANGE_GAP = 0.5  # Minimum seconds between detections of a changing scene
+
+class SceneChangeDetector:
+    """
+    Compares frames with the last frame submitted for detection.
+    
+    Frames are reduced to small blurred grayscale thumbnails, which removes
+    sensor noise and compression artifacts, and the fraction of thumbnail
+    pixels whose brightness changed noticeably is compared with a threshold.
+    Counting changed pixels rather than averaging the difference keeps a
+    small object entering the view from being diluted by the static
+    background. Slow changes add up, since the comparison is always against
+    the last submitted frame rather than the previous one.
+    """
+    
+    def __init__(self, threshold=DEFAULT_SCENE_CHANGE_THRESHOLD, width=64, pixel_threshold=12):
+        """
+        Initialize the detector.
+        
+        Args:
+            threshold (float): Fraction of the image (0-1) that must change
+                for the scene to count as changed
+            width (int): Width of the thumbnails compared
+            pixel_threshold (int): Brightness change (0-255) above which a
+                thumbnail pixel counts as changed
+        """
+        self.threshold = threshold
+        self.width = width
+        self.pixel_threshold = pixel_threshold
+        self.reference = None  # Thumbnail of the last submitted frame
+        self.candidate = None  # Thumbnail of the last checked frame
+        self.score = 1.0  # Fraction of the last checked frame that changed
+    
+    def thumbnail(self, frame):
+        """
+        Reduce a frame to a small blurred grayscale image.
+        
+        Args:
+            frame (numpy.ndarray): BGR video frame
+        
+        Returns:
+            numpy.ndarray: Grayscale thumbnail
+        """
+        height, width = frame.shape[:2]
+        size = (self.width, max(1, round(height * self.width / width)))
+        small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(gray, (3, 3), 0)
+    
+    def check(self, frame):
+        """
+        Check whether a frame differs from the last submitted frame.
+        
+        Args:
+            frame (numpy.ndarray): BGR video frame
+        
+        Returns:
+            bool: True if the scene changed, or if no frame was submitted yet
+        """
+        self.candidate = self.thumbnail(frame)
+        if self.reference is None or self.reference.shape != self.candidate.shape:
+            self.score = 1.0
+            return True
+        difference = cv2.absdiff(self.candidate, self.reference)
+        self.score = np.count_nonzero(difference > self.pixel_threshold) / difference.size
+        return self.score >= self.threshold
+    
+    def accept(self):
+        """
+        Make the last checked frame the reference, once it was submitted.
+        """
+        self.reference = self.candidate
+    
+    def reset(self):
+        """
+        Forget the reference, so the next frame counts as changed.
+        """
+        self.reference = None 
\ No newline at end of file
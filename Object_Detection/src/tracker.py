@@ -0,0 +1,323 @@
+"""
+Object Tracker Module
+
+This module moves the bounding boxes of the last detection along with the
+objects in every frame, so boxes follow moving objects between detections.
+"""
+
+import time
+from collections import deque
+import cv2
+import numpy as np
+
+DEFAULT_FADE_TIME = 1.0  # Seconds a lost track takes to fade out
+
+class Track:
+    """
+    A detected object followed from frame to frame.
+    """
+    
+    def __init__(self, detection, box, points, template):
+        """
+        Initialize a track.
+        
+        Args:
+            detection (dict): Detection the track started from
+            box (numpy.ndarray): [x1, y1, x2, y2] in tracking pixels
+            points (numpy.ndarray): (N, 1, 2) float32 feature points in the box
+            template (numpy.ndarray): Small grayscale image of the object, or None
+        """
+        self.detection = detection
+        self.box = box
+        self.points = points
+        self.template = template
+        self.lost_time = None
+
+class ObjectTracker:
+    """
+    Tracks detected objects between detections with sparse optical flow.
+    
+    The tracker keeps the last `history` frames it was given, numbered by the
+    caller. Detections arrive a round trip after the frame they were made
+    on, so when they do, corner features are picked inside each box on that
+    frame, where the objects really are, and followed through the frames
+    since to the newest one.
+    
+    Every frame, the features are followed with pyramidal Lucas-Kanade
+    optical flow, checked by tracking them back to the previous frame, and
+    each box is moved by the median motion of its features and scaled by the
+    median change of the distances between them. A track is lost when too
+    few of its features survive or its box leaves the frame, and then fades
+    out over `fade_time` seconds. Since features on the background behind
+    an object that left keep being tracked, a track is also lost when its box
+    no longer looks like the object did when it was detected. Tracks that new
+    detections no longer contain fade out the same way instead of
+    disappearing at once.
+    """
+    
+    def __init__(self, fade_time=DEFAULT_FADE_TIME, width=640, max_points=40, min_points=5, max_error=1.0,
+                 min_similarity=0.4, history=150):
+        """
+        Initialize the tracker.
+        
+        Args:
+            fade_time (float): Seconds a lost track takes to fade out
+            width (int): Frames are tracked at this width
+            max_points (int): Features picked per box
+            min_points (int): Features a track needs to stay alive
+            max_error (float): Largest forward-backward tracking error of a
+                feature, in tracking pixels
+            min_similarity (float): Lowest correlation (-1 to 1) between the
+                box and the object as first detected
+            history (int): Frames kept for following new detections from the
+                frame they were made on
+        """
+        self.fade_time = fade_time
+        self.width = width
+        self.max_points = max_points
+        self.min_points = min_points
+        self.max_error = max_error
+        self.min_similarity = min_similarity
+        self.tracks = []
+        self.frames = deque(maxlen=history)  # (number, grayscale image) of recent frames
+        self.frame_size = None  # (width, height) of the last frame given to track()
+        self.lk_params = dict(winSize=(15, 15), maxLevel=2,
+                              criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03))
+    
+    def prepare(self, frame):
+        """
+        Convert a frame to the grayscale image that is tracked.
+        
+        Args:
+            frame (numpy.ndarray): BGR video frame
+        
+        Returns:
+            numpy.ndarray: Grayscale image at most `width` pixels wide
+        """
+        height, width = frame.shape[:2]
+        if width > self.width:
+            frame = cv2.resize(frame, (self.width, round(height * self.width / width)), interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    
+    def track(self, frame, number):
+        """
+        Add a frame and move the tracks to it.
+        
+        Args:
+            frame (numpy.ndarray): BGR video frame
+            number (int): Number of the frame, increasing from frame to frame
+        """
+        gray = self.prepare(frame)
+        self.frame_size = (frame.shape[1], frame.shape[0])
+        now = time.time()
+        if self.frames and self.frames[-1][1].shape == gray.shape:
+            live = [track for track in self.tracks if track.lost_time is None]
+            if live:
+                self.follow(live, self.frames[-1][1], gray, now)
+        elif self.frames:
+            self.frames.clear()  # The frame size changed
+        self.frames.append((number, gray))
+    
+    def reset(self, detections, number, size=None):
+        """
+        Start tracking a new set of detections, made on an earlier frame, and
+        follow them to the newest frame.
+        
+        Args:
+            detections (list): Detections with bbox as proportions of the
+                image, or as pixels of the image if any value is above 1
+            number (int): Number of the frame the detections were made on; if
+                it is no longer kept, the oldest kept frame is used
+            size (tuple): (width, height) of the image the detections were
+                made on, which may have been resized from the frame
+                (defaults to the size of the frames given to track())
+        """
+        if not self.frames:
+            return
+        start = 0
+        while start < len(self.frames) - 1 and self.frames[start][0] < number:
+            start += 1
+        gray = self.frames[start][1]
+        height, width = gray.shape
+        scale = np.array([width, height, width, height], dtype=np.float32)
+        pixels = np.array((size or self.frame_size) * 2, dtype=np.float32)
+        now = time.time()
+        
+        tracks = []
+        for detection in detections:
+            box = np.array(detection.get('bbox', [0, 0, 0, 0]), dtype=np.float32)
+            if len(box) != 4:
+                continue
+            if box.max() > 1:
+                box = box / pixels  # Pixels of the image the detections were made on
+            box = box * scale
+            tracks.append(Track(detection, box, self.pick_points(gray, box), self.crop(gray, box)))
+        
+        # Follow the new tracks through the frames since
+        for index in range(start + 1, len(self.frames)):
+            live = [track for track in tracks if track.lost_time is None]
+            if not live:
+                break
+            self.follow(live, self.frames[index - 1][1], self.frames[index][1], now)
+        
+        # Old tracks that no new detection overlaps fade out
+        for track in self.tracks:
+            if not any(self.overlap(track.box, new.box) > 0.3 for new in tracks):
+                if track.lost_time is None:
+                    track.lost_time = now
+                tracks.append(track)
+        
+        self.tracks = tracks
+    
+    def pick_points(self, gray, box):
+        """
+        Pick corner features inside a box.
+        
+        Args:
+            gray (numpy.ndarray): Grayscale image
+            box (numpy.ndarray): [x1, y1, x2, y2] in tracking pixels
+        
+        Returns:
+            numpy.ndarray: (N, 1, 2) float32 points, possibly empty
+        """
+        height, width = gray.shape
+        x1, y1 = max(0, int(box[0])), max(0, int(box[1]))
+        x2, y2 = min(width, int(box[2])), min(height, int(box[3]))
+        if x2 - x1 < 4 or y2 - y1 < 4:
+            return np.empty((0, 1, 2), dtype=np.float32)
+        points = cv2.goodFeaturesToTrack(gray[y1:y2, x1:x2], self.max_points, 0.01, 3)
+        if points is None:
+            return np.empty((0, 1, 2), dtype=np.float32)
+        return points + np.array([x1, y1], dtype=np.float32)
+    
+    @staticmethod
+    def crop(gray, box, size=24):
+        """
+        Crop a box and shrink it to a small fixed-size image.
+        
+        Args:
+            gray (numpy.ndarray): Grayscale image
+            box (numpy.ndarray): [x1, y1, x2, y2] in tracking pixels
+            size (int): Width and height of the result
+        
+        Returns:
+            numpy.ndarray: size x size image, or None if the box is outside the image
+        """
+        height, width = gray.shape
+        x1, y1 = max(0, int(box[0])), max(0, int(box[1]))
+        x2, y2 = min(width, int(box[2])), min(height, int(box[3]))
+        if x2 - x1 < 4 or y2 - y1 < 4:
+            return None
+        return cv2.resize(gray[y1:y2, x1:x2], (size, size), interpolation=cv2.INTER_AREA)
+    
+    @staticmethod
+    def overlap(a, b):
+        """
+        Compute the intersection over union of two boxes.
+        
+        Args:
+            a (numpy.ndarray): [x1, y1, x2, y2]
+            b (numpy.ndarray): [x1, y1, x2, y2]
+        
+        Returns:
+            float: Intersection over union (0-1)
+        """
+        width = min(a[2], b[2]) - max(a[0], b[0])
+        height = min(a[3], b[3]) - max(a[1], b[1])
+        if width <= 0 or height <= 0:
+            return 0.0
+        intersection = width * height
+        union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - intersection
+        return float(intersection / union) if union > 0 else 0.0
+    
+    def results(self):
+        """
+        Get the tracked detections in the newest frame.
+        
+        Returns:
+            list: Detections with bbox moved to the frame, as proportions of
+                the image, and an 'alpha' from 1 (tracked) down to 0 (faded out)
+        """
+        if not self.frames:
+            return []
+        height, width = self.frames[-1][1].shape
+        scale = np.array([width, height, width, height], dtype=np.float32)
+        now = time.time()
+        results = []
+        tracks = []
+        for track in self.tracks:
+            alpha = 1.0
+            if track.lost_time is not None:
+                alpha = 1.0 - (now - track.lost_time) / self.fade_time
+                if alpha <= 0:
+                    continue  # Faded out
+            tracks.append(track)
+            result = dict(track.detection)
+            result['bbox'] = [float(v) for v in np.clip(track.box / scale, 0, 1)]
+            result['alpha'] = alpha
+            results.append(result)
+        self.tracks = tracks
+        return results
+    
+    def follow(self, tracks, prev_gray, gray, now):
+        """
+        Follow the features of tracks from one frame to the next, and move
+        and scale their boxes.
+        
+        Args:
+            tracks (list): Live tracks
+            prev_gray (numpy.ndarray): Previous grayscale image
+            gray (numpy.ndarray): Current grayscale image
+            now (float): Current time
+        """
+        # Track the features of all tracks in one call, forward and back
+        counts = [len(track.points) for track in tracks]
+        if sum(counts) == 0:
+            for track in tracks:
+                track.lost_time = now
+            return
+        points = np.concatenate([track.points for track in tracks])
+        forward, status, _ = cv2.calcOpticalFlowPyrLK(prev_gray, gray, points, None, **self.lk_params)
+        backward, back_status, _ = cv2.calcOpticalFlowPyrLK(gray, prev_gray, forward, None, **self.lk_params)
+        error = np.linalg.norm((points - backward).reshape(-1, 2), axis=1)
+        good = (status.ravel() == 1) & (back_status.ravel() == 1) & (error < self.max_error)
+        
+        height, width = gray.shape
+        start = 0
+        for track, count in zip(tracks, counts):
+            keep = good[start:start + count]
+            old = points[start:start + count][keep].reshape(-1, 2)
+            new = forward[start:start + count][keep].reshape(-1, 2)
+            start += count
+            if len(new) < self.min_points:
+                track.lost_time = now
+                continue
+            
+            # Move by the median motion, and scale by the median ratio of
+            # distances between features
+            shift = np.median(new - old, axis=0)
+            ratio = 1.0
+            if len(new) >= 10:
+                old_spread = np.linalg.norm(old - old.mean(axis=0), axis=1)
+                new_spread = np.linalg.norm(new - new.mean(axis=0), axis=1)
+                valid = old_spread > 1
+                if valid.any():
+                    ratio = float(np.clip(np.median(new_spread[valid] / old_spread[valid]), 0.8, 1.25))
+                    if abs(ratio - 1.0) < 0.02:
+                        ratio = 1.0  # Ignore jitter, which would add up
+            center = (track.box[:2] + track.box[2:]) / 2 + shift
+            half = (track.box[2:] - track.box[:2]) / 2 * ratio
+            track.box = np.concatenate((center - half, center + half)).astype(np.float32)
+            track.points = new.reshape(-1, 1, 2).astype(np.float32)
+            if len(new) < self.max_points // 2:
+                # Pick new features as old ones are lost
+                track.points = self.pick_points(gray, track.box)
+            
+            # Lost when the box has left the frame or no longer shows the object
+            if track.box[2] <= 0 or track.box[3] <= 0 or track.box[0] >= width or track.box[1] >= height:
+                track.lost_time = now
+            elif track.template is not None:
+                patch = self.crop(gray, track.box)
+                similarity = -1.0 if patch is None else cv2.matchTemplate(patch, track.template, cv2.TM_CCOEFF_NORMED)[0, 0]
+                if similarity < self.min_similarity:
+                    track.lost_time = now  
\ No newline at end of file
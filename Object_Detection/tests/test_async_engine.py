@@ -0,0 +1,168 @@
+"""
+Tests for the async_engine module.
+"""
+import sys
+import os
+import email.utils
+import json
+import random
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+import numpy as np
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'src'))
+
+from async_engine import AsyncOpenAIBackend, backoff_delay, parse_retry_after
+
+try:
+    import openai
+except ImportError:
+    openai = None
+
+class TestParseRetryAfter(unittest.TestCase):
+    """Test cases for reading the delay a server asked for."""
+    
+    def test_no_headers(self):
+        """Test that missing headers mean no delay was asked for."""
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after({}))
+    
+    def test_seconds(self):
+        """Test that Retry-After is read as seconds."""
+        self.assertEqual(parse_retry_after({"retry-after": "7"}), 7.0)
+        self.assertEqual(parse_retry_after({"retry-after": "1.5"}), 1.5)
+    
+    def test_milliseconds_take_precedence(self):
+        """Test that retry-after-ms is preferred over Retry-After."""
+        headers = {"retry-after-ms": "250", "retry-after": "7"}
+        self.assertEqual(parse_retry_after(headers), 0.25)
+    
+    def test_http_date(self):
+        """Test that Retry-After is read as an HTTP date."""
+        now = 1700000000.0
+        headers = {"retry-after": email.utils.formatdate(now + 30, usegmt=True)}
+        with mock.patch('async_engine.time.time', return_value=now):
+            self.assertAlmostEqual(parse_retry_after(headers), 30.0)
+    
+    def test_past_http_date(self):
+        """Test that a date in the past means no wait."""
+        now = 1700000000.0
+        headers = {"retry-after": email.utils.formatdate(now - 30, usegmt=True)}
+        with mock.patch('async_engine.time.time', return_value=now):
+            self.assertEqual(parse_retry_after(headers), 0.0)
+    
+    def test_invalid_value(self):
+        """Test that an unreadable Retry-After is ignored."""
+        self.assertIsNone(parse_retry_after({"retry-after": "soon"}))
+
+class TestBackoffDelay(unittest.TestCase):
+    """Test cases for the jittered exponential backoff."""
+    
+    def setUp(self):
+        random.seed(0)
+    
+    def test_jitter_bound(self):
+        """Test that delays are drawn between 0 and the doubling bound."""
+        for attempt in range(4):
+            delays = [backoff_delay(attempt, base=0.5, cap=100.0) for _ in range(200)]
+            self.assertGreaterEqual(min(delays), 0.0)
+            self.assertLessEqual(max(delays), 0.5 * 2 ** attempt)
+            self.assertGreater(max(delays), 0.5 * 2 ** attempt * 0.9)
+    
+    def test_cap(self):
+        """Test that the bound stops growing at the cap."""
+        delays = [backoff_delay(20, base=0.5, cap=3.0) for _ in range(200)]
+        self.assertLessEqual(max(delays), 3.0)
+    
+    def test_retry_after_is_minimum(self):
+        """Test that the delay is never shorter than the server asked for."""
+        for _ in range(50):
+            self.assertGreaterEqual(backoff_delay(0, base=0.5, retry_after=4.0), 4.0)
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Answers chat completion requests with the server's queued responses."""
+    
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.server.requests += 1
+        status, headers, body = self.server.responses.pop(0)
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def log_message(self, format, *args):
+        pass
+
+def completion(text):
+    """Build a chat completion response holding a message text."""
+    return {
+        "id": "chatcmpl-test", "object": "chat.completion", "created": 0, "model": "gpt-4o",
+        "choices": [{"index": 0, "finish_reason": "stop",
+                     "message": {"role": "assistant", "content": text}}]
+    }
+
+RATE_LIMITED = (429, {"Retry-After": "0"}, {"error": {"message": "Rate limit reached", "type": "requests"}})
+DETECTIONS = '[{"label": "cup", "confidence": 0.9, "bbox": [0.1, 0.2, 0.3, 0.4]}]'
+
+@unittest.skipIf(openai is None, "openai package not installed")
+class TestAsyncOpenAIBackend(unittest.TestCase):
+    """Test cases for the async backend against a local OpenAI-compatible stand-in server."""
+    
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+        self.server.responses = []
+        self.server.requests = 0
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        
+        self.frame = np.zeros((48, 64, 3), dtype=np.uint8)
+        base_url = f"http://127.0.0.1:{self.server.server_address[1]}/v1"
+        self.backend = AsyncOpenAIBackend("sk-test", base_url=base_url, max_retries=2, backoff_base=0.0)
+        self.addCleanup(self.backend.close)
+    
+    def test_retry_on_rate_limit(self):
+        """Test that a 429 response is retried and the next answer parsed."""
+        self.server.responses = [RATE_LIMITED, (200, {}, completion(DETECTIONS))]
+        detections = self.backend.detect(self.frame)
+        self.assertEqual(self.server.requests, 2)
+        self.assertEqual(self.backend.retries, 1)
+        self.assertEqual(detections[0]['label'], "cup")
+    
+    def test_gives_up_after_max_retries(self):
+        """Test that the last error is raised once the retries are used up."""
+        self.server.responses = [RATE_LIMITED] * 3
+        with self.assertRaises(openai.RateLimitError):
+            self.backend.detect(self.frame)
+        self.assertEqual(self.server.requests, 3)
+    
+    def test_client_reused_between_calls(self):
+        """Test that synchronous calls share one client instead of opening a new one each."""
+        self.server.responses = [(200, {}, completion(DETECTIONS)), (200, {}, completion("[]"))]
+        self.backend.detect(self.frame)
+        client = self.backend.client
+        self.assertEqual(self.backend.detect(self.frame), [])
+        self.assertIs(self.backend.client, client)
+    
+    def test_close(self):
+        """Test that closing the backend closes its client and event loop."""
+        self.server.responses = [(200, {}, completion("[]"))]
+        self.backend.detect(self.frame)
+        client = self.backend.client
+        self.backend.close()
+        self.assertIsNone(self.backend.client)
+        self.assertTrue(client.is_closed())
+        self.assertIsNone(self.backend.sync_loop)
+
+if __name__ == '__main__':
+    unittest.main()
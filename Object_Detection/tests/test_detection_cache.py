@@ -0,0 +1,75 @@
+"""
+Tests for the detection_cache module.
+"""
+import sys
+import os
+import unittest
+from unittest import mock
+import numpy as np
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'src'))
+
+from backends import DetectionBackend
+from detection_cache import DetectionCache
+from detector import ObjectDetector
+
+CUP = [{"label": "cup", "confidence": 0.9, "bbox": [0.1, 0.2, 0.3, 0.4]}]
+
+class TestDetectionCache(unittest.TestCase):
+    """Test cases for exact and near hash lookups."""
+    
+    def setUp(self):
+        self.cache = DetectionCache(max_distance=2)
+        self.cache.put("backend", 0b1010, CUP)
+    
+    def test_exact_hash(self):
+        """Test that the exact hash is found."""
+        self.assertEqual(self.cache.get("backend", 0b1010), CUP)
+        self.assertEqual(self.cache.get("backend", 0b1010, exact=True), CUP)
+    
+    def test_near_hash(self):
+        """Test that a hash within the distance matches unless exact is asked for."""
+        self.assertEqual(self.cache.get("backend", 0b1011), CUP)
+        self.assertIsNone(self.cache.get("backend", 0b1011, exact=True))
+    
+    def test_far_hash(self):
+        """Test that a hash beyond the distance misses."""
+        self.assertIsNone(self.cache.get("backend", 0b0101))
+
+class StillBackend(DetectionBackend):
+    """Backend that is never expected to run."""
+    
+    def detect(self, frame):
+        raise AssertionError("The backend should not be called")
+
+class TestSceneChangeLookup(unittest.TestCase):
+    """Test cases for cache lookups of frames sent because the scene changed."""
+    
+    def make_detector(self, scene_change_threshold):
+        cache = DetectionCache(max_distance=2)
+        detector = ObjectDetector(None, backend=StillBackend(), cache=cache,
+                                  scene_change_threshold=scene_change_threshold)
+        self.addCleanup(detector.stop)
+        cache.put(detector.backend.cache_key, 0b1010, CUP)
+        return detector
+    
+    def lookup(self, detector, frame_hash):
+        frame = np.zeros((48, 64, 3), dtype=np.uint8)
+        with mock.patch('detector.perceptual_hash', return_value=frame_hash):
+            detections, _ = detector.lookup_cache(frame)
+        return detections
+    
+    def test_gated_frame_skips_near_match(self):
+        """Test that a changed scene is not answered with a nearby hash's old detections."""
+        detector = self.make_detector(0.01)
+        self.assertIsNone(self.lookup(detector, 0b1011))
+        self.assertEqual(self.lookup(detector, 0b1010), CUP)
+    
+    def test_ungated_frame_uses_near_match(self):
+        """Test that without gating, a nearby hash is answered from the cache."""
+        detector = self.make_detector(None)
+        self.assertEqual(self.lookup(detector, 0b1011), CUP)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+"""
+Tests for the rate_limiter module.
+"""
+import sys
+import os
+import unittest
+from unittest import mock
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'src'))
+
+from rate_limiter import TokenBucket
+
+class FakeClock:
+    """Stand-in for the time module whose clock only moves when told to."""
+    
+    def __init__(self):
+        self.now = 1000.0
+    
+    def monotonic(self):
+        return self.now
+    
+    def sleep(self, seconds):
+        self.now += seconds
+
+class TestTokenBucket(unittest.TestCase):
+    """Test cases for the token bucket rate limiter."""
+    
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch('rate_limiter.time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def test_no_limits(self):
+        """Test that a bucket without limits never waits."""
+        bucket = TokenBucket()
+        for _ in range(100):
+            self.assertEqual(bucket.try_acquire(10000), 0)
+    
+    def test_requests_start_full(self):
+        """Test that a minute's allowance of requests goes through at once."""
+        bucket = TokenBucket(requests_per_minute=3)
+        for _ in range(3):
+            self.assertEqual(bucket.try_acquire(), 0)
+        self.assertAlmostEqual(bucket.try_acquire(), 20.0)
+    
+    def test_requests_refill(self):
+        """Test that requests refill continuously at the per-minute rate."""
+        bucket = TokenBucket(requests_per_minute=2)
+        bucket.try_acquire()
+        bucket.try_acquire()
+        self.clock.sleep(15)
+        self.assertAlmostEqual(bucket.try_acquire(), 15.0)
+        self.clock.sleep(15)
+        self.assertEqual(bucket.try_acquire(), 0)
+        self.assertAlmostEqual(bucket.try_acquire(), 30.0)
+    
+    def test_refill_is_capped(self):
+        """Test that an idle bucket holds no more than a minute's allowance."""
+        bucket = TokenBucket(requests_per_minute=2)
+        self.clock.sleep(600)
+        self.assertEqual(bucket.try_acquire(), 0)
+        self.assertEqual(bucket.try_acquire(), 0)
+        self.assertGreater(bucket.try_acquire(), 0)
+    
+    def test_tokens_per_minute(self):
+        """Test that requests wait until enough tokens have refilled."""
+        bucket = TokenBucket(tokens_per_minute=1000)
+        self.assertEqual(bucket.try_acquire(600), 0)
+        self.assertAlmostEqual(bucket.try_acquire(600), 12.0)
+        self.clock.sleep(12)
+        self.assertEqual(bucket.try_acquire(600), 0)
+        self.assertAlmostEqual(bucket.tokens, 0.0)
+    
+    def test_failed_acquire_takes_nothing(self):
+        """Test that a request that must wait leaves both buckets untouched."""
+        bucket = TokenBucket(requests_per_minute=10, tokens_per_minute=1000)
+        self.assertEqual(bucket.try_acquire(900), 0)
+        self.assertGreater(bucket.try_acquire(900), 0)
+        self.assertAlmostEqual(bucket.requests, 9.0)
+        self.assertAlmostEqual(bucket.tokens, 100.0)
+    
+    def test_oversized_request_waits_for_full_bucket(self):
+        """Test that a request larger than the limit is not blocked forever."""
+        bucket = TokenBucket(tokens_per_minute=1000)
+        bucket.try_acquire(500)
+        self.assertAlmostEqual(bucket.try_acquire(5000), 30.0)
+        self.clock.sleep(30)
+        self.assertEqual(bucket.try_acquire(5000), 0)
+    
+    def test_acquire_waits(self):
+        """Test that acquire() sleeps until the request can be taken."""
+        bucket = TokenBucket(requests_per_minute=60)
+        for _ in range(60):
+            bucket.try_acquire()
+        start = self.clock.now
+        self.assertTrue(bucket.acquire())
+        self.assertAlmostEqual(self.clock.now - start, 1.0)
+    
+    def test_acquire_timeout(self):
+        """Test that acquire() gives up once the timeout expires."""
+        bucket = TokenBucket(requests_per_minute=1)
+        bucket.try_acquire()
+        start = self.clock.now
+        self.assertFalse(bucket.acquire(timeout=5))
+        self.assertAlmostEqual(self.clock.now - start, 5.0)
+
+if __name__ == '__main__':
+    unittest.main() 
\ No newline at end of file
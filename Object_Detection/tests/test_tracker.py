@@ -0,0 +1,53 @@
+"""
+Tests for the tracker module.
+"""
+import sys
+import os
+import unittest
+import numpy as np
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'src'))
+
+from tracker import ObjectTracker
+
+class TestObjectTracker(unittest.TestCase):
+    """Test cases for seeding the tracker with detections."""
+    
+    def setUp(self):
+        # A still, textured 1280x720 frame, so every box has features to follow
+        rng = np.random.default_rng(0)
+        texture = rng.integers(0, 256, (90, 160), dtype=np.uint8)
+        self.frame = np.repeat(np.repeat(texture, 8, axis=0), 8, axis=1)[:, :, None].repeat(3, axis=2)
+        self.tracker = ObjectTracker()
+        self.tracker.track(self.frame, 1)
+        self.tracker.track(self.frame, 2)
+    
+    def assertBox(self, detection, expected):
+        self.assertEqual(detection['alpha'], 1.0)
+        np.testing.assert_allclose(detection['bbox'], expected, atol=0.01)
+    
+    def test_proportional_bbox(self):
+        """Test that a bbox given as proportions is tracked as is."""
+        self.tracker.reset([{'label': 'cup', 'bbox': [0.25, 0.25, 0.5, 0.75]}], 1)
+        results = self.tracker.results()
+        self.assertEqual(len(results), 1)
+        self.assertBox(results[0], [0.25, 0.25, 0.5, 0.75])
+    
+    def test_pixel_bbox(self):
+        """Test that a bbox in pixels is divided by the size of the image it was detected on."""
+        # Detected on the frame resized to 800x450
+        self.tracker.reset([{'label': 'cup', 'bbox': [200, 112.5, 400, 337.5]}], 1, (800, 450))
+        results = self.tracker.results()
+        self.assertEqual(len(results), 1)
+        self.assertBox(results[0], [0.25, 0.25, 0.5, 0.75])
+    
+    def test_pixel_bbox_default_size(self):
+        """Test that a bbox in pixels defaults to the size of the tracked frames."""
+        self.tracker.reset([{'label': 'cup', 'bbox': [320, 180, 640, 540]}], 1)
+        results = self.tracker.results()
+        self.assertEqual(len(results), 1)
+        self.assertBox(results[0], [0.25, 0.25, 0.5, 0.75])
+
+if __name__ == '__main__':
+    unittest.main() 
\ No newline at end of file